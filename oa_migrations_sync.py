@@ -241,6 +241,7 @@ class OAServerManager:
             frontend_dist = str(self.frontend_dist_dir).replace("\\", "/")
             nginx_pid = str(self.nginx_pid_dir / "nginx.pid").replace("\\", "/")
             nginx_logs = str(self.nginx_pid_dir).replace("\\", "/")
+            backend_assets = str(self.backend_dir / "assets").replace("\\", "/")
 
             # Nginx配置内容
             nginx_config = f"""
@@ -293,9 +294,11 @@ http {{
             proxy_set_header X-Real-IP $remote_addr;
             proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
             proxy_set_header X-Forwarded-Proto $scheme;
+            # 后端返回 X-Accel-Redirect 时由下面的 /internal-assets/ 发送文件
+            proxy_set_header X-Sendfile-Type X-Accel-Redirect;
         }}
 
-        # 处理OPTIONS预检请求
+        # 处理OPTIONS预检请求（/api/ 比 /api 匹配更长，其余请求也要在这里转发给后端）
         location /api/ {{
             if ($request_method = 'OPTIONS') {{
                 add_header Access-Control-Allow-Origin *;
@@ -303,6 +306,35 @@ http {{
                 add_header Access-Control-Allow-Headers 'DNT,X-Mx-ReqToken,Keep-Alive,User-Agent,X-Requested-With,If-Modified-Since,Cache-Control,Content-Type,Authorization';
                 return 204;
             }}
+            proxy_pass http://127.0.0.1:{self.backend_stable_port};
+            proxy_set_header Host $host;
+            proxy_set_header X-Real-IP $remote_addr;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header X-Forwarded-Proto $scheme;
+            proxy_set_header X-Sendfile-Type X-Accel-Redirect;
+        }}
+
+        # 后端 /assets 静态文件（检查项照片、存储文件等）：后端检查后用 X-Accel-Redirect 交给 nginx 发送
+        location /assets/ {{
+            proxy_pass http://127.0.0.1:{self.backend_stable_port};
+            proxy_set_header Host $host;
+            proxy_set_header X-Real-IP $remote_addr;
+            proxy_set_header X-Sendfile-Type X-Accel-Redirect;
+        }}
+
+        # 只接受后端 X-Accel-Redirect 内部跳转，不能直接访问；对应 Config.X_ACCEL_LOCATIONS
+        location /internal-assets/ {{
+            internal;
+            alias "{backend_assets}/";
+            sendfile on;
+            tcp_nopush on;
+            open_file_cache max=1000 inactive=60s;
+            open_file_cache_valid 60s;
+            open_file_cache_min_uses 2;
+            open_file_cache_errors on;
+            # 不设置 expires：缓存时间由后端的 Cache-Control 决定
+            add_header Access-Control-Allow-Origin *;
+            add_header Access-Control-Expose-Headers 'Content-Range, Accept-Ranges, Content-Length, Content-Type, ETag';
         }}
 
         # 后端静态文件代理
@@ -84,6 +84,7 @@ class OAServerManager:
             mime_types_path = self.mime_path.replace('\\', '/')
             frontend_dist = FRONTEND_DIST_DIR.replace('\\', '/')
             nginx_temp_files = self.nginx_temp_files.replace('\\', '/')
+            backend_assets = os.path.join(self.backend_dir, 'assets').replace('\\', '/')
 
             config_content = """# oa_frontend.conf 完整配置（由Python脚本自动生成）
 worker_processes  1;  # 内网自用，1个进程足够
@@ -133,6 +134,8 @@ http {{
             proxy_set_header X-Real-IP $remote_addr;
             proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
             proxy_set_header X-Forwarded-Proto $scheme;
+            # 后端返回 X-Accel-Redirect 时由下面的 /internal-assets/ 发送文件
+            proxy_set_header X-Sendfile-Type X-Accel-Redirect;
             proxy_connect_timeout 30s;
             proxy_send_timeout 30s;
             proxy_read_timeout 60s;
@@ -147,6 +150,30 @@ http {{
             }}
         }}
 
+        # 后端 /assets 静态文件（检查项照片、存储文件等）：后端检查后用 X-Accel-Redirect 交给 nginx 发送
+        location /assets/ {{
+            proxy_pass http://backend_server;
+            proxy_set_header Host $host;
+            proxy_set_header X-Real-IP $remote_addr;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+            proxy_set_header X-Sendfile-Type X-Accel-Redirect;
+        }}
+
+        # 只接受后端 X-Accel-Redirect 内部跳转，不能直接访问；对应 Config.X_ACCEL_LOCATIONS
+        location /internal-assets/ {{
+            internal;
+            alias "{}/";
+            sendfile on;
+            tcp_nopush on;
+            open_file_cache max=1000 inactive=60s;
+            open_file_cache_valid 60s;
+            open_file_cache_min_uses 2;
+            open_file_cache_errors on;
+            # 不设置 expires：缓存时间由后端的 Cache-Control 决定
+            add_header Access-Control-Allow-Origin *;
+            add_header Access-Control-Expose-Headers 'Content-Range, Accept-Ranges, Content-Length, Content-Type, ETag';
+        }}
+
         location / {{
             try_files $uri $uri/ /index.html;
         }}
@@ -162,7 +189,8 @@ http {{
     mime_types_path,
     self.nginx_port,
     frontend_dist,
-    nginx_temp_files
+    nginx_temp_files,
+    backend_assets
 )
 
             with open(self.nginx_conf, 'w', encoding='utf-8') as f:
@@ -101,6 +101,7 @@ const refreshToken = async (): Promise<string> => {
 interface ExtendedAxiosRequestConfig extends AxiosRequestConfig {
   _skipAuthRefresh?: boolean;
   _retry?: boolean;
+  _asyncJob?: boolean;
 }
 
 // 请求拦截器：添加JWT令牌
@@ -158,6 +159,10 @@ service.interceptors.response.use(
     else if (typeof res === 'object' && 'code' in res && res.code === 200) {
       return res.data;
     }
+    // 后台任务已提交（runJob 发出的请求），返回任务信息
+    else if (typeof res === 'object' && res.code === 202 && (response.config as ExtendedAxiosRequestConfig)._asyncJob) {
+      return res.data;
+    }
     // 其他情况，直接返回data部分
     else {
       const errorMsg = res.code ? `[${res.code}] ${res.msg}` : res.msg || '操作失败';
@@ -301,6 +306,51 @@ const request = {
   },
 };
 
+// 后台任务轮询间隔和最长等待时间（毫秒）
+const JOB_POLL_INTERVAL = 1000;
+const JOB_POLL_TIMEOUT = 10 * 60 * 1000;
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * 提交后台任务并等待结果
+ * 请求头带 Prefer: respond-async，后端立即返回202和任务ID（不占用服务端线程），
+ * 再轮询 /api/jobs/<job_id> 直到任务结束，成功时返回任务结果（与同步接口的data相同）
+ */
+export const runJob = async <T = any>(url: string, data?: any, config?: AxiosRequestConfig): Promise<T> => {
+  const jobConfig: ExtendedAxiosRequestConfig = {
+    ...config,
+    headers: { ...(config?.headers || {}), Prefer: 'respond-async' },
+    _asyncJob: true,
+  };
+  const accepted: any = await service.post(url, data, jobConfig);
+  // 后端未按异步处理时直接返回结果
+  if (!accepted || !accepted.job_id) {
+    return accepted as T;
+  }
+
+  const statusUrl = accepted.status_url || `/api/jobs/${accepted.job_id}`;
+  const deadline = Date.now() + JOB_POLL_TIMEOUT;
+  while (Date.now() < deadline) {
+    await sleep(JOB_POLL_INTERVAL);
+    const job: any = await request.get(statusUrl);
+    if (job.status === 'succeeded') {
+      return job.result as T;
+    }
+    if (job.status === 'failed') {
+      const errorMsg = job.error || '任务执行失败';
+      ElMessage({
+        message: errorMsg,
+        type: 'error',
+        duration: 5000,
+        showClose: true
+      });
+      throw new Error(errorMsg);
+    }
+  }
+  throw new Error('任务仍在后台执行，请稍后刷新查看结果');
+};
+
 // 机器管理相关API
 export const getMachines = (params?: any) => request.get('/api/machines', { params });
 
@@ -312,10 +362,10 @@ export const updateMachine = (model: string, data: any) => request.put(`/api/mac
 
 export const deleteMachine = (model: string) => request.delete(`/api/machines/${model}`);
 
-export const importMachines = (data: FormData) => request.post('/api/machines/import', data);
+export const importMachines = (data: FormData) => runJob('/api/machines/import', data);
 
 // 直接JSON数据导入导出API
-export const importMachinesJson = (data: any) => request.post('/api/machines/import-json', data);
+export const importMachinesJson = (data: any) => runJob('/api/machines/import-json', data);
 
 export const exportMachinesJson = () => request.get('/api/machines/export-json');
 
@@ -331,7 +381,7 @@ export const updatePart = (partTypeId: number, data: any) => request.put(`/api/p
 export const deletePart = (partTypeId: number) => request.delete(`/api/parts/${partTypeId}`);
 
 // 部件JSON导入导出API
-export const importPartsJson = (data: any) => request.post('/api/parts/import-json', data);
+export const importPartsJson = (data: any) => runJob('/api/parts/import-json', data);
 
 export const exportPartsJson = () => request.get('/api/parts/export-json');
 
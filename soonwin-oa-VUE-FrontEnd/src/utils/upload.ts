@@ -27,54 +27,86 @@ export const uploadFile = async (file: File, targetPath?: string) => {
 };
 
 /**
- * 分块上传文件
+ * 计算数据的 SHA-256（十六进制），非安全上下文（HTTP 访问）下浏览器不提供 crypto.subtle，返回 undefined
+ */
+const sha256Hex = async (data: Blob): Promise<string | undefined> => {
+  if (!window.crypto?.subtle) {
+    return undefined;
+  }
+  const digest = await window.crypto.subtle.digest('SHA-256', await data.arrayBuffer());
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+};
+
+/**
+ * 分块上传文件（可断点续传）
+ * 分块并行上传，先查询服务端已接收的分块只补传缺少的部分；
+ * 服务端在最后一个到达的分块上合并文件，返回带 path 的结果
  * @param file 文件对象
  * @param chunkSize 分块大小，默认为5MB
+ * @param fileIdentifier 上传标识，续传时传入上次使用的标识
+ * @param concurrency 同时上传的分块数
  * @returns 上传结果
  */
-export const uploadFileInChunks = async (file: File, chunkSize: number = 5 * 1024 * 1024, targetPath?: string) => {
-  const totalChunks = Math.ceil(file.size / chunkSize);
-  const fileIdentifier = `${file.name}-${file.size}-${new Date().getTime()}`;
-  
-  const uploadPromises = [];
-  
-  for (let i = 0; i < totalChunks; i++) {
-    const start = i * chunkSize;
-    const end = Math.min(start + chunkSize, file.size);
-    const chunk = file.slice(start, end);
-    
+export const uploadFileInChunks = async (
+  file: File,
+  chunkSize: number = 5 * 1024 * 1024,
+  fileIdentifier: string = `${file.name}-${file.size}-${file.lastModified}`,
+  concurrency: number = 3
+) => {
+  const totalChunks = Math.max(1, Math.ceil(file.size / chunkSize));
+
+  // 查询已接收的分块，已合并完成时直接返回结果
+  const status: any = await request.get('/api/upload/chunk/status', {
+    params: { file_identifier: fileIdentifier }
+  });
+  if (status?.completed) {
+    return { ...status.result, original_filename: file.name, file_identifier: fileIdentifier };
+  }
+  const received = new Set<number>(status?.total_chunks === totalChunks ? status.received_chunks : []);
+  const pending = Array.from({ length: totalChunks }, (_, i) => i).filter(i => !received.has(i));
+
+  let finalResult: any = null;
+  const uploadChunk = async (index: number) => {
+    const chunk = file.slice(index * chunkSize, Math.min((index + 1) * chunkSize, file.size));
     const formData = new FormData();
     formData.append('chunk', chunk);
-    formData.append('chunk_index', i.toString());
+    formData.append('chunk_index', index.toString());
     formData.append('total_chunks', totalChunks.toString());
     formData.append('filename', file.name);
     formData.append('file_identifier', fileIdentifier);
-    
-    // 如果是最后一块，同时提供目标路径
-    if (i === totalChunks - 1 && targetPath) {
-      formData.append('target_path', targetPath);
+    const checksum = await sha256Hex(chunk);
+    if (checksum) {
+      formData.append('chunk_checksum', checksum);
     }
-    
-    uploadPromises.push(
-      request.post('/api/upload/chunk', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data'
-        }
-      })
-    );
-  }
-  
-  try {
-    // 顺序上传各分块
-    for (let i = 0; i < uploadPromises.length; i++) {
-      const result = await uploadPromises[i];
-      if (i === uploadPromises.length - 1) {
-        return result; // 返回最终结果
+    const response: any = await request.post('/api/upload/chunk', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data'
       }
+    });
+    if (response?.path) {
+      finalResult = response;
     }
-  } catch (error) {
-    throw error;
+  };
+
+  // 固定数量的并行上传通道
+  const workers = Array.from({ length: Math.min(concurrency, pending.length) }, async () => {
+    while (pending.length > 0) {
+      await uploadChunk(pending.shift() as number);
+    }
+  });
+  await Promise.all(workers);
+
+  if (!finalResult) {
+    // 全部分块已在之前的上传中到达，由状态接口取回合并结果
+    const latest: any = await request.get('/api/upload/chunk/status', {
+      params: { file_identifier: fileIdentifier }
+    });
+    if (!latest?.completed) {
+      throw new Error(`分块上传未完成，缺少分块: ${(latest?.missing_chunks || []).join(',')}`);
+    }
+    finalResult = { ...latest.result, original_filename: file.name, file_identifier: fileIdentifier };
   }
+  return finalResult;
 };
 
 /**
@@ -2,7 +2,7 @@ from flask import Flask
 from flask_cors import CORS
 import config
 # 从 extensions.py 导入扩展（而非本地初始化）
-from extensions import db, migrate
+from extensions import db, migrate, register_sqlite_pragmas
 
 def create_app(port=5000):
     app = Flask(__name__, static_folder='../assets', static_url_path='/assets')
@@ -11,10 +11,42 @@ def create_app(port=5000):
     app.config['SQLALCHEMY_DATABASE_URI'] = config.get_database_uri(port)
     app.config.from_object(config.Config)
 
+    # 全局JSON序列化（Decimal、日期时间、UUID，可选 orjson 加速）
+    from .utils.json_provider_utils import AppJSONProvider
+    app.json = AppJSONProvider(app)
+
     # 绑定扩展与app（核心：延迟绑定，避免循环）
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # SQLite 连接级调优（WAL、busy_timeout、mmap 等，见 Config.SQLITE_PRAGMAS）
+    with app.app_context():
+        register_sqlite_pragmas(app)
+
+    # SQLite 单写线程调度器（写线程在首次提交写操作时启动）
+    from .utils.write_queue_utils import init_write_dispatcher
+    init_write_dispatcher(app)
+
+    # 文件操作线程池（上传文件移动、移入删除目录）
+    from .utils.file_ops_utils import init_file_ops
+    init_file_ops(app)
+
+    # 图片缩放缓存（请求参数 w 返回缩略图，上传后后台预生成）
+    from .utils.image_derivative_utils import init_image_derivatives
+    init_image_derivatives(app)
+
+    # 后台任务执行器（费用分摊计算、导入等耗时操作，线程池在首次提交任务时创建）
+    from .utils.job_utils import init_job_runner
+    init_job_runner(app)
+
+    # 统一鉴权阶段：每个请求只解析一次JWT令牌，结果保存在 g 中供各权限装饰器读取
+    from .utils.auth_utils import register_auth_middleware
+    register_auth_middleware(app)
+
+    # /assets 静态文件支持 Range，经 nginx 访问时用 X-Accel-Redirect 交给 nginx 发送
+    from .utils.file_response_utils import register_static_assets
+    register_static_assets(app)
+
     # 解决跨域
     CORS(app, resources=r"/*")
 
@@ -31,6 +63,22 @@ def create_app(port=5000):
         from .models.display_file import DisplayFile
         from .models.inquiry import Inquiry, InquiryCommunication, InquiryLog
         from .models.machine import Machine, PartType
+        from .models.expense import YearlyFinancialSummary
+        from .models.job import Job
+        from .models.blob import Blob
+
+        # 注册年度财务汇总的维护事件（订单/费用变动时在同一事务内刷新汇总行）
+        from .utils.summary_utils import register_summary_events
+        register_summary_events()
+
+        # 注册存储文件引用计数的维护事件（检查项图片、订单验收图片变化时在同一事务内更新 Blob 表）
+        from .utils.blob_store_utils import register_blob_ref_events
+        register_blob_ref_events()
+
+        # 注册表版本号维护事件（条件请求 ETag 依赖，事务提交后对应表的版本号加一）
+        from .utils.etag_utils import register_table_version_events
+        register_table_version_events()
+
         # 注册路由蓝图
         from .routes.punch_routes import punch_bp
         app.register_blueprint(punch_bp)
@@ -71,6 +119,15 @@ def create_app(port=5000):
         from .routes.machine_routes import machine_bp
         app.register_blueprint(machine_bp, url_prefix='/api')
 
+        # 注册后台任务相关路由蓝图
+        from .routes.job_routes import job_bp
+        app.register_blueprint(job_bp, url_prefix='/api')
+
+    # 启动自检：热点查询退化为全表扫描时输出警告
+    if app.config.get('QUERY_PLAN_CHECK'):
+        from .utils.query_plan_utils import check_query_plans
+        check_query_plans(app)
+
     return app
 
 # 暴露app实例（供flask命令识别）
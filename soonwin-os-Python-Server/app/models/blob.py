@@ -0,0 +1,17 @@
+from extensions import db
+from datetime import datetime
+
+
+class Blob(db.Model):
+    """内容寻址存储的文件（按 SHA-256 去重，引用计数为0且超过保留期后由清理任务删除）"""
+    __tablename__ = "Blob"
+    sha256 = db.Column(db.String(64), primary_key=True, comment="文件内容的SHA-256")
+    ext = db.Column(db.String(10), nullable=False, default='', comment="文件扩展名（含点）")
+    size = db.Column(db.Integer, nullable=True, comment="文件大小（字节）")
+    ref_count = db.Column(db.Integer, nullable=False, default=0, comment="引用次数（检查项图片、订单验收图片）")
+    create_time = db.Column(db.DateTime, default=datetime.now, comment="创建时间")
+    update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="引用次数最近变化时间")
+
+    __table_args__ = (
+        db.Index('ix_Blob_ref_count_update_time', 'ref_count', 'update_time'),
+    )
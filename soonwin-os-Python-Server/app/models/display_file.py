@@ -1,5 +1,6 @@
 from extensions import db
 from datetime import datetime
+import json
 import uuid
 
 
@@ -12,6 +13,8 @@ class DisplayFile(db.Model):
     file_path = db.Column(db.Text, nullable=False, comment="文件存储路径")
     original_filename = db.Column(db.String(200), nullable=False, comment="原始文件名")
     page_count = db.Column(db.Integer, nullable=True, comment="页数")  # 新增页数字段，允许为空
+    pdf_metrics = db.Column(db.Text, nullable=True, comment="PDF优化指标（JSON：优化前后大小、第1页所需字节数和渲染耗时）")
+    image_manifest = db.Column(db.Text, nullable=True, comment="图片组清单（JSON：按顺序的文件名、尺寸、大小和缩略图地址）")
     created_by = db.Column(db.String(50), nullable=False, comment="上传者")
     created_at = db.Column(db.DateTime, default=datetime.now, comment="创建时间")
     updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
@@ -25,6 +28,7 @@ class DisplayFile(db.Model):
             "file_path": self.file_path,
             "original_filename": self.original_filename,
             "page_count": self.page_count,  # 返回页数字段
+            "pdf_metrics": json.loads(self.pdf_metrics) if self.pdf_metrics else None,
             "created_by": self.created_by,
             "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
             "updated_at": self.updated_at.strftime("%Y-%m-%d %H:%M:%S") if self.updated_at else None
@@ -22,6 +22,10 @@ class Expense(db.Model):
     用于记录需要分摊到订单中的费用
     """
     __tablename__ = "Expense"
+    __table_args__ = (
+        # 按年份、类型汇总和分摊
+        db.Index('ix_Expense_target_year_expense_type', 'target_year', 'expense_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     name = db.Column(db.String(100), nullable=False, comment="费用名称")
@@ -39,6 +43,11 @@ class ExpenseAllocation(db.Model):
     记录每笔费用如何分摊到各个订单
     """
     __tablename__ = "ExpenseAllocation"
+    __table_args__ = (
+        # 按费用删除/重写分摊记录，按订单查询和释放分摊记录
+        db.Index('ix_ExpenseAllocation_expense_id_order_id', 'expense_id', 'order_id'),
+        db.Index('ix_ExpenseAllocation_order_id', 'order_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     expense_id = db.Column(db.Integer, db.ForeignKey('Expense.id'), nullable=False, comment="费用记录ID")
@@ -57,11 +66,16 @@ class ExpenseCalculationRecord(db.Model):
     记录每次费用分摊计算的时间和状态
     """
     __tablename__ = "ExpenseCalculationRecord"
+    __table_args__ = (
+        # 按年份取最近一次计算记录
+        db.Index('ix_ExpenseCalculationRecord_target_year_calculation_time', 'target_year', 'calculation_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     calculation_time = db.Column(db.DateTime, default=datetime.now, comment="计算时间")
     target_year = db.Column(db.Integer, nullable=False, comment="计算目标年份")
     status = db.Column(db.String(20), default='completed', comment="计算状态（completed/failed）")
+    allocation_base = db.Column(db.Numeric(15, 2), nullable=True, comment="本次分摊使用的摊分基数（增量分摊据此判断是否需要整年重算）")
     remark = db.Column(db.Text, comment="备注信息")
 
 
@@ -81,4 +95,31 @@ class IndividualExpense(db.Model):
     update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
     
     # 关联关系
-    order = db.relationship('Order', backref=db.backref('individual_expenses', lazy=True, cascade='all, delete-orphan'))
\ No newline at end of file
+    order = db.relationship('Order', backref=db.backref('individual_expenses', lazy=True, cascade='all, delete-orphan'))
+
+class YearlyFinancialSummary(db.Model):
+    """
+    年度财务汇总模型
+    按年份物化存储费用、订单、分摊的汇总数据，
+    在订单、费用、个别费用、分摊发生变化的同一事务内刷新，汇总接口只读一行
+    """
+    __tablename__ = "YearlyFinancialSummary"
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
+    target_year = db.Column(db.Integer, nullable=False, unique=True, comment="汇总年份")
+    total_expenses = db.Column(db.Numeric(15, 2), default=0, comment="全面分摊费用合计（运营成本）")
+    total_expenditure = db.Column(db.Numeric(15, 2), default=0, comment="全面分摊费用中正数合计（总开支）")
+    total_income = db.Column(db.Numeric(15, 2), default=0, comment="全面分摊费用中负数合计（总收入）")
+    latest_expense_create_time = db.Column(db.DateTime, nullable=True, comment="该年份最后一条费用的创建时间")
+    total_orders = db.Column(db.Integer, default=0, comment="订单数量")
+    total_order_amount = db.Column(db.Numeric(15, 2), default=0, comment="订单合同总金额")
+    machine_cost_amount = db.Column(db.Numeric(15, 2), default=0, comment="订单机器成本合计")
+    individual_cost_amount = db.Column(db.Numeric(15, 2), default=0, comment="订单个别费用合计")
+    total_gross_profit = db.Column(db.Numeric(15, 2), default=0, comment="订单毛利合计")
+    total_expense_allocation = db.Column(db.Numeric(15, 2), default=0, comment="费用分摊金额合计")
+    annual_target = db.Column(db.Numeric(15, 2), default=10000000.00, comment="年度目标金额")
+    latest_calculation_id = db.Column(db.Integer, nullable=True, comment="最近一次费用计算记录ID")
+    latest_calculation_time = db.Column(db.DateTime, nullable=True, comment="最近一次费用计算时间")
+    latest_calculation_status = db.Column(db.String(20), nullable=True, comment="最近一次费用计算状态")
+    latest_calculation_remark = db.Column(db.Text, nullable=True, comment="最近一次费用计算备注")
+    update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
@@ -1,6 +1,7 @@
 from extensions import db
 from datetime import datetime
 from app.models.employee import Employee
+from app.utils.serializer_utils import Field, Schema
 
 
 class Inquiry(db.Model):
@@ -42,6 +43,10 @@ class Inquiry(db.Model):
 
 class InquiryCommunication(db.Model):
     __tablename__ = "InquiryCommunication"
+    __table_args__ = (
+        # 按询盘分页查询沟通记录（按创建时间倒序）
+        db.Index('ix_InquiryCommunication_inquiry_id_create_time', 'inquiry_id', 'create_time'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     inquiry_id = db.Column(db.Integer, db.ForeignKey('Inquiry.id'), nullable=False, comment="关联询盘ID")
     inquiry = db.relationship('Inquiry', backref=db.backref('communications', lazy=True, cascade='all, delete-orphan'))
@@ -70,6 +75,11 @@ class InquiryCommunication(db.Model):
 
 class InquiryLog(db.Model):
     __tablename__ = "InquiryLog"
+    __table_args__ = (
+        # 按询盘查日志、按时间倒序分页
+        db.Index('ix_InquiryLog_inquiry_id_create_time', 'inquiry_id', 'create_time'),
+        db.Index('ix_InquiryLog_create_time', 'create_time'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     inquiry_id = db.Column(db.Integer, db.ForeignKey('Inquiry.id'), comment="关联询盘ID")
     operation_type = db.Column(db.String(50), nullable=False, comment="操作类型: create, update, delete")
@@ -88,4 +98,38 @@ class InquiryLog(db.Model):
             "operator_role": self.operator.user_role if self.operator else None,
             "operation_details": self.operation_details,
             "create_time": self.create_time.strftime('%Y-%m-%d %H:%M:%S') if self.create_time else None
-        }
\ No newline at end of file
+        }
+
+
+# 询盘序列化描述：detail 与 Inquiry.to_dict 输出一致，list 为询盘表格显示的列（创建人只加载姓名）
+inquiry_schema = Schema(Inquiry, [
+    Field('id'),
+    Field('area'),
+    Field('inquiry_date', kind='date'),
+    Field('inquiry_source'),
+    Field('company_name'),
+    Field('contact_person'),
+    Field('phone'),
+    Field('email'),
+    Field('packaging_product'),
+    Field('machine_type'),
+    Field('creator_id'),
+    Field('creator_name', attr='name', relation='creator'),
+    Field('creator_role', attr='user_role', relation='creator'),
+    Field('create_time', kind='datetime'),
+    Field('update_time', kind='datetime'),
+], {
+    'list': [
+        'id', 'area', 'inquiry_date', 'inquiry_source', 'company_name', 'contact_person', 'phone',
+        'email', 'packaging_product', 'machine_type', 'creator_id', 'creator_name', 'create_time'
+    ],
+    'detail': [
+        'id', 'area', 'inquiry_date', 'inquiry_source', 'company_name', 'contact_person', 'phone',
+        'email', 'packaging_product', 'machine_type', 'creator_id', 'creator_name', 'creator_role',
+        'create_time', 'update_time'
+    ],
+    'export': [
+        'id', 'area', 'inquiry_date', 'inquiry_source', 'company_name', 'contact_person', 'phone',
+        'email', 'packaging_product', 'machine_type', 'creator_name', 'create_time', 'update_time'
+    ],
+})
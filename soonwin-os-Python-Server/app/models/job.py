@@ -0,0 +1,56 @@
+from extensions import db
+from datetime import datetime
+import json
+import uuid
+
+
+class Job(db.Model):
+    """后台任务（费用分摊计算、机型/部件导入、PDF线性化、清空检查项等耗时操作）"""
+    __tablename__ = "Job"
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()), comment="任务ID（UUID）")
+    job_type = db.Column(db.String(50), nullable=False, comment="任务类型")
+    status = db.Column(db.String(20), nullable=False, default='pending', comment="状态（pending/running/succeeded/failed）")
+    progress = db.Column(db.Integer, nullable=False, default=0, comment="进度（0-100）")
+    message = db.Column(db.String(500), nullable=True, comment="进度或结果提示")
+    params = db.Column(db.Text, nullable=True, comment="任务参数（JSON）")
+    result = db.Column(db.Text, nullable=True, comment="任务结果（JSON）")
+    error = db.Column(db.Text, nullable=True, comment="最近一次失败原因")
+    attempts = db.Column(db.Integer, nullable=False, default=0, comment="已执行次数")
+    max_attempts = db.Column(db.Integer, nullable=False, default=1, comment="最多执行次数")
+    worker_id = db.Column(db.String(20), nullable=True, comment="执行任务的服务进程标识")
+    created_by = db.Column(db.String(50), nullable=True, comment="提交人工号")
+    create_time = db.Column(db.DateTime, default=datetime.now, comment="提交时间")
+    start_time = db.Column(db.DateTime, nullable=True, comment="最近一次开始执行时间")
+    finish_time = db.Column(db.DateTime, nullable=True, comment="完成时间")
+    update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+
+    __table_args__ = (
+        db.Index('ix_Job_created_by_create_time', 'created_by', 'create_time'),
+        db.Index('ix_Job_status', 'status'),
+    )
+
+    @staticmethod
+    def _load_json(value):
+        if not value:
+            return None
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "result": self._load_json(self.result),
+            "error": self.error,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "created_by": self.created_by,
+            "create_time": self.create_time.strftime("%Y-%m-%d %H:%M:%S") if self.create_time else None,
+            "start_time": self.start_time.strftime("%Y-%m-%d %H:%M:%S") if self.start_time else None,
+            "finish_time": self.finish_time.strftime("%Y-%m-%d %H:%M:%S") if self.finish_time else None
+        }
@@ -1,8 +1,17 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy import event
+from app.utils.serializer_utils import Field, Schema
 
 class Order(db.Model):
     __tablename__ = "Order"  # 使用新表名
+    __table_args__ = (
+        # 按年份筛选时走索引范围扫描；第二列分别服务按创建时间排序与金额汇总
+        db.Index('ix_Order_order_year_create_time', 'order_year', 'create_time'),
+        db.Index('ix_Order_order_year_contract_amount', 'order_year', 'contract_amount'),
+        # 订单列表按创建时间倒序分页
+        db.Index('ix_Order_create_time', 'create_time'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键（序号）")
     is_new = db.Column(db.Integer, comment="新旧（1=新/0=旧）")
     area = db.Column(db.String(50), nullable=False, comment="地区")
@@ -40,6 +49,12 @@ class Order(db.Model):
     attachment_videos = db.Column(db.String(500), comment="验收视频路径（多视频逗号分隔）")
     create_time = db.Column(db.DateTime, default=datetime.now, comment="创建时间")
     update_time = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, comment="更新时间")
+    order_year = db.Column(db.Integer, comment="订单年份（由创建时间自动维护，用于按年份筛选）")
+
+    @classmethod
+    def year_filter(cls, target_year):
+        """按年份筛选订单的查询条件（使用已索引的 order_year 列）"""
+        return cls.order_year == target_year
 
     # 定义序列化方法，便于接口返回JSON数据
     def to_dict(self):
@@ -81,4 +96,77 @@ class Order(db.Model):
             "attachment_videos": self.attachment_videos,
             "create_time": self.create_time.strftime('%Y-%m-%d %H:%M:%S') if self.create_time else None,
             "update_time": self.update_time.strftime('%Y-%m-%d %H:%M:%S') if self.update_time else None
-        }
\ No newline at end of file
+        }
+
+@event.listens_for(Order, 'before_insert')
+@event.listens_for(Order, 'before_update')
+def sync_order_year(mapper, connection, target):
+    """写入前根据创建时间同步订单年份"""
+    if target.create_time is None:
+        target.create_time = datetime.now()
+    target.order_year = target.create_time.year
+
+
+_ORDER_DETAIL_FIELDS = [
+    'id', 'is_new', 'area', 'customer_name', 'customer_type', 'order_time', 'ship_time', 'ship_country',
+    'contract_no', 'order_no', 'machine_no', 'machine_name', 'machine_model', 'machine_count', 'unit',
+    'contract_amount', 'deposit', 'balance', 'tax_rate', 'tax_refund_amount', 'currency_amount',
+    'payment_received', 'machine_cost', 'net_profit', 'proportionate_cost', 'individual_cost', 'gross_profit',
+    'pay_type', 'commission', 'latest_ship_date', 'expected_delivery', 'order_dept', 'check_requirement',
+    'attachment_imgs', 'attachment_videos', 'create_time', 'update_time'
+]
+
+# 订单序列化描述：list 为订单表格显示的列，detail 与原 serialize_order 输出一致，export 额外包含订单年份
+order_schema = Schema(Order, [
+    Field('id'),
+    Field('is_new'),
+    Field('area'),
+    Field('customer_name'),
+    Field('customer_type'),
+    Field('order_time', kind='date'),
+    Field('ship_time', kind='date'),
+    Field('ship_country'),
+    Field('contract_no'),
+    Field('order_no'),
+    Field('machine_no'),
+    Field('machine_name'),
+    Field('machine_model'),
+    Field('machine_count'),
+    Field('unit'),
+    Field('contract_amount', kind='money', default=0.0),
+    Field('deposit', kind='money', default=0.0),
+    Field('balance', kind='money', default=0.0),
+    Field('tax_rate', kind='money', default=13.0),
+    Field('tax_refund_amount', kind='money', default=0.0),
+    Field('currency_amount', kind='money', default=0.0),
+    Field('payment_received', kind='money', default=0.0),
+    Field('machine_cost', kind='money', default=0.0),
+    Field('net_profit', kind='money', default=0.0),
+    Field('proportionate_cost', kind='money', default=0.0),
+    Field('individual_cost', kind='money', default=0.0),
+    Field('gross_profit', kind='money', default=0.0),
+    Field('pay_type'),
+    Field('commission', kind='money', default=0.0),
+    Field('latest_ship_date', kind='date'),
+    Field('expected_delivery', kind='date'),
+    Field('order_dept'),
+    Field('check_requirement'),
+    Field('attachment_imgs'),
+    Field('attachment_videos'),
+    Field('create_time', kind='datetime'),
+    Field('update_time', kind='datetime'),
+    Field('order_year'),
+], {
+    'list': [
+        'id', 'area', 'customer_name', 'contract_no', 'order_no', 'machine_name', 'machine_model',
+        'machine_count', 'contract_amount', 'machine_cost', 'gross_profit', 'proportionate_cost',
+        'individual_cost', 'net_profit', 'order_time', 'ship_time', 'create_time'
+    ],
+    'detail': _ORDER_DETAIL_FIELDS,
+    'export': _ORDER_DETAIL_FIELDS + ['order_year'],
+    # 订单验收列表（验收进度字段由路由补充）
+    'inspection_list': [
+        'id', 'contract_no', 'order_no', 'machine_no', 'machine_name', 'machine_model',
+        'machine_count', 'order_time', 'ship_time'
+    ],
+})
@@ -9,6 +9,10 @@ class OrderInspection(db.Model):
     订单验收主表
     """
     __tablename__ = "OrderInspection"
+    __table_args__ = (
+        # 按订单查找验收记录
+        db.Index('ix_OrderInspection_order_id', 'order_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     order_id = db.Column(db.Integer, db.ForeignKey('Order.id'), nullable=False, comment="关联订单ID")
@@ -58,6 +62,10 @@ class OrderInspectionStatusLog(db.Model):
     订单状态流水表
     """
     __tablename__ = "OrderInspectionStatusLog"
+    __table_args__ = (
+        # 按验收记录加载状态流水
+        db.Index('ix_OrderInspectionStatusLog_inspection_id_create_time', 'inspection_id', 'create_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     inspection_id = db.Column(db.Integer, db.ForeignKey('OrderInspection.id'), nullable=False, comment="关联验收ID")
@@ -83,6 +91,11 @@ class InspectionItem(db.Model):
     验收检查项表
     """
     __tablename__ = "InspectionItem"
+    __table_args__ = (
+        # 按验收记录加载检查项（按排序号、创建时间排序）及按父级查子项
+        db.Index('ix_InspectionItem_inspection_id_sort_order', 'inspection_id', 'sort_order', 'create_time'),
+        db.Index('ix_InspectionItem_parent_id', 'parent_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     inspection_id = db.Column(db.Integer, db.ForeignKey('OrderInspection.id'), nullable=False, comment="关联验收ID")
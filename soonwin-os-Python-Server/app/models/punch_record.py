@@ -3,6 +3,11 @@ from datetime import datetime
 
 class PunchRecord(db.Model):
     __tablename__ = "PunchRecord"
+    __table_args__ = (
+        # 按员工查当天打卡、按时间倒序分页
+        db.Index('ix_PunchRecord_emp_id_punch_time', 'emp_id', 'punch_time'),
+        db.Index('ix_PunchRecord_punch_time', 'punch_time'),
+    )
     id = db.Column(db.Integer, primary_key=True, autoincrement=True, comment="自增主键")
     emp_id = db.Column(db.String(20), nullable=False, comment="关联员工工号")
     name = db.Column(db.String(50), nullable=False, comment="员工姓名")
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from app.models.employee import Employee
-from app.utils.auth_utils import require_auth_with_leeway
+from app.utils.auth_utils import require_auth_with_leeway, require_admin, identity_cache_stats
+from app.utils.write_queue_utils import get_write_dispatcher
 from datetime import datetime, timedelta
 import jwt
 import config
@@ -89,4 +90,24 @@ def refresh_token():
             "code": 500,
             "msg": f"令牌刷新失败: {str(e)}",
             "data": None
-        }), 500
\ No newline at end of file
+        }), 500
+
+@auth_bp.route('/cache-stats', methods=['GET'])
+@require_admin
+def get_cache_stats():
+    """查看进程内缓存与写队列的统计信息（命中/未命中次数等）"""
+    try:
+        return jsonify({
+            "code": 200,
+            "msg": "获取缓存统计成功",
+            "data": {
+                "identity_cache": identity_cache_stats(),
+                "write_queue": get_write_dispatcher().stats()
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"获取缓存统计失败: {str(e)}",
+            "data": None
+        }), 500
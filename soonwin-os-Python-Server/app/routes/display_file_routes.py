@@ -16,6 +16,17 @@ sys.path.insert(0, str(components_path))
 from ..models.display_file import DisplayFile
 from ..models.employee import Employee
 from ..utils.auth_utils import require_auth as login_required, require_admin as admin_required
+from ..utils.etag_utils import conditional_get
+from ..utils.job_utils import job_handler, submit_job
+from ..utils.image_derivative_utils import get_image_derivatives, parse_width, send_image
+from ..utils.image_group_utils import (build_image_group_manifest, cache_image_group, dump_manifest,
+                                       get_cached_image_group, image_group_data, image_group_versions,
+                                       natural_sort_key, scan_image_group)
+from ..utils.pdf_render_utils import (PyMuPDFMissingError, get_page_dpis, get_page_image, load_pymupdf,
+                                      remove_display_file_pages, render_display_file_pages)
+from ..utils.pdf_optimize_utils import optimize_pdf_in_place
+from ..utils.file_response_utils import send_file_response
+from ..utils.write_queue_utils import run_write
 import json
 
 # 调整为256KB（覆盖99%的PDF元数据，避免解析失败）
@@ -24,46 +35,86 @@ SAFE_METADATA_SIZE = 256 * 1024  # 262144字节
 # 创建蓝图
 display_file_bp = Blueprint('display_file', __name__)
 
-def lightweight_linearize_pdf(input_path, output_path):
+# 展示文件上传目录
+DISPLAY_FILE_FOLDER = 'assets/DisplayFiles'
+
+
+@job_handler('pdf_linearize', max_attempts=3)
+def run_pdf_linearize_job(ctx, file_path, file_id=None):
     """
-    轻量级PDF线性化函数，优化PDF流式加载
+    后台任务：优化上传的PDF（图片降采样、压缩、线性化），写到临时文件后替换原文件，文件被占用时稍后重试；
+    完成后提交页面图片任务（pdf_rasterize），用优化后的文件渲染
+
+    两步依次执行：渲染时 PyMuPDF 打开着文件，同时替换原文件在 Windows 上会失败。
+    优化前后的大小、显示第1页需要的字节数和渲染耗时保存到 DisplayFile.pdf_metrics。
     """
+    abs_path = os.path.join(current_app.root_path, '..', file_path)
+    if not os.path.exists(abs_path):
+        raise FileNotFoundError(f'文件不存在: {file_path}')
+
+    ctx.progress(10, "正在优化PDF")
+    config = current_app.config
     try:
-        # 检查PyPDF2是否已安装
-        try:
-            from PyPDF2 import PdfReader, PdfWriter
-        except ImportError:
-            print("PyPDF2 not available, skipping linearization")
-            # 如果PyPDF2未安装，直接复制原文件
-            import shutil
-            shutil.copy2(input_path, output_path)
-            return True
-
-        # 读取并重新写入PDF，以优化结构
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-
-        # 复制所有页面
-        for page in reader.pages:
-            writer.add_page(page)
-
-        # 写入优化的PDF
-        with open(output_path, 'wb') as out_file:
-            writer.write(out_file)
-
-        return True
-    except Exception as e:
-        print(f"PDF线性化失败: {str(e)}")
-        # 如果线性化失败，使用原始文件
-        try:
-            import shutil
-            shutil.copy2(input_path, output_path)
-            return True  # 返回True表示使用原始文件
-        except Exception:
-            return False
+        metrics = optimize_pdf_in_place(
+            abs_path,
+            dpi_threshold=config.get('PDF_IMAGE_DPI_THRESHOLD', 150),
+            dpi_target=config.get('PDF_IMAGE_DPI_TARGET', 120),
+            image_quality=config.get('PDF_IMAGE_QUALITY', 80)
+        )
+    except Exception:
+        if file_id is not None and ctx.is_last_attempt:
+            # 优化最终失败时仍用原文件生成页面图片
+            ctx.submit_followup('pdf_rasterize', {'file_id': file_id})
+        raise
+    metrics['optimized_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    current_app.logger.info(
+        f"PDF优化 {file_path}: {metrics['before']['size']} -> {metrics['after']['size']} 字节，"
+        f"第1页所需 {metrics['before']['first_page_bytes']} -> {metrics['after']['first_page_bytes']} 字节"
+    )
+
+    metrics_json = current_app.json.dumps(metrics)
+    def save_metrics():
+        display_file = DisplayFile.query.filter_by(file_path=file_path).first()
+        if display_file:
+            display_file.pdf_metrics = metrics_json
+    run_write(save_metrics)
+
+    result = {"file_path": file_path, "file_size": metrics['after']['size'], "metrics": metrics}
+    if file_id is not None:
+        # 逐页渲染为图片并自动填写页数，进度通过 /api/jobs/<pages_job_id> 查询
+        result['pages_job_id'] = ctx.submit_followup('pdf_rasterize', {'file_id': file_id})
+    ctx.progress(100, "PDF优化完成" if metrics['replaced'] else "PDF无需优化，保留原文件")
+    return result
+
+@job_handler('pdf_rasterize', max_attempts=3)
+def run_pdf_rasterize_job(ctx, file_id):
+    """后台任务：把PDF逐页渲染为低、高两种分辨率的图片，并写入页数"""
+    display_file = db.session.get(DisplayFile, file_id)
+    if display_file is None:
+        raise FileNotFoundError(f'展示文件不存在: {file_id}')
+    file_path, file_uuid = display_file.file_path, display_file.uuid
+    db.session.rollback()
+
+    if load_pymupdf() is None:
+        ctx.progress(100, "未安装PyMuPDF，跳过页面图片生成")
+        return {"page_count": None}
+
+    base_path = os.path.join(current_app.root_path, '..')
+    abs_path = os.path.join(base_path, file_path)
+    if not os.path.exists(abs_path):
+        raise FileNotFoundError(f'文件不存在: {file_path}')
+
+    ctx.progress(0, "正在生成页面图片")
+    page_count = render_display_file_pages(base_path, abs_path, file_uuid, progress=ctx.progress)
+
+    def save_page_count():
+        display_file = db.session.get(DisplayFile, file_id)
+        if display_file:
+            display_file.page_count = page_count
+    run_write(save_page_count)
 
-# 展示文件上传目录
-DISPLAY_FILE_FOLDER = 'assets/DisplayFiles'
+    ctx.progress(100, "页面图片生成完成")
+    return {"page_count": page_count, "qualities": list(get_page_dpis())}
 
 def create_display_file_directories():
     """创建展示文件目录"""
@@ -193,16 +244,9 @@ def upload_display_file():
 
             os.makedirs(group_path, exist_ok=True)
 
-            # 先对上传的文件按原始文件名进行自然排序
-            import re
-            def natural_sort_key(file_obj):
-                if file_obj.filename == '':
-                    return ''
-                filename = secure_filename(file_obj.filename)
-                return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', filename)]
-
             # 按原始文件名进行自然排序
-            sorted_files = sorted([f for f in files if f.filename != ''], key=natural_sort_key)
+            sorted_files = sorted([f for f in files if f.filename != ''],
+                                  key=lambda file_obj: natural_sort_key(secure_filename(file_obj.filename)))
 
             # 生成一个统一的UUID前缀
             common_uuid_prefix = str(uuid.uuid4())
@@ -221,10 +265,18 @@ def upload_display_file():
                 file.save(save_path)
                 saved_files.append(unique_filename)
 
+            # 后台生成缩略图和中图，列表和手机端不必下载原图
+            get_image_derivatives().submit_renditions(
+                f"{DISPLAY_FILE_FOLDER}/{group_folder}/{name}" for name in saved_files)
+
             # 存储文件夹路径
             file_path_to_store = os.path.join(DISPLAY_FILE_FOLDER, group_folder)
             original_filename = f"{len(saved_files)}张图片"
 
+            # 图片清单（顺序、尺寸、大小、缩略图地址），查看图片组时不再扫描文件夹
+            image_manifest = dump_manifest(build_image_group_manifest(
+                os.path.join(current_app.root_path, '..'), f"{DISPLAY_FILE_FOLDER}/{group_folder}", saved_files))
+
             # 将图片数量写入页数字段
             pages = len(saved_files)
         else:
@@ -237,8 +289,7 @@ def upload_display_file():
             # 保存文件
             file.save(save_path)
 
-            # 如果是PDF文件，进行线性化处理
-            file_ext = file.filename.rsplit('.', 1)[1].lower()
+            # PDF文件在记录创建后提交后台线性化任务
             file_path_to_store = os.path.join(DISPLAY_FILE_FOLDER, unique_filename)
 
         # 创建数据库记录
@@ -248,16 +299,24 @@ def upload_display_file():
             file_path=file_path_to_store,
             original_filename=original_filename,
             page_count=len(saved_files) if file_type == 'image_group' else None,  # 为图片组设置页数
+            image_manifest=image_manifest if file_type == 'image_group' else None,
             created_by=current_user.name if current_user else 'Unknown'
         )
 
         db.session.add(display_file)
         db.session.commit()
 
+        data = display_file.to_dict()
+        if file_type == 'pdf':
+            # PDF优化（压缩、线性化）在后台执行，不阻塞上传请求，进度通过 /api/jobs/<job_id> 查询；
+            # 优化完成后再逐页渲染为图片，页面图片任务ID在该任务结果的 pages_job_id 中
+            data['job_id'] = submit_job('pdf_linearize', {'file_path': file_path_to_store,
+                                                          'file_id': display_file.id})
+
         return jsonify({
             "code": 200,
             "msg": "展示文件上传成功",
-            "data": display_file.to_dict()
+            "data": data
         })
     except Exception as e:
         db.session.rollback()
@@ -269,6 +328,7 @@ def upload_display_file():
 
 @display_file_bp.route('/display-file/list', methods=['GET'])
 @login_required
+@conditional_get(DisplayFile.__tablename__)
 def get_display_file_list():
     """获取展示文件列表"""
     try:
@@ -349,8 +409,17 @@ def get_display_file_by_uuid(uuid):
 
 @display_file_bp.route('/display-file/<string:uuid>/images', methods=['GET'])
 def get_image_group(uuid):
-    """获取图片组中的所有图片（用于前端展示）"""
+    """获取图片组中的所有图片（用于前端展示），按上传时的清单返回，结果缓存在进程内"""
     try:
+        cached = get_cached_image_group(uuid)
+        if cached is not None:
+            return jsonify({
+                "code": 200,
+                "msg": "获取图片组成功",
+                "data": cached
+            })
+
+        versions = image_group_versions()
         display_file = DisplayFile.query.filter_by(uuid=uuid).first_or_404()
 
         if display_file.file_type != 'image_group':
@@ -360,51 +429,103 @@ def get_image_group(uuid):
                 "data": None
             }), 400
 
-        # 获取图片组文件夹路径
-        file_path = display_file.file_path
-        group_path = os.path.join(current_app.root_path, '..', file_path)
+        if display_file.image_manifest:
+            manifest = json.loads(display_file.image_manifest)
+        else:
+            # 旧图片组没有清单：扫描文件夹生成一次并保存
+            base_path = os.path.join(current_app.root_path, '..')
+            file_path = display_file.file_path.replace('\\', '/')
+            if not os.path.exists(os.path.join(base_path, file_path)):
+                return jsonify({
+                    "code": 400,
+                    "msg": "图片组文件夹不存在",
+                    "data": None
+                }), 400
+            manifest = scan_image_group(base_path, file_path)
+            display_file.image_manifest = dump_manifest(manifest)
+            db.session.commit()
+            versions = image_group_versions()
 
-        if not os.path.exists(group_path):
+        data = image_group_data(display_file, manifest)
+        cache_image_group(uuid, versions, data)
+        return jsonify({
+            "code": 200,
+            "msg": "获取图片组成功",
+            "data": data
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            "code": 500,
+            "msg": f"获取图片组失败: {str(e)}",
+            "data": None
+        }), 500
+
+@display_file_bp.route('/display-file/<string:uuid>/pages/<int:page_number>', methods=['GET'])
+def get_pdf_page_image(uuid, page_number):
+    """获取PDF某一页的图片（用于前端展示，不需登录），参数 quality=low/high，默认 high"""
+    try:
+        display_file = DisplayFile.query.filter_by(uuid=uuid).first()
+        if not display_file:
+            return jsonify({
+                "code": 404,
+                "msg": "展示文件不存在",
+                "data": None
+            }), 404
+
+        if display_file.file_type != 'pdf':
             return jsonify({
                 "code": 400,
-                "msg": "图片组文件夹不存在",
+                "msg": "该文件不是PDF类型",
                 "data": None
             }), 400
 
-        # 获取文件夹中的所有图片文件
-        allowed_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
-        image_files = []
-
-        for filename in os.listdir(group_path):
-            if os.path.splitext(filename)[1].lower() in allowed_extensions:
-                image_files.append(filename)
-
-        # 按文件名自然排序（处理数字排序如 1,2,3,10 而不是 1,10,2,3）
-        import re
-        def natural_sort_key(s):
-            return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', s)]
-        image_files.sort(key=natural_sort_key)
-        # 构建图片URL列表 - 使用新的静态文件服务路由
-        image_urls = []
-        for img_file in image_files:
-            # 提取文件夹名称并构建正确的URL路径
-            folder_name = os.path.basename(file_path)
-            image_urls.append(f"/api/assets/DisplayFiles/{folder_name}/{img_file}")
+        dpis = get_page_dpis()
+        quality = request.args.get('quality', 'high')
+        if quality not in dpis:
+            return jsonify({
+                "code": 400,
+                "msg": f"不支持的分辨率: {quality}，可选 {', '.join(dpis)}",
+                "data": None
+            }), 400
 
+        if page_number < 1 or (display_file.page_count and page_number > display_file.page_count):
+            return jsonify({
+                "code": 404,
+                "msg": f"页码超出范围: {page_number}",
+                "data": None
+            }), 404
+
+        base_path = os.path.join(current_app.root_path, '..')
+        pdf_path = os.path.join(base_path, display_file.file_path)
+        if not os.path.exists(pdf_path):
+            return jsonify({
+                "code": 404,
+                "msg": "PDF文件不存在",
+                "data": None
+            }), 404
+
+        # 页面图片通常已由后台任务生成，尚未生成时按需渲染该页
+        image_path = get_page_image(base_path, pdf_path, display_file.uuid, page_number, quality)
+        if image_path is None:
+            return jsonify({
+                "code": 404,
+                "msg": f"页码超出范围: {page_number}",
+                "data": None
+            }), 404
+
+        return send_file_response(image_path, 'image/jpeg', relative_path=os.path.relpath(image_path, base_path),
+                                  max_age=current_app.config.get('IMAGE_DERIVATIVE_MAX_AGE', 86400))
+    except PyMuPDFMissingError as e:
         return jsonify({
-            "code": 200,
-            "msg": "获取图片组成功",
-            "data": {
-                "uuid": uuid,
-                "title": display_file.title,
-                "total_images": len(image_urls),
-                "images": image_urls
-            }
-        })
+            "code": 503,
+            "msg": str(e),
+            "data": None
+        }), 503
     except Exception as e:
         return jsonify({
             "code": 500,
-            "msg": f"获取图片组失败: {str(e)}",
+            "msg": f"获取PDF页面失败: {str(e)}",
             "data": None
         }), 500
 
@@ -513,6 +634,9 @@ def delete_display_file(file_id):
                 import shutil
                 shutil.rmtree(file_path)
 
+        # 删除PDF的页面图片
+        remove_display_file_pages(os.path.join(current_app.root_path, '..'), display_file.uuid)
+
         # 删除数据库记录
         db.session.delete(display_file)
         db.session.commit()
@@ -533,7 +657,7 @@ def delete_display_file(file_id):
 @display_file_bp.route('/assets/DisplayFiles/<path:filename>')
 def serve_display_files(filename):
     """
-    服务DisplayFiles目录下的静态文件（图片和PDF等）
+    服务DisplayFiles目录下的静态文件（图片和PDF等），图片带参数 w=宽度 或 size=thumb/medium 时返回缩放图
     """
     try:
         # 构建文件路径，确保安全，防止路径遍历攻击
@@ -560,15 +684,20 @@ def serve_display_files(filename):
         # 检查文件扩展名，如果是PDF则使用带Range请求支持的逻辑
         import mimetypes
         mimetype, _ = mimetypes.guess_type(requested_path)
+        relative_path = os.path.relpath(requested_path, os.path.join(current_app.root_path, '..'))
         if mimetype == 'application/pdf':
-            # 对PDF文件使用Range请求支持的逻辑
-            return serve_pdf_with_range_support(requested_path, filename)
+            # PDF支持Range请求（PDF.js按需加载页面）
+            return send_file_response(requested_path, mimetype, relative_path=relative_path)
         else:
-            # 对非PDF文件使用普通发送方式
-            from flask import send_file
-            response = send_file(requested_path, mimetype=mimetype)
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            return response
+            # 对非PDF文件使用普通发送方式（图片可按宽度缩放）
+            width, error = parse_width()
+            if error:
+                return jsonify({
+                    "code": 400,
+                    "msg": error,
+                    "data": None
+                }), 400
+            return send_image(relative_path, width, mimetype=mimetype)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -577,78 +706,10 @@ def serve_display_files(filename):
         }), 500
 
 
-def serve_pdf_with_range_support(file_path, original_filename):
-    """
-    服务PDF文件：提供Range请求支持，用于流式加载
-    """
-    try:
-        file_size = os.path.getsize(file_path)
-
-        # 解析Range请求头
-        range_header = request.headers.get('Range')
-        if range_header:
-            try:
-                # 解析Range：bytes=start-end
-                range_part = range_header.replace('bytes=', '')
-                start_str, end_str = range_part.split('-')
-                start = int(start_str) if start_str else 0
-                end = int(end_str) if end_str else file_size - 1
-
-                # 校验Range合法性
-                if start < 0 or end >= file_size or start > end:
-                    return "Requested Range Not Satisfiable", 416
-
-                # 返回206分段数据
-                chunk_size = end - start + 1
-
-                def generate_chunk():
-                    with open(file_path, 'rb') as f:
-                        f.seek(start)
-                        remaining = chunk_size
-                        while remaining > 0:
-                            read_size = min(4096, remaining)
-                            data = f.read(read_size)
-                            if not data:
-                                break
-                            remaining -= read_size
-                            yield data
-
-                from flask import Response
-                response = Response(generate_chunk(), status=206, mimetype='application/pdf')
-                response.headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-                response.headers['Accept-Ranges'] = 'bytes'
-                response.headers['Content-Length'] = str(chunk_size)
-                response.headers['Access-Control-Allow-Origin'] = '*'
-                response.headers['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length, Content-Type'
-                return response
-
-            except Exception as e:
-                return f"Range解析失败：{str(e)}", 400
-        else:
-            # 首次请求：直接返回完整文件，但告知支持Range
-            from flask import send_file
-            response = send_file(
-                file_path,
-                mimetype='application/pdf',
-                as_attachment=False
-            )
-            response.headers['Accept-Ranges'] = 'bytes'  # 保留Range支持
-            response.headers['Content-Length'] = str(file_size)
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            response.headers['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length, Content-Type'
-            return response
-    except Exception as e:
-        return jsonify({
-            "code": 500,
-            "msg": f"PDF文件服务错误: {str(e)}",
-            "data": None
-        }), 500
-
-
 @display_file_bp.route('/display-file/file/<path:filename>')
 def serve_display_file(filename):
     """
-    服务PDF文件：保留Range支持，首次请求返回完整文件（避免解析失败）
+    服务PDF文件：支持Range请求，首次请求返回完整文件（避免解析失败）
     """
     try:
         # 从路径中提取真正的文件名
@@ -670,62 +731,9 @@ def serve_display_file(filename):
                 "data": None
             }), 404
 
-        file_size = os.path.getsize(full_path)
-
-        # 解析Range请求头（后续页面加载用）
-        range_header = request.headers.get('Range')
-        if range_header:
-            try:
-                # 解析Range：bytes=start-end
-                range_part = range_header.replace('bytes=', '')
-                start_str, end_str = range_part.split('-')
-                start = int(start_str) if start_str else 0
-                end = int(end_str) if end_str else file_size - 1
-
-                # 校验Range合法性
-                if start < 0 or end >= file_size or start > end:
-                    return "Requested Range Not Satisfiable", 416
-
-                # 返回206分段数据（后续页面加载）
-                chunk_size = end - start + 1
-
-                def generate_chunk():
-                    with open(full_path, 'rb') as f:
-                        f.seek(start)
-                        remaining = chunk_size
-                        while remaining > 0:
-                            read_size = min(4096, remaining)
-                            data = f.read(read_size)
-                            if not data:
-                                break
-                            remaining -= read_size
-                            yield data
-
-                from flask import Response
-                response = Response(generate_chunk(), status=206, mimetype='application/pdf')
-                response.headers['Content-Range'] = f'bytes {start}-{end}/{file_size}'
-                response.headers['Accept-Ranges'] = 'bytes'
-                response.headers['Content-Length'] = str(chunk_size)
-                response.headers['Access-Control-Allow-Origin'] = '*'
-                response.headers['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length, Content-Type'
-                return response
-
-            except Exception as e:
-                return f"Range解析失败：{str(e)}", 400
-        else:
-            # 首次请求：直接返回完整文件（避免解析失败）
-            # 关键：返回200状态码，但告知支持Range
-            from flask import send_file
-            response = send_file(
-                full_path,
-                mimetype='application/pdf',
-                as_attachment=False
-            )
-            response.headers['Accept-Ranges'] = 'bytes'  # 保留Range支持
-            response.headers['Content-Length'] = str(file_size)
-            response.headers['Access-Control-Allow-Origin'] = '*'
-            response.headers['Access-Control-Expose-Headers'] = 'Content-Range, Accept-Ranges, Content-Length, Content-Type'
-            return response
+        # Range（含末尾范围、多范围）、If-Range 和条件请求由统一的文件响应处理
+        relative_path = os.path.relpath(full_path, os.path.join(current_app.root_path, '..'))
+        return send_file_response(full_path, 'application/pdf', relative_path=relative_path)
     except Exception as e:
         return jsonify({
             "code": 500,
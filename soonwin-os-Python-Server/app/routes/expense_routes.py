@@ -1,19 +1,17 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from app.models.expense import Expense, ExpenseAllocation, ExpenseCalculationRecord, AnnualTarget, IndividualExpense
-from app.models.order import Order
 from app.utils.auth_utils import require_admin
+from app.utils.allocation_utils import (
+    ExpenseAllocationService, reallocate_expense, release_expense_allocations, sync_allocation_base
+)
+from app.utils.summary_utils import get_yearly_summary, serialize_yearly_summary
+from app.utils.write_queue_utils import run_write, serialized_write
+from app.utils.job_utils import JOB_FAILED, job_handler, submit_job, wait_for_job, job_accepted_data
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
 from datetime import datetime, date, timedelta
-import json
-from decimal import Decimal
 
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return json.JSONEncoder.default(self, obj)
-
 
 def serialize_expense(expense):
     """将费用对象转换为字典格式"""
@@ -116,104 +114,16 @@ def get_expenses():
                 end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
                 query = query.filter(Expense.create_time < end_datetime)
     
-            # 计算总数
-            total = query.count()
-    
-            # 应用分页和排序
-            expenses = query.order_by(Expense.create_time.desc()).offset((page - 1) * size).limit(size).all()
+            # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+            expenses, total, next_cursor = paginate_query(query, Expense.create_time, Expense.id, page, size)
     
             # 序列化费用数据
             expenses_list = [serialize_expense(expense) for expense in expenses]
     
-            # 获取该年份的费用汇总信息
-            # 获取该年份的总开支（正数）和总收入（负数的绝对值）
-            total_expenses_query = db.session.query(
-                db.func.sum(Expense.amount)
-            ).filter(
-                Expense.target_year == target_year,
-                Expense.expense_type == '全面分摊'
-            )
-            # 分别计算总开支和总收入
-            total_expenses_raw = db.session.query(Expense.amount).filter(
-                Expense.target_year == target_year,
-                Expense.expense_type == '全面分摊'
-            ).all()
-    
-            total_expenditure = float(sum(amount for amount, in total_expenses_raw if amount > 0)) if total_expenses_raw else 0.0  # 总开支
-            total_income = float(sum(amount for amount, in total_expenses_raw if amount < 0)) if total_expenses_raw else 0.0  # 总收入
-    
-            # 获取该年份的订单数量
-            total_orders = db.session.query(
-                db.func.count(Order.id)
-            ).filter(
-                db.extract('year', Order.create_time) == target_year
-            ).scalar() or 0
-    
-            # 获取该年份的订单总金额（合同价）
-            total_order_amount = db.session.query(
-                db.func.sum(Order.contract_amount)
-            ).filter(
-                db.extract('year', Order.create_time) == target_year
-            ).scalar()
-            total_order_amount = float(total_order_amount) if total_order_amount is not None else 0.0
-    
-            # 获取该年份的订单总成本（机器成本）
-            machine_cost_amount = db.session.query(
-                db.func.sum(Order.machine_cost)
-            ).filter(
-                db.extract('year', Order.create_time) == target_year
-            ).scalar()
-            machine_cost_amount = float(machine_cost_amount) if machine_cost_amount is not None else 0.0
-    
-            # 总运营成本（租金、水电、网络运营、人力、额外费用等）
-            total_expenses = total_expenses_query.scalar()
-            total_expenses = float(total_expenses) if total_expenses is not None else 0.0
-    
-            # 获取该年份的订单总独立费用（每个订单单独承担的费用）
-            individual_cost_amount = db.session.query(
-                db.func.sum(Order.individual_cost)
-            ).filter(
-                db.extract('year', Order.create_time) == target_year
-            ).scalar()
-            individual_cost_amount = float(individual_cost_amount) if individual_cost_amount is not None else 0.0
-    
-            # 获取最近一次计算记录
-            latest_calc = ExpenseCalculationRecord.query.filter(
-                ExpenseCalculationRecord.target_year == target_year
-            ).order_by(ExpenseCalculationRecord.calculation_time.desc()).first()
-    
-            # 获取该年份最后一条费用的创建时间
-            latest_expense = Expense.query.filter(
-                Expense.target_year == target_year
-            ).order_by(Expense.create_time.desc()).first()
-            latest_expense_create_time = latest_expense.create_time.strftime('%Y-%m-%d %H:%M:%S') if latest_expense else None
-    
-            # 获取年度目标
-            annual_target_record = AnnualTarget.query.filter_by(target_year=target_year).first()
-            annual_target = float(annual_target_record.target_amount) if annual_target_record else 10000000.00
-    
-            # 净利 = 合同金额 - 机器成本 - 运营成本 - 个别费用
-            net_profit = total_order_amount - machine_cost_amount - total_expenses - individual_cost_amount
-    
-            # 构建汇总数据
-            summary_data = {
-                "year": target_year,
-                "total_expenses": float(total_expenses),
-                "total_expenditure": float(total_expenditure),
-                "total_income": float(total_income),
-                "total_orders": total_orders,
-                "total_order_amount": float(total_order_amount),
-                "latest_calculation": serialize_calculation_record(latest_calc) if latest_calc else None,
-                "annual_target": annual_target,
-                "machine_cost_amount": float(machine_cost_amount),
-                "individual_cost_amount": float(individual_cost_amount),
-                "net_profit": float(net_profit),
-                "latest_expense_create_time": latest_expense_create_time
-            }
+            # 读取该年份的物化汇总行（随订单/费用变动在同一事务内维护）
+            summary_data = serialize_yearly_summary(get_yearly_summary(target_year))
 
             # 返回统一格式的数据，包含费用列表和年度汇总
-            import json
-            from flask import Response
             response_data = {
                 "code": 200,
                 "msg": "获取费用列表和年度汇总成功",
@@ -222,12 +132,17 @@ def get_expenses():
                     "total": total,
                     "page": page,
                     "size": size,
+                    "next_cursor": next_cursor,
                     "yearly_summary": summary_data
                 }
             }
-            # 使用自定义编码器处理Decimal类型
-            json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-            return Response(json_response, mimetype='application/json')
+            return jsonify(response_data)
+        except InvalidCursorError as e:
+            return jsonify({
+                "code": 400,
+                "msg": str(e),
+                "data": None
+            }), 400
         except Exception as e:
             return jsonify({
                 "code": 500,
@@ -238,6 +153,7 @@ def get_expenses():
 
 @expense_bp.route('/expenses', methods=['POST'])
 @require_admin
+@serialized_write
 def create_expense():
     """创建费用记录"""
     try:
@@ -258,21 +174,21 @@ def create_expense():
             remark=data.get('remark')
         )
         db.session.add(new_expense)
+        db.session.flush()
+
+        # 增量分摊：只为这笔新费用生成分摊记录
+        reallocate_expense(new_expense.id)
         db.session.commit()
 
         # 序列化创建的费用记录
         expense_data = serialize_expense(new_expense)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "费用创建成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -290,16 +206,12 @@ def get_expense(expense_id):
         expense = Expense.query.get_or_404(expense_id)
         expense_data = serialize_expense(expense)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取费用详情成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -310,6 +222,7 @@ def get_expense(expense_id):
 
 @expense_bp.route('/expenses/<int:expense_id>', methods=['PUT'])
 @require_admin
+@serialized_write
 def update_expense(expense_id):
     """更新费用记录"""
     try:
@@ -322,26 +235,28 @@ def update_expense(expense_id):
                 "data": None
             }), 400
 
+        previous_type = expense.expense_type
+
         # 更新费用字段
         if 'name' in data: expense.name = data['name']
         if 'amount' in data: expense.amount = data['amount']
         if 'expense_type' in data: expense.expense_type = data['expense_type']
         if 'target_year' in data: expense.target_year = data['target_year']
         if 'remark' in data: expense.remark = data['remark']
+        db.session.flush()
 
+        # 增量分摊：只重写这笔费用的分摊记录（年份变化时原年份的记录一并撤回）
+        if expense.expense_type == '全面分摊' or previous_type == '全面分摊':
+            reallocate_expense(expense_id)
         db.session.commit()
         expense_data = serialize_expense(expense)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "费用更新成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -353,13 +268,14 @@ def update_expense(expense_id):
 
 @expense_bp.route('/expenses/<int:expense_id>', methods=['DELETE'])
 @require_admin
+@serialized_write
 def delete_expense(expense_id):
     """删除费用记录"""
     try:
         expense = Expense.query.get_or_404(expense_id)
 
-        # 删除相关的费用分摊记录
-        ExpenseAllocation.query.filter_by(expense_id=expense_id).delete()
+        # 删除相关的费用分摊记录，并从订单摊分费用中扣减
+        release_expense_allocations(expense_id)
 
         db.session.delete(expense)
         db.session.commit()
@@ -403,18 +319,13 @@ def get_expense_allocations():
         if order_id:
             query = query.filter(ExpenseAllocation.order_id == order_id)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        allocations = query.order_by(ExpenseAllocation.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        allocations, total, next_cursor = paginate_query(query, ExpenseAllocation.create_time, ExpenseAllocation.id, page, size)
 
         # 序列化费用分摊数据
         allocations_list = [serialize_expense_allocation(allocation) for allocation in allocations]
 
         # 返回统一格式的数据
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取费用分摊列表成功",
@@ -422,12 +333,17 @@ def get_expense_allocations():
                 "list": allocations_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -458,18 +374,13 @@ def get_calculation_records():
         if status:
             query = query.filter(ExpenseCalculationRecord.status == status)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        records = query.order_by(ExpenseCalculationRecord.calculation_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        records, total, next_cursor = paginate_query(query, ExpenseCalculationRecord.calculation_time, ExpenseCalculationRecord.id, page, size)
 
         # 序列化计算记录数据
         records_list = [serialize_calculation_record(record) for record in records]
 
         # 返回统一格式的数据
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取费用计算记录列表成功",
@@ -477,12 +388,17 @@ def get_calculation_records():
                 "list": records_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -491,10 +407,44 @@ def get_calculation_records():
         }), 500
 
 
+def record_failed_calculation(target_year, error):
+    """写入失败的计算记录"""
+    db.session.add(ExpenseCalculationRecord(
+        calculation_time=datetime.now(),
+        target_year=target_year,
+        status='failed',
+        remark=f'费用分摊计算失败: {error}'
+    ))
+
+
+@job_handler('expense_allocation', max_attempts=2)
+def run_expense_allocation_job(ctx, target_year):
+    """后台任务：计算并写入指定年度的费用分摊（整个计算作为一个写操作交给写线程执行）"""
+    ctx.progress(10, f"正在计算{target_year}年费用分摊")
+
+    def calculate():
+        service = ExpenseAllocationService(target_year)
+        service.run(allocated_remark="成功为{total_expenses}笔费用分摊到{total_orders}个订单")
+        return service.message("费用分摊计算完成"), service.response_data()
+
+    try:
+        message, data = run_write(calculate)
+    except Exception as e:
+        run_write(record_failed_calculation, target_year, str(e))
+        raise
+    ctx.progress(100, message)
+    return data
+
+
 @expense_bp.route('/calculate-expense-allocations', methods=['POST'])
 @require_admin
 def calculate_expense_allocations():
-    """计算费用分摊 - 按订单金额比例分摊到指定年度的所有订单"""
+    """
+    计算费用分摊 - 按订单金额比例分摊到指定年度的所有订单
+
+    实际计算作为后台任务执行：请求头带 Prefer: respond-async 时立即返回202和任务ID，
+    否则在 JOB_SYNC_WAIT 秒内完成时按原格式返回计算结果。
+    """
     try:
         data = request.get_json()
         if not data:
@@ -512,205 +462,39 @@ def calculate_expense_allocations():
                 "data": None
             }), 400
 
-        # 获取年度目标
-        annual_target_record = AnnualTarget.query.filter_by(target_year=target_year).first()
-        if not annual_target_record:
-            # 如果没有找到对应年份的年度目标，则使用默认值创建
-            annual_target_record = AnnualTarget(
-                target_year=target_year,
-                target_amount=10000000.00
-            )
-            db.session.add(annual_target_record)
-            db.session.commit()
-
-        annual_target = float(annual_target_record.target_amount) if annual_target_record.target_amount else 10000000.00
-
-        # 删除该年份的现有分摊记录
-        expense_ids = db.session.query(Expense.id).filter(Expense.target_year == target_year).subquery()
-        db.session.query(ExpenseAllocation).filter(ExpenseAllocation.expense_id.in_(expense_ids)).delete(synchronize_session=False)
-
-        # 获取该年份的所有费用记录
-        expenses = Expense.query.filter(Expense.target_year == target_year, Expense.expense_type == '全面分摊').all()
-
-        if not expenses:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark='该年份没有需要分摊的费用'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
-
+        # 预览模式：只在内存中计算各订单的摊分结果，不写数据库；可传入 annual_target 做假设测算
+        if data.get('preview', False):
+            service = ExpenseAllocationService(target_year, preview=True, annual_target=data.get('annual_target'))
+            service.run()
             return jsonify({
                 "code": 200,
-                "msg": f"该年份({target_year})没有需要分摊的费用",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": 0,
-                    "total_orders": 0,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
+                "msg": service.message("费用分摊预览完成"),
+                "data": service.response_data()
             })
 
-        # 获取该年份的所有订单
-        orders = Order.query.filter(
-            db.extract('year', Order.create_time) == target_year
-        ).all()
-
-        if not orders:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark=f'该年份({target_year})没有订单，无法分摊费用'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
-
+        job_id = submit_job('expense_allocation', {'target_year': target_year})
+        job = wait_for_job(job_id)
+        if job is None:
             return jsonify({
-                "code": 200,
-                "msg": f"该年份({target_year})没有订单，无法分摊费用",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": len(expenses),
-                    "total_orders": 0,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-            })
-
-        # 计算所有订单的总金额
-        total_order_amount = sum(
-            float(order.contract_amount) if order.contract_amount else 0.0
-            for order in orders
-        )
-
-        # 计算摊分总额（年度目标和订单总金额中的较大值）
-        allocation_base = max(annual_target, total_order_amount)
-
-        if allocation_base <= 0:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark=f'该年份({target_year})摊分基础金额为0，无法按比例分摊'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
+                "code": 202,
+                "msg": "费用分摊计算已提交",
+                "data": job_accepted_data(job_id)
+            }), 202
 
+        if job['status'] == JOB_FAILED:
             return jsonify({
-                "code": 200,
-                "msg": f"该年份({target_year})摊分基础金额为0，无法按比例分摊",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": len(expenses),
-                    "total_orders": len(orders),
-                    "total_order_amount": total_order_amount,
-                    "annual_target": annual_target,
-                    "allocation_base": allocation_base,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-            })
-
-        # 对每个费用进行分摊计算
-        for expense in expenses:
-            expense_amount = float(expense.amount) if expense.amount else 0.0
-
-            # 对每个订单进行分摊
-            for order in orders:
-                order_amount = float(order.contract_amount) if order.contract_amount else 0.0
-                if order_amount > 0:
-                    # 按订单金额比例分摊：(当前订单合同金额 / 摊分总额) * 摊分总额
-                    # 实际上是：(当前订单合同金额 / 摊分总额) * expense_amount
-                    allocated_amount = (order_amount / allocation_base) * expense_amount
-
-                    # 创建费用分摊记录
-                    allocation = ExpenseAllocation(
-                        expense_id=expense.id,
-                        order_id=order.id,
-                        allocated_amount=allocated_amount
-                    )
-                    db.session.add(allocation)
-
-        # 创建计算记录
-        calc_record = ExpenseCalculationRecord(
-            calculation_time=datetime.now(),
-            target_year=target_year,
-            status='completed',
-            remark=f'成功为{len(expenses)}笔费用分摊到{len(orders)}个订单'
-        )
-        db.session.add(calc_record)
-
-        # 更新每个订单的proportionate_cost字段
-        for order in orders:
-            order_amount = float(order.contract_amount) if order.contract_amount else 0.0
-            if allocation_base > 0:
-                # 计算该订单的摊分费用总和
-                order_total_expense = sum(
-                    (order_amount / allocation_base) * float(expense.amount) if expense.amount else 0.0
-                    for expense in expenses
-                )
-
-                # 更新订单的摊分费用字段
-                order.proportionate_cost = order_total_expense
-            else:
-                order.proportionate_cost = 0.0
-
-        db.session.commit()
-
-        # 计算订单的总成本
-        total_direct_cost = sum(
-            float(order.machine_cost) if order.machine_cost else 0.0
-            for order in orders
-        )
-
-        # 计算总净利 (订单金额 - 成本 - 摊分费用)
-        total_net_profit = total_order_amount - total_direct_cost - sum(
-            float(expense.amount) if expense.amount else 0.0
-            for expense in expenses
-        )
-
-        # 计算总费用
-        total_expense_amount = sum(
-            float(expense.amount) if expense.amount else 0.0
-            for expense in expenses
-        )
-
-        # 计算总毛利 (订单金额 - 成本)
-        total_gross_profit = total_order_amount - total_direct_cost
+                "code": 500,
+                "msg": f"费用分摊计算失败: {job['error']}",
+                "data": None
+            }), 500
 
         return jsonify({
             "code": 200,
-            "msg": "费用分摊计算完成",
-            "data": {
-                "target_year": target_year,
-                "total_expenses": len(expenses),
-                "total_orders": len(orders),
-                "total_order_amount": total_order_amount,
-                "annual_target": annual_target,
-                "allocation_base": allocation_base,
-                "total_net_profit": total_net_profit,
-                "total_gross_profit": total_gross_profit,
-                "total_direct_cost": total_direct_cost,
-                "total_expense_amount": total_expense_amount,
-                "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-            }
+            "msg": job['message'],
+            "data": job['result']
         })
     except Exception as e:
         db.session.rollback()
-        # 创建失败的计算记录
-        calc_record = ExpenseCalculationRecord(
-            calculation_time=datetime.now(),
-            target_year=target_year if 'target_year' in locals() else data.get('target_year') if 'data' in locals() else 0,
-            status='failed',
-            remark=f'费用分摊计算失败: {str(e)}'
-        )
-        db.session.add(calc_record)
-        db.session.commit()
-
         return jsonify({
             "code": 500,
             "msg": f"费用分摊计算失败: {str(e)}",
@@ -723,101 +507,15 @@ def calculate_expense_allocations():
 def get_yearly_expense_summary(year):
     """获取指定年份的费用汇总信息"""
     try:
-        # 获取该年份的总开支（正数）和总收入（负数的绝对值）
-        total_expenses_query = db.session.query(
-            db.func.sum(Expense.amount)
-        ).filter(
-            Expense.target_year == year,
-            Expense.expense_type == '全面分摊'
-        )
-        # 分别计算总开支和总收入
-        total_expenses_raw = db.session.query(Expense.amount).filter(
-            Expense.target_year == year,
-            Expense.expense_type == '全面分摊'
-        ).all()
-
-        total_expenditure = float(sum(amount for amount, in total_expenses_raw if amount > 0)) if total_expenses_raw else 0.0  # 总开支
-        total_income = float(sum(amount for amount, in total_expenses_raw if amount < 0)) if total_expenses_raw else 0.0  # 总收入
-
-        # 获取该年份的订单数量
-        total_orders = db.session.query(
-            db.func.count(Order.id)
-        ).filter(
-            db.extract('year', Order.create_time) == year
-        ).scalar() or 0
-
-        # 获取该年份的订单总金额（合同价）
-        total_order_amount = db.session.query(
-            db.func.sum(Order.contract_amount)
-        ).filter(
-            db.extract('year', Order.create_time) == year
-        ).scalar()
-        total_order_amount = float(total_order_amount) if total_order_amount is not None else 0.0
-
-        # 获取该年份的订单总成本（机器成本）
-        machine_cost_amount = db.session.query(
-            db.func.sum(Order.machine_cost)
-        ).filter(
-            db.extract('year', Order.create_time) == year
-        ).scalar()
-        machine_cost_amount = float(machine_cost_amount) if machine_cost_amount is not None else 0.0
-
-        # 总运营成本（租金、水电、网络运营、人力、额外费用等）
-        total_expenses = total_expenses_query.scalar()
-        total_expenses = float(total_expenses) if total_expenses is not None else 0.0
-
-        # 获取该年份的订单总独立费用（每个订单单独承担的费用）
-        individual_cost_amount = db.session.query(
-            db.func.sum(Order.individual_cost)
-        ).filter(
-            db.extract('year', Order.create_time) == year
-        ).scalar()
-        individual_cost_amount = float(individual_cost_amount) if individual_cost_amount is not None else 0.0
-
-        # 获取该年份最后一条费用的创建时间
-        latest_expense = Expense.query.filter(
-            Expense.target_year == year
-        ).order_by(Expense.create_time.desc()).first()
-        latest_expense_create_time = latest_expense.create_time.strftime('%Y-%m-%d %H:%M:%S') if latest_expense else None
-
-        # 获取最近一次计算记录
-        latest_calc = ExpenseCalculationRecord.query.filter(
-            ExpenseCalculationRecord.target_year == year
-        ).order_by(ExpenseCalculationRecord.calculation_time.desc()).first()
-
-        # 获取年度目标
-        annual_target_record = AnnualTarget.query.filter_by(target_year=year).first()
-        annual_target = float(annual_target_record.target_amount) if annual_target_record else 10000000.00
-
-        # 净利 = 合同金额 - 机器成本 - 运营成本 - 个别费用
-        net_profit = total_order_amount - machine_cost_amount - total_expenses - individual_cost_amount
-
-        # 构建汇总数据
-        summary_data = {
-            "year": year,
-            "total_expenses": float(total_expenses),
-            "total_expenditure": float(total_expenditure),
-            "total_income": float(total_income),
-            "total_orders": total_orders,
-            "total_order_amount": float(total_order_amount),
-            "latest_calculation": serialize_calculation_record(latest_calc) if latest_calc else None,
-            "annual_target": annual_target,
-            "machine_cost_amount": float(machine_cost_amount),
-            "individual_cost_amount": float(individual_cost_amount),
-            "net_profit": float(net_profit),
-            "latest_expense_create_time": latest_expense_create_time
-        }
+        # 读取该年份的物化汇总行（随订单/费用变动在同一事务内维护）
+        summary_data = serialize_yearly_summary(get_yearly_summary(year))
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": f"获取{year}年费用汇总成功",
             "data": summary_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -845,17 +543,12 @@ def get_annual_targets():
         if target_year:
             query = query.filter(AnnualTarget.target_year == target_year)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        annual_targets = query.order_by(AnnualTarget.target_year.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        annual_targets, total, next_cursor = paginate_query(query, AnnualTarget.target_year, AnnualTarget.id, page, size)
 
         # 序列化数据
         annual_targets_list = [serialize_annual_target(target) for target in annual_targets]
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取年度目标列表成功",
@@ -863,12 +556,17 @@ def get_annual_targets():
                 "list": annual_targets_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -913,21 +611,21 @@ def create_annual_target():
             target_amount=data.get('target_amount', 10000000.00)
         )
         db.session.add(new_target)
+        db.session.flush()
+
+        # 年度目标变化可能改变摊分基数
+        sync_allocation_base(new_target.target_year, '年度目标变动')
         db.session.commit()
 
         # 序列化创建的年度目标记录
         target_data = serialize_annual_target(new_target)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "年度目标创建成功",
             "data": target_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -951,25 +649,27 @@ def update_annual_target(target_id):
                 "data": None
             }), 400
 
+        previous_year = annual_target.target_year
+
         # 更新年度目标字段
         if 'target_year' in data:
             annual_target.target_year = data['target_year']
         if 'target_amount' in data:
             annual_target.target_amount = data['target_amount']
+        db.session.flush()
 
+        # 年度目标变化可能改变摊分基数（修改年份时新旧年份都要检查）
+        for affected_year in {previous_year, annual_target.target_year}:
+            sync_allocation_base(affected_year, '年度目标变动')
         db.session.commit()
         target_data = serialize_annual_target(annual_target)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "年度目标更新成功",
             "data": target_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -987,16 +687,12 @@ def get_annual_target(target_id):
         annual_target = AnnualTarget.query.get_or_404(target_id)
         target_data = serialize_annual_target(annual_target)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取年度目标详情成功",
             "data": target_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -1022,16 +718,12 @@ def get_annual_target_by_year(target_year):
 
         target_data = serialize_annual_target(annual_target)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": f"获取{target_year}年年度目标成功",
             "data": target_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -1058,20 +750,19 @@ def update_annual_target_by_year(target_year):
             data = request.get_json()
             if data and 'target_amount' in data:
                 annual_target.target_amount = data['target_amount']
+        db.session.flush()
 
+        # 年度目标变化可能改变摊分基数
+        sync_allocation_base(target_year, '年度目标变动')
         db.session.commit()
         target_data = serialize_annual_target(annual_target)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": f"{target_year}年年度目标更新成功",
             "data": target_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1103,17 +794,12 @@ def get_individual_expenses():
         if name:
             query = query.filter(IndividualExpense.name.contains(name))
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        individual_expenses = query.order_by(IndividualExpense.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        individual_expenses, total, next_cursor = paginate_query(query, IndividualExpense.create_time, IndividualExpense.id, page, size)
 
         # 序列化数据
         expenses_list = [serialize_individual_expense(expense) for expense in individual_expenses]
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取个别费用列表成功",
@@ -1121,12 +807,17 @@ def get_individual_expenses():
                 "list": expenses_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -1137,6 +828,7 @@ def get_individual_expenses():
 
 @expense_bp.route('/individual-expenses', methods=['POST'])
 @require_admin
+@serialized_write
 def create_individual_expense():
     """创建个别费用"""
     try:
@@ -1182,16 +874,12 @@ def create_individual_expense():
         # 更新订单的individual_cost字段
         update_order_individual_cost(order_id)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "个别费用创建成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1203,6 +891,7 @@ def create_individual_expense():
 
 @expense_bp.route('/individual-expenses/<int:expense_id>', methods=['PUT'])
 @require_admin
+@serialized_write
 def update_individual_expense(expense_id):
     """更新个别费用"""
     try:
@@ -1229,16 +918,12 @@ def update_individual_expense(expense_id):
         # 更新订单的individual_cost字段
         update_order_individual_cost(individual_expense.order_id)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "个别费用更新成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1256,16 +941,12 @@ def get_individual_expense(expense_id):
         individual_expense = IndividualExpense.query.get_or_404(expense_id)
         expense_data = serialize_individual_expense(individual_expense)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取个别费用详情成功",
             "data": expense_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -1276,6 +957,7 @@ def get_individual_expense(expense_id):
 
 @expense_bp.route('/individual-expenses/<int:expense_id>', methods=['DELETE'])
 @require_admin
+@serialized_write
 def delete_individual_expense(expense_id):
     """删除个别费用"""
     try:
@@ -1326,8 +1008,6 @@ def get_individual_expenses_by_order(order_id):
         # 计算个别费用总和
         total_individual_cost = sum(float(expense.amount) if expense.amount else 0.0 for expense in individual_expenses)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": f"获取订单 {order_id} 的个别费用列表成功",
@@ -1337,9 +1017,7 @@ def get_individual_expenses_by_order(order_id):
                 "order_id": order_id
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
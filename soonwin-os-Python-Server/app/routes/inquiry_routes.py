@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from app.models.inquiry import Inquiry, InquiryCommunication, InquiryLog
+from app.models.inquiry import Inquiry, InquiryCommunication, InquiryLog, inquiry_schema
 from app.models.totp_user import TotpUser
-from app.models.employee import Employee
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
+from app.utils.serializer_utils import InvalidFieldSetError
+from app.utils.auth_utils import AUTH_EXPIRED, AUTH_MISSING, get_auth_error, get_current_user
 from datetime import datetime
 import json
 from functools import wraps
@@ -15,28 +17,19 @@ def admin_required(f):
     """检查用户是否为管理员的装饰器"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        # 从请求头获取JWT token
-        token = request.headers.get('Authorization')
-        if not token:
+        # 令牌已在请求开始时统一解析（见 auth_utils.load_request_identity）
+        auth_error = get_auth_error()
+        if auth_error == AUTH_MISSING:
             return jsonify({"code": 401, "msg": "未提供访问令牌", "data": None}), 401
-        
-        try:
-            # 去掉 "Bearer " 前缀
-            token = token.replace('Bearer ', '')
-            # 解码JWT token获取用户信息
-            import jwt
-            from config import Config
-            payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            emp_id = payload.get('emp_id')
-            
-            # 查询用户信息 - 使用Employee表而不是TotpUser表
-            user = Employee.query.filter_by(emp_id=emp_id).first()
-            if not user or user.user_role != 'admin':
-                return jsonify({"code": 403, "msg": "权限不足", "data": None}), 403
-        except jwt.ExpiredSignatureError:
+        if auth_error == AUTH_EXPIRED:
             return jsonify({"code": 401, "msg": "令牌已过期", "data": None}), 401
-        except jwt.InvalidTokenError:
+        if auth_error:
             return jsonify({"code": 401, "msg": "无效的令牌", "data": None}), 401
+
+        # 查询用户信息 - 使用Employee表而不是TotpUser表（带缓存）
+        user = get_current_user()
+        if not user or user.user_role != 'admin':
+            return jsonify({"code": 403, "msg": "权限不足", "data": None}), 403
         
         return f(*args, **kwargs)
     return decorated_function
@@ -44,18 +37,9 @@ def admin_required(f):
 
 def get_user_from_token():
     """从JWT token中获取用户信息"""
-    token = request.headers.get('Authorization')
-    if not token:
-        return None
-    
     try:
-        import jwt
-        from config import Config
-        token = token.replace('Bearer ', '')
-        payload = jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=['HS256'])
-        emp_id = payload.get('emp_id')
-        # 使用Employee表而不是TotpUser表
-        return Employee.query.filter_by(emp_id=emp_id).first()
+        # 使用Employee表而不是TotpUser表（带缓存，同一请求内只查询一次）
+        return get_current_user()
     except:
         return None
 
@@ -89,6 +73,8 @@ def get_inquiries():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         inquiry_source = request.args.get('inquiry_source')
+        # 字段集：list 只返回表格显示的列，detail（默认）与询盘详情一致，export 用于导出
+        field_set = inquiry_schema.request_field_set('detail')
         
         # 检查用户权限
         current_user = get_user_from_token()
@@ -99,8 +85,8 @@ def get_inquiries():
                 "data": None
             }), 401
         
-        # 构建查询
-        query = Inquiry.query
+        # 构建查询（只加载字段集需要的列，创建人信息一次批量加载）
+        query = inquiry_schema.apply(Inquiry.query, field_set, Inquiry.create_time)
         
         # 检查是否为管理员，如果不是管理员则只允许查看自己创建的数据
         if current_user.user_role != 'admin':
@@ -126,14 +112,11 @@ def get_inquiries():
             end_datetime = datetime.strptime(end_date, '%Y-%m-%d').date()
             query = query.filter(Inquiry.inquiry_date <= end_datetime)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        inquiries = query.order_by(Inquiry.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        inquiries, total, next_cursor = paginate_query(query, Inquiry.create_time, Inquiry.id, page, size)
 
         # 序列化询盘数据
-        inquiries_list = [inquiry.to_dict() for inquiry in inquiries]
+        inquiries_list = inquiry_schema.dump_many(inquiries, field_set)
 
         # 返回统一格式的数据
         response_data = {
@@ -143,10 +126,17 @@ def get_inquiries():
                 "list": inquiries_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
         return jsonify(response_data)
+    except (InvalidCursorError, InvalidFieldSetError) as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -438,11 +428,8 @@ def get_inquiry_communications(inquiry_id):
         # 构建查询
         query = InquiryCommunication.query.filter_by(inquiry_id=inquiry_id)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        communications = query.order_by(InquiryCommunication.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        communications, total, next_cursor = paginate_query(query, InquiryCommunication.create_time, InquiryCommunication.id, page, size)
 
         # 序列化沟通记录数据
         communications_list = [comm.to_dict() for comm in communications]
@@ -454,10 +441,17 @@ def get_inquiry_communications(inquiry_id):
                 "list": communications_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
         return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -669,11 +663,8 @@ def get_inquiry_logs():
             end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + datetime.timedelta(days=1)
             query = query.filter(InquiryLog.create_time < end_datetime)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        logs = query.order_by(InquiryLog.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        logs, total, next_cursor = paginate_query(query, InquiryLog.create_time, InquiryLog.id, page, size)
 
         # 序列化日志数据
         logs_list = [log.to_dict() for log in logs]
@@ -685,10 +676,17 @@ def get_inquiry_logs():
                 "list": logs_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
         return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
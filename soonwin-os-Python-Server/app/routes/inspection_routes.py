@@ -1,15 +1,20 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
 from app.models.order_inspection import OrderInspection, InspectionItem, OrderInspectionStatusLog
-from app.models.order import Order
-from app.models.employee import Employee
+from app.models.order import Order, order_schema
+from app.utils.write_queue_utils import WriteQueueFullError, run_write
+from app.utils.job_utils import JOB_FAILED, job_handler, submit_job, wait_for_job, job_accepted_data
+from app.utils.auth_utils import get_employee_identity
+from app.utils.file_ops_utils import get_file_ops
+from app.utils.blob_store_utils import blob_store_enabled, is_blob_path
+from app.utils.image_derivative_utils import get_image_derivatives
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
 from datetime import datetime
-import json
-from decimal import Decimal
-import requests
+from sqlalchemy.orm import load_only
 import os
 import random
 import re
+import time
 
 def sanitize_filename(filename):
     """清理文件名，移除不安全字符"""
@@ -23,28 +28,32 @@ def sanitize_filename(filename):
 # 创建蓝图
 inspection_bp = Blueprint('inspection', __name__)
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return json.JSONEncoder.default(self, obj)
-
-def check_user_role(user_id, required_role='admin'):
-    """检查用户角色"""
-    user = Employee.query.get(user_id)
+def check_user_role(emp_id, required_role='admin'):
+    """检查用户角色（按工号，带缓存）"""
+    user = get_employee_identity(emp_id)
     if not user:
         return False
     return user.user_role == required_role
 
-def move_photos_if_needed(item, contract_no, token):
-    """移动图片到正式位置"""
+def split_photo_paths(photo_path):
+    """拆分逗号分隔的多图路径"""
+    return [path.strip() for path in photo_path.split(',') if path.strip()] if photo_path else []
+
+
+def photos_needing_move(item):
+    """检查项中需要从临时位置移走的图片路径"""
     if not item.photo_path or not getattr(item, '_photo_needs_move', False):
-        return item.photo_path
+        return []
+    return split_photo_paths(item.photo_path)
+
 
-    # 检查检查项的验收记录以获取合同号
-    inspection = OrderInspection.query.get(item.inspection_id)
-    order = Order.query.get(inspection.order_id) if inspection else None
-    contract_no = sanitize_filename(order.contract_no if order and order.contract_no else 'unknown')
+def build_photo_moves(item, contract_no):
+    """生成检查项图片从临时位置移到正式位置的 (源路径, 目标路径) 列表（未启用内容寻址存储时使用）"""
+    photo_paths = photos_needing_move(item)
+    if not photo_paths:
+        return []
+
+    contract_no = sanitize_filename(contract_no or 'unknown')
 
     # 检查检查项的父项以获取类别
     parent_item = None
@@ -54,17 +63,9 @@ def move_photos_if_needed(item, contract_no, token):
     item_category = sanitize_filename(parent_item.item_category if parent_item and parent_item.item_category else item.item_category or 'default_category')
     item_name = sanitize_filename(item.item_name or 'default_item')
     
-    # 分割多个图片路径
-    photo_paths = [path.strip() for path in item.photo_path.split(',') if path.strip()]
-    updated_paths = []
-    
-    # 调用移动API处理每个图片
+    moves = []
     for photo_path in photo_paths:
-        if not photo_path:
-            continue
-            
         # 生成目标路径
-        import time
         timestamp = int(time.time() * 1000)  # 毫秒时间戳
         unique_id = ''.join(random.choices('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789', k=8))
         
@@ -72,42 +73,8 @@ def move_photos_if_needed(item, contract_no, token):
         file_extension = os.path.splitext(photo_path)[1] if os.path.splitext(photo_path)[1] else '.jpg'
         
         target_filename = f"{contract_no}_{item_category}_{item_name}_{unique_id}_{timestamp}{file_extension}"
-        target_path = f"assets/OrderInspection/{contract_no}/{target_filename}"
-        
-        # 调用移动API
-        try:
-            move_url = f"http://192.168.30.70:5000/api/upload/move"
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-            payload = {
-                'source_path': photo_path,
-                'target_path': target_path
-            }
-            
-            response = requests.post(move_url, json=payload, headers=headers)
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('code') == 200:
-                    # 移动成功，使用新路径
-                    updated_path = result.get('data', {}).get('target_path', target_path)
-                    updated_paths.append(updated_path)
-                    print(f"图片移动成功: {photo_path} -> {updated_path}")
-                else:
-                    # 移动失败，保留原路径
-                    updated_paths.append(photo_path)
-                    print(f"图片移动失败: {photo_path}, 错误: {result.get('msg', '未知错误')}")
-            else:
-                # 移动失败，保留原路径
-                updated_paths.append(photo_path)
-                print(f"图片移动API调用失败: {photo_path}, HTTP状态码: {response.status_code}")
-        except Exception as e:
-            print(f"移动图片异常 {photo_path}: {str(e)}")
-            # 移动失败，保留原路径
-            updated_paths.append(photo_path)
-    
-    return ','.join(updated_paths) if updated_paths else None
+        moves.append((photo_path, f"assets/OrderInspection/{contract_no}/{target_filename}"))
+    return moves
 
 
 def calculate_inspection_progress(inspection_id):
@@ -172,8 +139,8 @@ def get_inspection_orders():
         machine_name = request.args.get('machine_name')
         machine_model = request.args.get('machine_model')
 
-        # 构建基础查询
-        base_query = db.session.query(Order)
+        # 构建基础查询（只加载列表显示的订单列）
+        base_query = order_schema.apply(db.session.query(Order), 'inspection_list', Order.create_time)
         
         # 应用筛选条件
         if order_no:
@@ -185,37 +152,33 @@ def get_inspection_orders():
         if machine_model:
             base_query = base_query.filter(Order.machine_model.contains(machine_model))
 
-        # 计算总数
-        total = base_query.count()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        orders, total, next_cursor = paginate_query(base_query, Order.create_time, Order.id, page, size)
 
-        # 应用分页和排序
-        orders = base_query.order_by(Order.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 一次查出本页订单的验收记录（每个订单取最早的一条）
+        inspections = {}
+        if orders:
+            inspection_query = OrderInspection.query.options(load_only(
+                OrderInspection.order_id, OrderInspection.inspection_progress,
+                OrderInspection.completed_items, OrderInspection.total_items
+            )).filter(OrderInspection.order_id.in_([order.id for order in orders])).order_by(OrderInspection.id)
+            for inspection in inspection_query:
+                inspections.setdefault(inspection.order_id, inspection)
 
         # 获取每个订单的验收进度信息
         orders_list = []
         for order in orders:
-            # 获取该订单的验收记录
-            inspection = OrderInspection.query.filter_by(order_id=order.id).first()
-            
-            order_dict = {
-                "id": order.id,
-                "contract_no": order.contract_no,
-                "order_no": order.order_no,
-                "machine_no": order.machine_no,
-                "machine_name": order.machine_name,
-                "machine_model": order.machine_model,
-                "machine_count": order.machine_count,
-                "order_time": order.order_time.strftime('%Y-%m-%d') if order.order_time else None,
-                "ship_time": order.ship_time.strftime('%Y-%m-%d') if order.ship_time else None,
+            inspection = inspections.get(order.id)
+
+            order_dict = order_schema.dump(order, 'inspection_list')
+            order_dict.update({
                 "inspection_id": inspection.id if inspection else None,
                 "inspection_progress": inspection.inspection_progress if inspection else 0,
                 "completed_items": inspection.completed_items if inspection else 0,
                 "total_items": inspection.total_items if inspection else 0,
-            }
+            })
             orders_list.append(order_dict)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取订单验收列表成功",
@@ -223,12 +186,17 @@ def get_inspection_orders():
                 "list": orders_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -267,11 +235,8 @@ def get_inspections():
         if inspection_status:
             query = query.filter(OrderInspection.inspection_status == inspection_status)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        results = query.order_by(OrderInspection.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        results, total, next_cursor = paginate_query(query, OrderInspection.create_time, OrderInspection.id, page, size)
 
         # 序列化数据
         inspections_list = []
@@ -283,8 +248,6 @@ def get_inspections():
             inspection_dict['total_items'] = inspection.total_items
             inspections_list.append(inspection_dict)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取验收列表成功",
@@ -292,12 +255,17 @@ def get_inspections():
                 "list": inspections_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -348,16 +316,12 @@ def get_inspection_detail(inspection_id):
 
         inspection_dict['items'] = items_list
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取验收详情成功",
             "data": inspection_dict
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -386,16 +350,12 @@ def update_inspection(inspection_id):
         db.session.commit()
         inspection_data = inspection.to_dict()
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "验收记录更新成功",
             "data": inspection_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -433,8 +393,6 @@ def get_inspection_items(inspection_id):
             if child.parent_id is None:
                 items_list.append(child.to_dict())
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取检查项列表成功",
@@ -443,9 +401,7 @@ def get_inspection_items(inspection_id):
                 "inspection_id": inspection_id
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -509,16 +465,12 @@ def create_inspection_item(inspection_id):
 
         item_data = new_item.to_dict()
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "检查项创建成功",
             "data": item_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -557,8 +509,6 @@ def update_inspection_item(inspection_id, item_id):
 
         item_data = item.to_dict()
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "检查项更新成功",
@@ -569,9 +519,7 @@ def update_inspection_item(inspection_id, item_id):
                 "total_items": total_items
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -593,8 +541,6 @@ def delete_inspection_item(inspection_id, item_id):
         # 重新计算进度
         progress, completed_items, total_items = calculate_inspection_progress(inspection_id)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "检查项删除成功",
@@ -604,9 +550,7 @@ def delete_inspection_item(inspection_id, item_id):
                 "total_items": total_items
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -625,8 +569,6 @@ def get_inspection_progress(inspection_id):
         # 重新计算并获取进度
         progress, completed_items, total_items = calculate_inspection_progress(inspection_id)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取验收进度成功",
@@ -638,9 +580,7 @@ def get_inspection_progress(inspection_id):
                 "inspection_status": inspection.inspection_status
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -682,8 +622,6 @@ def get_inspection_report(inspection_id):
         # 序列化验收信息
         inspection_dict = inspection.to_dict()
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取验收报告成功",
@@ -698,9 +636,7 @@ def get_inspection_report(inspection_id):
                 }
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -709,9 +645,220 @@ def get_inspection_report(inspection_id):
         }), 500
 
 
+def apply_item_changes(inspection_id, items_data):
+    """
+    批量创建、更新和删除检查项（在写线程中执行）
+
+    Returns:
+        None 表示验收记录不存在；否则为 dict：
+        created_ids / updated_ids / deleted_items（删除前的数据）、
+        photos_to_trash（已删除检查项的照片）、trash_requests（[(检查项ID, 照片路径)]，需要移到DeleteFiles的照片）、
+        move_requests（[(检查项ID, [(源路径, 目标路径)])]，需要存储或移动的照片）、use_blob_store
+    """
+    inspection = OrderInspection.query.get(inspection_id)
+    if not inspection:
+        return None
+
+    created_items = []
+    updated_items = []
+    deleted_items = []
+    
+    # 分离各种操作类型
+    items_to_delete = []
+    items_to_create = []
+    items_to_update = []
+    
+    for item_data in items_data:
+        item_id = item_data.get('id')
+        
+        if item_data.get('_toBeDeleted'):
+            # 检查是否是本地新建的项目，这种项目不应该发送删除请求
+            if item_data.get('is_local_new'):
+                # 本地新建且被删除的项目，无需发送到服务器进行删除操作
+                continue
+            else:
+                items_to_delete.append(item_data)
+        elif item_data.get('is_local_new') or not item_id:
+            items_to_create.append(item_data)
+        else:
+            items_to_update.append(item_data)
+    
+    # 首先，处理删除操作（照片在数据库提交后统一移到DeleteFiles）
+    photos_to_trash = []
+    for item_data in items_to_delete:
+        item_id = item_data.get('id')
+        item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
+        if item:
+            photos_to_trash.extend(split_photo_paths(item.photo_path))
+            
+            # 如果是父项，还需删除其所有子项
+            if item.item_type == 'parent':
+                child_items = InspectionItem.query.filter_by(parent_id=item.id, inspection_id=inspection_id).all()
+                for child in child_items:
+                    photos_to_trash.extend(split_photo_paths(child.photo_path))
+                    db.session.delete(child)
+                    deleted_items.append(child)
+            
+            db.session.delete(item)
+            deleted_items.append(item)
+    
+    # 然后，创建所有新项目并获取它们的ID
+    temp_to_real_id_map = {}  # 临时ID到真实ID的映射
+    created_item_objects = []  # 保存新创建的项目对象及其原始数据
+    
+    # 先创建所有新项目（不设置parent_id，暂时设置为null）
+    for item_data in items_to_create:
+        item_id = item_data.get('id')
+        
+        new_item = InspectionItem(
+            inspection_id=inspection_id,
+            parent_id=None,  # 暂时设置为null
+            item_category=item_data.get('item_category', ''),
+            item_name=item_data.get('item_name', ''),
+            item_type=item_data.get('item_type', 'sub'),
+            inspection_result=item_data.get('inspection_result', 'pending'),
+            photo_path=item_data.get('photo_path'),
+            description=item_data.get('description'),
+            sort_order=item_data.get('sort_order', 0)
+        )
+        # 检查是否需要移动图片
+        new_item._photo_needs_move = item_data.get('_photo_needs_move', False)
+        db.session.add(new_item)
+        db.session.flush()  # 获取新创建项目的ID
+        created_items.append(new_item)
+        
+        # 记录临时ID到真实ID的映射（如果原ID不是None，即为前端生成的临时ID）
+        if item_id is not None:
+            temp_to_real_id_map[item_id] = new_item.id
+        
+        # 保存项目对象和原始数据的映射，用于后续设置parent_id
+        created_item_objects.append({
+            'original_data': item_data,
+            'item_object': new_item
+        })
+    
+    # 更新项目的parent_id关系（对于新建项目）
+    # 使用之前保存的对象引用，而不是通过名称等属性查找
+    for item_info in created_item_objects:
+        item_data = item_info['original_data']
+        created_item = item_info['item_object']
+        
+        parent_id = item_data.get('parent_id')
+        if parent_id is not None:
+            if parent_id in temp_to_real_id_map:
+                # 如果parent_id是临时ID，替换为真实ID
+                created_item.parent_id = temp_to_real_id_map[parent_id]
+            else:
+                # 如果parent_id不是临时ID，直接使用（可能是已存在的项目）
+                created_item.parent_id = parent_id        
+    # 处理更新现有项目
+    for item_data in items_to_update:
+        item_id = item_data.get('id')
+        item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
+        if item:
+            # 检查parent_id是否需要更新
+            parent_id = item_data.get('parent_id')
+            if parent_id is not None:
+                if parent_id in temp_to_real_id_map:
+                    # 如果parent_id是临时ID，替换为真实ID
+                    item.parent_id = temp_to_real_id_map[parent_id]
+                else:
+                    item.parent_id = parent_id
+            else:
+                item.parent_id = item_data.get('parent_id', item.parent_id)
+            
+            item.item_category = item_data.get('item_category', item.item_category)
+            item.item_name = item_data.get('item_name', item.item_name)
+            item.item_type = item_data.get('item_type', item.item_type)
+            item.inspection_result = item_data.get('inspection_result', item.inspection_result)
+            item.photo_path = item_data.get('photo_path', item.photo_path)
+            # 检查是否需要移动图片（通过检查特殊的标记）
+            item._photo_needs_move = item_data.get('_photo_needs_move', False)
+            item.description = item_data.get('description', item.description)
+            item.sort_order = item_data.get('sort_order', item.sort_order)
+            updated_items.append(item)
+
+
+    # 要删除的照片：存储中的文件由引用计数和清理任务回收，直接从检查项中去掉；其余照片提交后移到DeleteFiles
+    trash_requests = []
+    pending_trash = {}
+    for item_data in items_to_update:
+        photos_to_delete = item_data.get('photos_to_delete') or []
+        if not photos_to_delete:
+            continue
+        item = InspectionItem.query.filter_by(id=item_data.get('id'), inspection_id=inspection_id).first()
+        if item:
+            for photo_path in photos_to_delete:
+                if is_blob_path(photo_path):
+                    photo_paths = [p for p in split_photo_paths(item.photo_path) if p != photo_path]
+                    item.photo_path = ','.join(photo_paths) if photo_paths else None
+                else:
+                    trash_requests.append((item.id, photo_path))
+                    pending_trash.setdefault(item.id, set()).add(photo_path)
+
+    # 需要从临时位置移走的图片（新创建和已更新的项）：启用内容寻址存储时存入存储，否则移到验收目录
+    use_blob_store = blob_store_enabled()
+    contract_no = inspection.order.contract_no if inspection.order and not use_blob_store else None
+    move_requests = []
+    for item in created_items + updated_items:
+        moves = photos_needing_move(item) if use_blob_store else build_photo_moves(item, contract_no)
+        if use_blob_store:
+            moves = [(path, None) for path in moves]
+        moves = [move for move in moves if move[0] not in pending_trash.get(item.id, ())]
+        if moves:
+            move_requests.append((item.id, moves))
+        # 清除标记
+        item._photo_needs_move = False
+
+    return {
+        'created_ids': [item.id for item in created_items],
+        'updated_ids': [item.id for item in updated_items],
+        'deleted_items': [item.to_dict() for item in deleted_items],
+        'photos_to_trash': [photo_path for photo_path in photos_to_trash if not is_blob_path(photo_path)],
+        'trash_requests': trash_requests,
+        'move_requests': move_requests,
+        'use_blob_store': use_blob_store
+    }
+
+
+def apply_photo_paths(inspection_id, created_ids, updated_ids, removed_paths, replaced_paths):
+    """
+    照片移动完成后更新检查项的照片路径并重新计算进度（在写线程中执行）
+
+    Args:
+        removed_paths: {检查项ID: 已移到DeleteFiles的照片路径集合}
+        replaced_paths: {检查项ID: {原路径: 新路径}}
+    """
+    for item_id in set(removed_paths) | set(replaced_paths):
+        item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
+        if not item:
+            continue
+        removed = removed_paths.get(item_id, set())
+        replaced = replaced_paths.get(item_id, {})
+        photo_paths = [replaced.get(p, p) for p in split_photo_paths(item.photo_path) if p not in removed]
+        item.photo_path = ','.join(photo_paths) if photo_paths else None
+    db.session.flush()
+
+    progress, completed_items, total_items = calculate_inspection_progress(inspection_id)
+    items = {item.id: item for item in InspectionItem.query.filter(
+        InspectionItem.id.in_(created_ids + updated_ids)).all()}
+    return {
+        'created_items': [items[item_id].to_dict() for item_id in created_ids if item_id in items],
+        'updated_items': [items[item_id].to_dict() for item_id in updated_ids if item_id in items],
+        'progress': progress,
+        'completed_items': completed_items,
+        'total_items': total_items
+    }
+
+
 @inspection_bp.route('/inspections/<int:inspection_id>/items/batch', methods=['POST'])
 def batch_update_inspection_items(inspection_id):
-    """批量创建、更新和删除检查项"""
+    """
+    批量创建、更新和删除检查项
+
+    只有数据库写入交给写线程：先提交检查项的修改，照片的存储、移动和删除在请求线程（文件操作线程池）中完成，
+    最后再提交一次照片路径，避免其他写操作排在文件操作后面等待。
+    """
     try:
         data = request.get_json()
         if not data or 'items' not in data:
@@ -721,369 +868,81 @@ def batch_update_inspection_items(inspection_id):
                 "data": None
             }), 400
 
-        items_data = data['items']
-        inspection = OrderInspection.query.get(inspection_id)
-        if not inspection:
+        changes = run_write(apply_item_changes, inspection_id, data['items'])
+        if changes is None:
             return jsonify({
                 "code": 400,
                 "msg": "验收记录不存在",
                 "data": None
             }), 400
 
-        created_items = []
-        updated_items = []
-        deleted_items = []
-        
-        # 分离各种操作类型
-        items_to_delete = []
-        items_to_create = []
-        items_to_update = []
-        
-        for item_data in items_data:
-            item_id = item_data.get('id')
-            
-            if item_data.get('_toBeDeleted'):
-                # 检查是否是本地新建的项目，这种项目不应该发送删除请求
-                if item_data.get('is_local_new'):
-                    # 本地新建且被删除的项目，无需发送到服务器进行删除操作
+        file_ops = get_file_ops()
+
+        # 已删除检查项的照片移到DeleteFiles（后台执行，不等待）
+        if changes['photos_to_trash']:
+            file_ops.trash_many(changes['photos_to_trash'], wait=False)
+
+        # 要删除的照片全部移到DeleteFiles后，从检查项中去掉移动成功的路径
+        removed_paths = {}
+        trash_requests = changes['trash_requests']
+        if trash_requests:
+            results = file_ops.trash_many([photo_path for _, photo_path in trash_requests])
+            for (item_id, photo_path), result in zip(trash_requests, results):
+                if not result.ok:
+                    print(f"图片文件移动到DeleteFiles失败: {photo_path}, 错误: {result.error}")
                     continue
-                else:
-                    items_to_delete.append(item_data)
-            elif item_data.get('is_local_new') or not item_id:
-                items_to_create.append(item_data)
+                removed_paths.setdefault(item_id, set()).add(photo_path)
+
+        # 所有图片并行存入内容寻址存储（未启用时移到验收目录），全部完成后再更新路径
+        replaced_paths = {}
+        stored_photos = []
+        move_requests = changes['move_requests']
+        if move_requests:
+            all_moves = [move for _, moves in move_requests for move in moves]
+            if changes['use_blob_store']:
+                results = iter(file_ops.store_many([source for source, _ in all_moves]))
             else:
-                items_to_update.append(item_data)
-        
-        # 首先，处理删除操作
-        for item_data in items_to_delete:
-            item_id = item_data.get('id')
-            item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
-            if item:
-                # 如果需要移动照片文件到DeleteFiles
-                if item.photo_path and (item_data.get('_photo_needs_delete', False) or item.photo_path):
-                    # 分割多个图片路径
-                    photo_paths = [path.strip() for path in item.photo_path.split(',') if path.strip()]
-                    
-                    # 获取授权令牌用于调用移动API
-                    auth_header = request.headers.get('Authorization', '')
-                    token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else ''
-                    
-                    # 移动每个图片文件到DeleteFiles文件夹
-                    for photo_path in photo_paths:
-                        try:
-                            import os
-                            filename = os.path.basename(photo_path)
-                            delete_folder = "assets/DeleteFiles"
-                            
-                            # 创建DeleteFiles文件夹如果不存在
-                            os.makedirs(delete_folder, exist_ok=True)
-                            
-                            # 目标路径
-                            target_path = f"{delete_folder}/{filename}"
-                            
-                            # 调用移动API将文件移动到DeleteFiles文件夹
-                            move_url = f"http://192.168.30.70:5000/api/upload/move"
-                            headers = {
-                                'Authorization': f'Bearer {token}',
-                                'Content-Type': 'application/json'
-                            }
-                            payload = {
-                                'source_path': photo_path,
-                                'target_path': target_path
-                            }
-                            
-                            response = requests.post(move_url, json=payload, headers=headers)
-                            if response.status_code == 200:
-                                result = response.json()
-                                if result.get('code') == 200:
-                                    print(f"图片文件已移动到DeleteFiles: {photo_path} -> {target_path}")
-                                else:
-                                    print(f"图片文件移动失败: {photo_path}, 错误: {result.get('msg', '未知错误')}")
-                                    # 移动失败，尝试直接删除
-                                    delete_url = f"http://192.168.30.70:5000/api/upload/delete"
-                                    delete_payload = {
-                                        'path': photo_path
-                                    }
-
-                                    print(f"图片文件移动失败: {photo_path}, 错误: {result.get('msg', '未知错误')}")
-                                    # 移动失败，尝试直接删除
-                                    delete_url = f"http://192.168.30.70:5000/api/upload/delete"
-                                    delete_payload = {
-                                        'path': photo_path
-                                    }
-                                    delete_response = requests.post(delete_url, json=delete_payload, headers=headers)
-                                    if delete_response.status_code == 200:
-                                        delete_result = delete_response.json()
-                                        if delete_result.get('code') == 200:
-                                            print(f"图片文件已删除: {photo_path}")
-                                        else:
-                                            print(f"图片文件删除失败: {photo_path}, 错误: {delete_result.get('msg', '未知错误')}")
-                            else:
-                                print(f"图片移动API调用失败: {photo_path}, HTTP状态码: {response.status_code}")
-                        except Exception as e:
-                            print(f"处理图片文件异常 {photo_path}: {str(e)}")
-                
-                # 如果是父项，还需删除其所有子项
-                if item.item_type == 'parent':
-                    child_items = InspectionItem.query.filter_by(parent_id=item.id, inspection_id=inspection_id).all()
-                    for child in child_items:
-                        # 移动子项的照片文件到DeleteFiles
-                        if child.photo_path:
-                            # 分割多个图片路径
-                            child_photo_paths = [path.strip() for path in child.photo_path.split(',') if path.strip()]
-                            
-                            # 获取授权令牌用于调用移动API
-                            auth_header = request.headers.get('Authorization', '')
-                            token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else ''
-                            
-                            # 移动每个图片文件到DeleteFiles文件夹
-                            for photo_path in child_photo_paths:
-                                try:
-                                    import os
-                                    filename = os.path.basename(photo_path)
-                                    delete_folder = "assets/DeleteFiles"
-                                    
-                                    # 创建DeleteFiles文件夹如果不存在
-                                    os.makedirs(delete_folder, exist_ok=True)
-                                    
-                                    # 目标路径
-                                    target_path = f"{delete_folder}/{filename}"
-                                    
-                                    # 调用移动API将文件移动到DeleteFiles文件夹
-                                    move_url = f"http://192.168.30.70:5000/api/upload/move"
-                                    headers = {
-                                        'Authorization': f'Bearer {token}',
-                                        'Content-Type': 'application/json'
-                                    }
-                                    payload = {
-                                        'source_path': photo_path,
-                                        'target_path': target_path
-                                    }
-                                    
-                                    response = requests.post(move_url, json=payload, headers=headers)
-                                    if response.status_code == 200:
-                                        result = response.json()
-                                        if result.get('code') == 200:
-                                            print(f"子项图片文件已移动到DeleteFiles: {photo_path} -> {target_path}")
-                                        else:
-                                            print(f"子项图片文件移动失败: {photo_path}, 错误: {result.get('msg', '未知错误')}")
-                                            # 移动失败，尝试直接删除
-                                            delete_url = f"http://192.168.30.70:5000/api/upload/delete"
-                                            delete_payload = {
-                                                'path': photo_path
-                                            }
-                                            delete_response = requests.post(delete_url, json=delete_payload, headers=headers)
-                                            if delete_response.status_code == 200:
-                                                delete_result = delete_response.json()
-                                                if delete_result.get('code') == 200:
-                                                    print(f"子项图片文件已删除: {photo_path}")
-                                                else:
-                                                    print(f"子项图片文件删除失败: {photo_path}, 错误: {delete_result.get('msg', '未知错误')}")
-                                    else:
-                                        print(f"子项图片移动API调用失败: {photo_path}, HTTP状态码: {response.status_code}")
-                                except Exception as e:
-                                    print(f"处理子项图片文件异常 {photo_path}: {str(e)}")
-                        
-                        db.session.delete(child)
-                        deleted_items.append(child)
-                
-                db.session.delete(item)
-                deleted_items.append(item)
-        
-        # 然后，创建所有新项目并获取它们的ID
-        temp_to_real_id_map = {}  # 临时ID到真实ID的映射
-        created_item_objects = []  # 保存新创建的项目对象及其原始数据
-        
-        # 先创建所有新项目（不设置parent_id，暂时设置为null）
-        for item_data in items_to_create:
-            item_id = item_data.get('id')
-            
-            new_item = InspectionItem(
-                inspection_id=inspection_id,
-                parent_id=None,  # 暂时设置为null
-                item_category=item_data.get('item_category', ''),
-                item_name=item_data.get('item_name', ''),
-                item_type=item_data.get('item_type', 'sub'),
-                inspection_result=item_data.get('inspection_result', 'pending'),
-                photo_path=item_data.get('photo_path'),
-                description=item_data.get('description'),
-                sort_order=item_data.get('sort_order', 0)
-            )
-            # 检查是否需要移动图片
-            new_item._photo_needs_move = item_data.get('_photo_needs_move', False)
-            db.session.add(new_item)
-            db.session.flush()  # 获取新创建项目的ID
-            created_items.append(new_item)
-            
-            # 记录临时ID到真实ID的映射（如果原ID不是None，即为前端生成的临时ID）
-            if item_id is not None:
-                temp_to_real_id_map[item_id] = new_item.id
-            
-            # 保存项目对象和原始数据的映射，用于后续设置parent_id
-            created_item_objects.append({
-                'original_data': item_data,
-                'item_object': new_item
-            })
-        
-        # 更新项目的parent_id关系（对于新建项目）
-        # 使用之前保存的对象引用，而不是通过名称等属性查找
-        for item_info in created_item_objects:
-            item_data = item_info['original_data']
-            created_item = item_info['item_object']
-            
-            parent_id = item_data.get('parent_id')
-            if parent_id is not None:
-                if parent_id in temp_to_real_id_map:
-                    # 如果parent_id是临时ID，替换为真实ID
-                    created_item.parent_id = temp_to_real_id_map[parent_id]
-                else:
-                    # 如果parent_id不是临时ID，直接使用（可能是已存在的项目）
-                    created_item.parent_id = parent_id        
-        # 处理更新现有项目
-        for item_data in items_to_update:
-            item_id = item_data.get('id')
-            item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
-            if item:
-                # 检查parent_id是否需要更新
-                parent_id = item_data.get('parent_id')
-                if parent_id is not None:
-                    if parent_id in temp_to_real_id_map:
-                        # 如果parent_id是临时ID，替换为真实ID
-                        item.parent_id = temp_to_real_id_map[parent_id]
+                results = iter(file_ops.move_many(all_moves))
+            for item_id, moves in move_requests:
+                for _ in moves:
+                    result = next(results)
+                    if result.ok:
+                        replaced_paths.setdefault(item_id, {})[result.source] = result.target
+                        stored_photos.append(result.target)
                     else:
-                        item.parent_id = parent_id
-                else:
-                    item.parent_id = item_data.get('parent_id', item.parent_id)
-                
-                item.item_category = item_data.get('item_category', item.item_category)
-                item.item_name = item_data.get('item_name', item.item_name)
-                item.item_type = item_data.get('item_type', item.item_type)
-                item.inspection_result = item_data.get('inspection_result', item.inspection_result)
-                item.photo_path = item_data.get('photo_path', item.photo_path)
-                # 检查是否需要移动图片（通过检查特殊的标记）
-                item._photo_needs_move = item_data.get('_photo_needs_move', False)
-                item.description = item_data.get('description', item.description)
-                item.sort_order = item_data.get('sort_order', item.sort_order)
-                updated_items.append(item)
+                        # 移动失败，保留原路径
+                        print(f"图片移动失败: {result.source}, 错误: {result.error}")
 
-        db.session.commit()
-        
-        # 获取授权令牌用于调用移动API和删除API
-        auth_header = request.headers.get('Authorization', '')
-        token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else ''
-        
-        # 处理需要删除的照片文件
-        for item_data in items_to_update:
-            item_id = item_data.get('id')
-            item = InspectionItem.query.filter_by(id=item_id, inspection_id=inspection_id).first()
-            if item:
-                # 获取需要删除的照片路径列表
-                photos_to_delete = item_data.get('photos_to_delete', [])
-                for photo_path in photos_to_delete:
-                    try:
-                        # 构造移动到DeleteFiles的路径
-                        import os
-                        filename = os.path.basename(photo_path)
-                        delete_folder = "assets/DeleteFiles"
-                        
-                        # 创建DeleteFiles文件夹如果不存在
-                        os.makedirs(delete_folder, exist_ok=True)
-                        
-                        # 目标路径
-                        target_path = f"{delete_folder}/{filename}"
-                        
-                        # 调用移动API将文件移动到DeleteFiles文件夹
-                        move_url = f"http://192.168.30.70:5000/api/upload/move"
-                        headers = {
-                            'Authorization': f'Bearer {token}',
-                            'Content-Type': 'application/json'
-                        }
-                        payload = {
-                            'source_path': photo_path,
-                            'target_path': target_path
-                        }
-                        
-                        response = requests.post(move_url, json=payload, headers=headers)
-                        if response.status_code == 200:
-                            result = response.json()
-                            if result.get('code') == 200:
-                                print(f"图片文件已移动到DeleteFiles: {photo_path} -> {target_path}")
-                                # 从当前项目的photo_path中移除已删除的路径
-                                if item.photo_path:
-                                    photo_paths = [p.strip() for p in item.photo_path.split(',') if p.strip() and p != photo_path]
-                                    item.photo_path = ','.join(photo_paths) if photo_paths else None
-                            else:
-                                print(f"图片文件移动失败: {photo_path}, 错误: {result.get('msg', '未知错误')}")
-                                # 移动失败，尝试直接删除
-                                delete_url = f"http://192.168.30.70:5000/api/upload/delete"
-                                delete_payload = {
-                                    'path': photo_path
-                                }
-                                delete_response = requests.post(delete_url, json=delete_payload, headers=headers)
-                                if delete_response.status_code == 200:
-                                    delete_result = delete_response.json()
-                                    if delete_result.get('code') == 200:
-                                        print(f"图片文件已删除: {photo_path}")
-                                        # 从当前项目的photo_path中移除已删除的路径
-                                        if item.photo_path:
-                                            photo_paths = [p.strip() for p in item.photo_path.split(',') if p.strip() and p != photo_path]
-                                            item.photo_path = ','.join(photo_paths) if photo_paths else None
-                                    else:
-                                        print(f"图片文件删除失败: {photo_path}, 错误: {delete_result.get('msg', '未知错误')}")
-                        else:
-                            print(f"图片移动API调用失败: {photo_path}, HTTP状态码: {response.status_code}")
-                    except Exception as e:
-                        print(f"处理图片文件异常 {photo_path}: {str(e)}")
-
-        # 处理图片移动（对新创建的项）
-        for item in created_items:
-            if item._photo_needs_move and item.photo_path:
-                # 移动图片并更新路径
-                new_photo_path = move_photos_if_needed(item, None, token)
-                item.photo_path = new_photo_path
-                # 清除标记
-                item._photo_needs_move = False
-
-        # 处理图片移动（对已更新的项）
-        for item in updated_items:
-            if item._photo_needs_move and item.photo_path:
-                # 移动图片并更新路径
-                new_photo_path = move_photos_if_needed(item, None, token)
-                item.photo_path = new_photo_path
-                # 清除标记
-                item._photo_needs_move = False
-
-        # 提交图片移动后的更改
-        db.session.commit()
+        # 提交图片移动后的路径
+        result = run_write(apply_photo_paths, inspection_id, changes['created_ids'], changes['updated_ids'],
+                           removed_paths, replaced_paths)
 
-        # 重新计算进度
-        progress, completed_items, total_items = calculate_inspection_progress(inspection_id)
+        # 后台生成新照片的缩略图和中图（验收报告、手机端按宽度请求）
+        get_image_derivatives().submit_renditions(stored_photos)
 
         # 返回创建、更新和删除的项目信息
-        created_items_data = [item.to_dict() for item in created_items]
-        updated_items_data = [item.to_dict() for item in updated_items]
-        deleted_items_data = [item.to_dict() for item in deleted_items]
-
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "批量操作成功",
             "data": {
-                "created_items": created_items_data,
-                "updated_items": updated_items_data,
-                "deleted_items": deleted_items_data,
-                "total_created": len(created_items),
-                "total_updated": len(updated_items),
-                "total_deleted": len(deleted_items),
-                "progress": progress,
-                "completed_items": completed_items,
-                "total_items": total_items
+                "created_items": result['created_items'],
+                "updated_items": result['updated_items'],
+                "deleted_items": changes['deleted_items'],
+                "total_created": len(changes['created_ids']),
+                "total_updated": len(changes['updated_ids']),
+                "total_deleted": len(changes['deleted_items']),
+                "progress": result['progress'],
+                "completed_items": result['completed_items'],
+                "total_items": result['total_items']
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except WriteQueueFullError as e:
+        return jsonify({
+            "code": 503,
+            "msg": f"系统繁忙: {str(e)}",
+            "data": None
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1093,9 +952,53 @@ def batch_update_inspection_items(inspection_id):
         }), 500
 
 
+def clear_items(inspection_id):
+    """删除验收记录的全部检查项并重置进度（在写线程中执行），返回 (删除数量, 需要移到DeleteFiles的图片)"""
+    inspection = OrderInspection.query.get(inspection_id)
+    if not inspection:
+        return 0, []
+
+    # 获取所有检查项
+    items = InspectionItem.query.filter_by(inspection_id=inspection_id).all()
+
+    # 所有检查项的图片文件（存储中的文件只减少引用次数）
+    photos_to_trash = [photo_path for item in items for photo_path in split_photo_paths(item.photo_path)
+                       if not is_blob_path(photo_path)]
+
+    # 删除所有检查项
+    for item in items:
+        db.session.delete(item)
+
+    # 重新设置验收记录的进度为0
+    inspection.total_items = 0
+    inspection.completed_items = 0
+    inspection.inspection_progress = 0
+    inspection.inspection_status = 'pending'
+    return len(items), photos_to_trash
+
+
+@job_handler('inspection_clear', max_attempts=2)
+def run_inspection_clear_job(ctx, inspection_id):
+    """后台任务：清空验收检查项，提交后把图片文件移到DeleteFiles"""
+    ctx.progress(10, "正在删除检查项")
+    total_deleted, photos_to_trash = run_write(clear_items, inspection_id)
+
+    if photos_to_trash:
+        ctx.progress(50, f"正在清理{len(photos_to_trash)}张图片")
+        get_file_ops().trash_many(photos_to_trash)
+
+    ctx.progress(100, "验收检查项已清空")
+    return {"total_deleted": total_deleted}
+
+
 @inspection_bp.route('/inspections/<int:inspection_id>/clear', methods=['POST'])
 def clear_inspection_items(inspection_id):
-    """清空验收检查项数据"""
+    """
+    清空验收检查项数据
+
+    作为后台任务执行：请求头带 Prefer: respond-async 时立即返回202和任务ID，
+    否则在 JOB_SYNC_WAIT 秒内完成时按原格式返回结果。
+    """
     try:
         # 验证验收记录是否存在
         inspection = OrderInspection.query.get(inspection_id)
@@ -1106,80 +1009,27 @@ def clear_inspection_items(inspection_id):
                 "data": None
             }), 400
 
-        # 获取所有检查项
-        items = InspectionItem.query.filter_by(inspection_id=inspection_id).all()
-
-        # 获取授权令牌用于调用删除API
-        auth_header = request.headers.get('Authorization', '')
-        token = auth_header.replace('Bearer ', '') if auth_header.startswith('Bearer ') else ''
-
-        # 删除所有检查项的图片文件
-        for item in items:
-            if item.photo_path:
-                # 分割多个图片路径
-                photo_paths = [path.strip() for path in item.photo_path.split(',') if path.strip()]
-                
-                # 删除每个图片文件到DeleteFiles文件夹
-                for photo_path in photo_paths:
-                    try:
-                        # 构建移动到DeleteFiles的路径
-                        filename = os.path.basename(photo_path)
-                        delete_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(photo_path))), 'DeleteFiles')
-                        
-                        # 确保DeleteFiles文件夹存在
-                        os.makedirs(delete_folder, exist_ok=True)
-                        
-                        # 移动文件到DeleteFiles文件夹
-                        source_path = os.path.join('..', '..', photo_path)
-                        target_path = os.path.join(delete_folder, filename)
-                        
-                        # 确保目标目录存在
-                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                        
-                        if os.path.exists(source_path):
-                            import shutil
-                            shutil.move(source_path, target_path)
-                            print(f"图片文件已移动到DeleteFiles: {photo_path} -> {target_path}")
-                        else:
-                            print(f"源文件不存在，尝试直接删除: {source_path}")
-                            # 如果文件不存在，可能在其他地方，调用删除API
-                            delete_url = f"http://192.168.30.70:5000/api/upload/delete"
-                            headers = {
-                                'Authorization': f'Bearer {token}',
-                                'Content-Type': 'application/json'
-                            }
-                            payload = {
-                                'path': photo_path
-                            }
-                            
-                            response = requests.post(delete_url, json=payload, headers=headers)
-                    except Exception as e:
-                        print(f"移动或删除图片文件异常 {photo_path}: {str(e)}")
-
-        # 删除所有检查项
-        for item in items:
-            db.session.delete(item)
-
-        # 重新设置验收记录的进度为0
-        inspection.total_items = 0
-        inspection.completed_items = 0
-        inspection.inspection_progress = 0
-        inspection.inspection_status = 'pending'
+        job_id = submit_job('inspection_clear', {'inspection_id': inspection_id})
+        job = wait_for_job(job_id)
+        if job is None:
+            return jsonify({
+                "code": 202,
+                "msg": "清空验收检查项任务已提交",
+                "data": job_accepted_data(job_id)
+            }), 202
 
-        db.session.commit()
+        if job['status'] == JOB_FAILED:
+            return jsonify({
+                "code": 500,
+                "msg": f"清空验收检查项失败: {job['error']}",
+                "data": None
+            }), 500
 
-        import json
-        from flask import Response
-        response_data = {
+        return jsonify({
             "code": 200,
-            "msg": "验收检查项已清空",
-            "data": {
-                "total_deleted": len(items)
-            }
-        }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+            "msg": job['message'],
+            "data": job['result']
+        })
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -1265,8 +1115,6 @@ def update_inspection_status(inspection_id):
         db.session.commit()
 
         # 返回成功响应
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "验收状态更新成功",
@@ -1277,9 +1125,7 @@ def update_inspection_status(inspection_id):
                 "status_log_id": status_log.id
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -0,0 +1,70 @@
+from flask import Blueprint, jsonify
+
+from app.utils.auth_utils import require_auth, require_admin, get_current_user
+from app.utils.job_utils import (
+    JOB_FAILED, get_job_status, get_job_runner, job_accepted_data
+)
+
+# 创建蓝图
+job_bp = Blueprint('job', __name__)
+
+
+@job_bp.route('/jobs/<string:job_id>', methods=['GET'])
+@require_auth
+def get_job(job_id):
+    """查询后台任务的状态、进度和结果（提交人或管理员可查看）"""
+    try:
+        job = get_job_status(job_id)
+        current_user = get_current_user()
+        if not job or (current_user.user_role != 'admin' and job['created_by'] != current_user.emp_id):
+            return jsonify({
+                "code": 404,
+                "msg": "任务不存在",
+                "data": None
+            }), 404
+
+        return jsonify({
+            "code": 200,
+            "msg": "获取任务状态成功",
+            "data": job
+        })
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"获取任务状态失败: {str(e)}",
+            "data": None
+        }), 500
+
+
+@job_bp.route('/jobs/<string:job_id>/retry', methods=['POST'])
+@require_admin
+def retry_job(job_id):
+    """重新执行失败的后台任务（仅管理员）"""
+    try:
+        job = get_job_status(job_id)
+        if not job:
+            return jsonify({
+                "code": 404,
+                "msg": "任务不存在",
+                "data": None
+            }), 404
+
+        if job['status'] != JOB_FAILED:
+            return jsonify({
+                "code": 400,
+                "msg": "只能重试执行失败的任务",
+                "data": None
+            }), 400
+
+        get_job_runner().retry(job_id)
+        return jsonify({
+            "code": 202,
+            "msg": "任务已重新提交",
+            "data": job_accepted_data(job_id)
+        }), 202
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"重试任务失败: {str(e)}",
+            "data": None
+        }), 500
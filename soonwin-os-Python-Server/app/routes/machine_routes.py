@@ -4,55 +4,74 @@ import json
 from .. import db
 from ..models.machine import Machine, PartType
 from ..utils.json_utils import import_json_data, export_json_data
+from ..utils.pagination_utils import InvalidCursorError, paginate_query
+from ..utils.etag_utils import conditional_get
+from ..utils.auth_utils import is_admin_request
+from ..utils.write_queue_utils import run_write
+from ..utils.job_utils import JOB_FAILED, job_handler, submit_job, wait_for_job, job_accepted_data
 import uuid
 
 machine_bp = Blueprint('machine_bp', __name__, url_prefix='/api')
 
+
+@job_handler('json_import')
+def run_json_import_job(ctx, model_type, data):
+    """后台任务：导入机型或部件JSON数据"""
+    ctx.progress(10, f"正在导入{len(data)}条数据")
+    result = run_write(import_json_data, model_type, data)
+    ctx.progress(100, f"导入完成：成功{result['success_count']}条，失败{result['error_count']}条")
+    return {
+        'imported_count': result['success_count'],
+        'failed_count': result['error_count'],
+        'failed_records': result['errors']
+    }
+
+
+def import_response(job_id):
+    """
+    导入接口的响应：请求头带 Prefer: respond-async 或等待超时时返回202和任务ID，
+    否则返回导入结果
+    """
+    job = wait_for_job(job_id)
+    if job is None:
+        return jsonify({'success': True, 'message': '导入任务已提交', 'data': job_accepted_data(job_id)}), 202
+    if job['status'] == JOB_FAILED:
+        return jsonify({'success': False, 'message': job['error']}), 500
+    return jsonify({
+        'success': True,
+        'message': job['message'],
+        'data': job['result']
+    })
+
+
 @machine_bp.route('/machines', methods=['GET'])
+@conditional_get(Machine.__tablename__)
 def get_machines():
     """获取所有机器列表"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        current_app.logger.info(f"请求头 Authorization: {auth_header}")
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            current_app.logger.info(f"提取的token: {token[:20]}...")
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                current_app.logger.info(f"JWT payload: {payload}")
-                user_role = payload.get('user_role')
-                current_app.logger.info(f"用户角色: {user_role}")
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
-        else:
-            current_app.logger.warning(f"Authorization header 不存在或格式不正确: {auth_header}")
-        
-        pagination = Machine.query.paginate(
-            page=page, per_page=per_page, error_out=False
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
+        
+        # 分页（支持 page/per_page 与 cursor 游标，with_total=false 时跳过总数统计）
+        machines, total, next_cursor = paginate_query(
+            Machine.query, Machine.model, Machine.model, page, per_page, descending=False
         )
-        machines = pagination.items
         
         return jsonify({
             'success': True,
             'data': {
                 'machines': [machine.to_dict(is_admin=is_admin) for machine in machines],
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'current_page': page
+                'total': total,
+                'pages': -(-total // per_page) if total is not None and per_page > 0 else None,
+                'current_page': page,
+                'next_cursor': next_cursor
             }
         })
+    except InvalidCursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"获取机器列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -62,23 +81,8 @@ def get_machines():
 def get_machine(model):
     """根据型号获取单个机器"""
     try:
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         machine = Machine.query.filter_by(model=model).first()
         if not machine:
@@ -97,23 +101,8 @@ def get_machine(model):
 def create_machine():
     """创建新机器"""
     try:
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         data = request.get_json()
         
@@ -197,23 +186,8 @@ def update_machine(model):
         if not machine:
             return jsonify({'success': False, 'message': '机器型号不存在'}), 404
         
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         data = request.get_json()
         
@@ -293,44 +267,33 @@ def delete_machine(model):
 
 
 @machine_bp.route('/parts', methods=['GET'])
+@conditional_get(PartType.__tablename__)
 def get_parts():
     """获取所有部件列表"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
-        
-        pagination = PartType.query.paginate(
-            page=page, per_page=per_page, error_out=False
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
+        
+        # 分页（支持 page/per_page 与 cursor 游标，with_total=false 时跳过总数统计）
+        parts, total, next_cursor = paginate_query(
+            PartType.query, PartType.part_type_id, PartType.part_type_id, page, per_page, descending=False
         )
-        parts = pagination.items
         
         return jsonify({
             'success': True,
             'data': {
                 'parts': [part.to_dict(is_admin=is_admin) for part in parts],
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'current_page': page
+                'total': total,
+                'pages': -(-total // per_page) if total is not None and per_page > 0 else None,
+                'current_page': page,
+                'next_cursor': next_cursor
             }
         })
+    except InvalidCursorError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         current_app.logger.error(f"获取部件列表失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -340,23 +303,8 @@ def get_parts():
 def get_part(part_type_id):
     """根据ID获取单个部件"""
     try:
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         part = PartType.query.filter_by(part_type_id=part_type_id).first()
         if not part:
@@ -375,23 +323,8 @@ def get_part(part_type_id):
 def create_part():
     """创建新部件"""
     try:
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         data = request.get_json()
         
@@ -451,23 +384,8 @@ def update_part(part_type_id):
         if not part:
             return jsonify({'success': False, 'message': '部件类型不存在'}), 404
         
-        # 检查用户权限
-        is_admin = False
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                import jwt
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-                user_role = payload.get('user_role')
-                is_admin = user_role == 'admin'
-                current_app.logger.info(f"解析用户角色: user_role={user_role}, is_admin={is_admin}")
-            except jwt.ExpiredSignatureError:
-                current_app.logger.warning(f"JWT token 已过期: {token[:20]}...")
-            except jwt.InvalidTokenError as e:
-                current_app.logger.warning(f"无效的JWT token: {str(e)}, token: {token[:20]}...")
-            except Exception as e:
-                current_app.logger.error(f"解析JWT token时发生未知错误: {str(e)}")
+        # 检查用户权限（令牌已在请求开始时统一解析）
+        is_admin = is_admin_request()
         
         data = request.get_json()
         
@@ -555,24 +473,15 @@ def import_parts_json():
             else:
                 return jsonify({'success': False, 'message': 'JSON数据格式错误，应为对象或对象数组'}), 400
         
-        # 使用通用JSON工具导入数据
-        result = import_json_data('part', data)
-        
-        return jsonify({
-            'success': result['success'],
-            'message': result['message'],
-            'data': {
-                'imported_count': result['imported_count'],
-                'failed_count': result['failed_count'],
-                'failed_records': result['failed_records']
-            }
-        })
+        # 导入作为后台任务执行，写操作交给写线程
+        return import_response(submit_job('json_import', {'model_type': 'part', 'data': data}))
     except Exception as e:
         current_app.logger.error(f"导入部件JSON数据失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
 @machine_bp.route('/parts/export-json', methods=['GET'])
+@conditional_get(PartType.__tablename__)
 def export_parts_json():
     """导出部件数据为JSON格式"""
     try:
@@ -620,18 +529,8 @@ def import_machines():
             else:
                 return jsonify({'success': False, 'message': 'JSON数据格式错误，应为对象数组'}), 400
         
-        # 使用通用JSON工具导入数据
-        result = import_json_data('machine', data)
-        
-        return jsonify({
-            'success': result['success'],
-            'message': result['message'],
-            'data': {
-                'imported_count': result['imported_count'],
-                'failed_count': result['failed_count'],
-                'failed_records': result['failed_records']
-            }
-        })
+        # 导入作为后台任务执行，写操作交给写线程
+        return import_response(submit_job('json_import', {'model_type': 'machine', 'data': data}))
     except Exception as e:
         current_app.logger.error(f"导入机器数据失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -654,24 +553,15 @@ def import_machines_json():
             else:
                 return jsonify({'success': False, 'message': 'JSON数据格式错误，应为对象或对象数组'}), 400
         
-        # 使用通用JSON工具导入数据
-        result = import_json_data('machine', data)
-        
-        return jsonify({
-            'success': result['success'],
-            'message': result['message'],
-            'data': {
-                'imported_count': result['imported_count'],
-                'failed_count': result['failed_count'],
-                'failed_records': result['failed_records']
-            }
-        })
+        # 导入作为后台任务执行，写操作交给写线程
+        return import_response(submit_job('json_import', {'model_type': 'machine', 'data': data}))
     except Exception as e:
         current_app.logger.error(f"导入机器JSON数据失败: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 
 @machine_bp.route('/machines/export-json', methods=['GET'])
+@conditional_get(Machine.__tablename__)
 def export_machines_json():
     """导出机器数据为JSON格式"""
     try:
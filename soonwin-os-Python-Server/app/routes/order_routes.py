@@ -1,64 +1,25 @@
 from flask import Blueprint, request, jsonify
 from extensions import db
-from app.models.order import Order
+from app.models.order import Order, order_schema
 from app.models.employee import Employee
 from datetime import datetime, timedelta
-import json
-from decimal import Decimal
 
 # 从expense模型导入相关类
-from app.models.expense import AnnualTarget, Expense, ExpenseAllocation, ExpenseCalculationRecord, IndividualExpense
+from app.models.expense import ExpenseCalculationRecord, IndividualExpense
+from app.utils.allocation_utils import ExpenseAllocationService, reallocate_order, release_order_allocations
+from app.utils.summary_utils import get_yearly_summary
+from app.utils.write_queue_utils import serialized_write
+from app.utils.blob_store_utils import store_temp_paths
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
+from app.utils.serializer_utils import InvalidFieldSetError
+from app.utils.etag_utils import conditional_get
 
 # 创建蓝图
 order_bp = Blueprint('order', __name__)
 
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return json.JSONEncoder.default(self, obj)
-
-def serialize_order(order, include_expense_allocations=False):
-    """将订单对象转换为字典格式"""
-    order_dict = {
-        'id': order.id,
-        'is_new': order.is_new,
-        'area': order.area,
-        'customer_name': order.customer_name,
-        'customer_type': order.customer_type,
-        'order_time': order.order_time.strftime('%Y-%m-%d') if order.order_time else None,
-        'ship_time': order.ship_time.strftime('%Y-%m-%d') if order.ship_time else None,
-        'ship_country': order.ship_country,
-        'contract_no': order.contract_no,
-        'order_no': order.order_no,
-        'machine_no': order.machine_no,
-        'machine_name': order.machine_name,
-        'machine_model': order.machine_model,
-        'machine_count': order.machine_count,
-        'unit': order.unit,
-        'contract_amount': float(order.contract_amount) if order.contract_amount else 0.0,
-        'deposit': float(order.deposit) if order.deposit else 0.0,
-        'balance': float(order.balance) if order.balance else 0.0,
-        'tax_rate': float(order.tax_rate) if order.tax_rate else 13.0,
-        'tax_refund_amount': float(order.tax_refund_amount) if order.tax_refund_amount else 0.0,
-        'currency_amount': float(order.currency_amount) if order.currency_amount else 0.0,
-        'payment_received': float(order.payment_received) if order.payment_received else 0.0,
-        'machine_cost': float(order.machine_cost) if order.machine_cost else 0.0,
-        'net_profit': float(order.net_profit) if order.net_profit else 0.0,
-        'proportionate_cost': float(order.proportionate_cost) if order.proportionate_cost else 0.0,
-        'individual_cost': float(order.individual_cost) if order.individual_cost else 0.0,
-        'gross_profit': float(order.gross_profit) if order.gross_profit else 0.0,
-        'pay_type': order.pay_type,
-        'commission': float(order.commission) if order.commission else 0.0,
-        'latest_ship_date': order.latest_ship_date.strftime('%Y-%m-%d') if order.latest_ship_date else None,
-        'expected_delivery': order.expected_delivery.strftime('%Y-%m-%d') if order.expected_delivery else None,
-        'order_dept': order.order_dept,
-        'check_requirement': order.check_requirement,
-        'attachment_imgs': order.attachment_imgs,
-        'attachment_videos': order.attachment_videos,
-        'create_time': order.create_time.strftime('%Y-%m-%d %H:%M:%S') if order.create_time else None,
-        'update_time': order.update_time.strftime('%Y-%m-%d %H:%M:%S') if order.update_time else None
-    }
+def serialize_order(order, include_expense_allocations=False, field_set='detail'):
+    """将订单对象转换为字典格式（field_set 见 order_schema：list/detail/export）"""
+    order_dict = order_schema.dump(order, field_set)
 
     # 如果需要包含费用分摊信息
     if include_expense_allocations:
@@ -94,9 +55,11 @@ def get_orders():
         pay_type = request.args.get('pay_type')
         customer_type = request.args.get('customer_type')
         order_status = request.args.get('order_status')  # 可以是 'unshipped', 'shipped', 'completed' 等
+        # 字段集：list 只返回表格显示的列，detail（默认）返回全部字段，export 另含订单年份
+        field_set = order_schema.request_field_set('detail')
 
-        # 构建查询
-        query = Order.query
+        # 构建查询（只加载字段集需要的列）
+        query = order_schema.apply(Order.query, field_set, Order.create_time)
 
         # 应用筛选条件
         if customer_name:
@@ -124,20 +87,17 @@ def get_orders():
             end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
             query = query.filter(Order.order_time < end_datetime)
 
-        # 计算总数
-        total = query.count()
-
-        # 应用分页和排序
-        orders = query.order_by(Order.create_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        orders, total, next_cursor = paginate_query(query, Order.create_time, Order.id, page, size)
 
         # 检查是否需要包含费用分摊信息
         include_expense_allocations = request.args.get('include_expense_allocations', 'false').lower() == 'true'
 
         # 序列化订单数据
-        orders_list = [serialize_order(order, include_expense_allocations=include_expense_allocations) for order in orders]
+        orders_list = [serialize_order(order, include_expense_allocations=include_expense_allocations, field_set=field_set)
+                       for order in orders]
 
         # 返回统一格式的数据，与打卡记录API保持一致
-        import json
         response_data = {
             "code": 200,
             "msg": "获取订单列表成功",
@@ -145,13 +105,17 @@ def get_orders():
                 "list": orders_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        from flask import Response
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
+    except (InvalidCursorError, InvalidFieldSetError) as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -160,6 +124,7 @@ def get_orders():
         }), 500
 
 @order_bp.route('/orders', methods=['POST'])
+@serialized_write
 def create_order():
     """创建新订单"""
     try:
@@ -205,25 +170,25 @@ def create_order():
             expected_delivery=datetime.strptime(data.get('expected_delivery'), '%Y-%m-%d').date() if data.get('expected_delivery') else None,
             order_dept=data.get('order_dept'),
             check_requirement=data.get('check_requirement'),
-            attachment_imgs=data.get('attachment_imgs'),
+            attachment_imgs=store_temp_paths(data.get('attachment_imgs')),
             attachment_videos=data.get('attachment_videos')
         )
         db.session.add(new_order)
+        db.session.flush()
+
+        # 增量分摊：新订单计入订单总额，基数不变时只为该订单生成分摊记录
+        reallocate_order(new_order.id, new_order.create_time.year)
         db.session.commit()
 
         # 序列化创建的订单
         order_data = serialize_order(new_order)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "订单创建成功",
             "data": order_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -239,16 +204,12 @@ def get_order(order_id):
         order = Order.query.get_or_404(order_id)
         order_data = serialize_order(order)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取订单详情成功",
             "data": order_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -257,6 +218,7 @@ def get_order(order_id):
         }), 500
 
 @order_bp.route('/orders/<int:order_id>', methods=['PUT'])
+@serialized_write
 def update_order(order_id):
     """更新订单信息"""
     try:
@@ -269,6 +231,8 @@ def update_order(order_id):
                 "data": None
             }), 400
 
+        previous_contract_amount = order.contract_amount
+
         # 更新订单字段
         if 'is_new' in data: order.is_new = data['is_new']
         if 'area' in data: order.area = data['area']
@@ -302,22 +266,22 @@ def update_order(order_id):
         if 'expected_delivery' in data and data['expected_delivery']: order.expected_delivery = datetime.strptime(data['expected_delivery'], '%Y-%m-%d').date()
         if 'order_dept' in data: order.order_dept = data['order_dept']
         if 'check_requirement' in data: order.check_requirement = data['check_requirement']
-        if 'attachment_imgs' in data: order.attachment_imgs = data['attachment_imgs']
+        if 'attachment_imgs' in data: order.attachment_imgs = store_temp_paths(data['attachment_imgs'])
         if 'attachment_videos' in data: order.attachment_videos = data['attachment_videos']
+        db.session.flush()
 
+        # 合同金额变化时增量分摊：基数不变只重算该订单的分摊份额，基数变化则整年重算
+        if 'contract_amount' in data and order.contract_amount != previous_contract_amount and order.create_time:
+            reallocate_order(order.id, order.create_time.year)
         db.session.commit()
         order_data = serialize_order(order)
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "订单更新成功",
             "data": order_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -327,11 +291,21 @@ def update_order(order_id):
         }), 500
 
 @order_bp.route('/orders/<int:order_id>', methods=['DELETE'])
+@serialized_write
 def delete_order(order_id):
     """删除订单"""
     try:
         order = Order.query.get_or_404(order_id)
+        order_year = order.create_time.year if order.create_time else None
+
+        # 先删除该订单的分摊记录
+        release_order_allocations(order_id)
         db.session.delete(order)
+        db.session.flush()
+
+        # 订单总额减少可能改变摊分基数
+        if order_year:
+            reallocate_order(order_id, order_year)
         db.session.commit()
 
         return jsonify({
@@ -348,6 +322,7 @@ def delete_order(order_id):
         }), 500
 
 @order_bp.route('/orders/statistics', methods=['GET'])
+@conditional_get(Order.__tablename__)
 def get_order_statistics():
     """获取订单统计信息"""
     try:
@@ -367,16 +342,12 @@ def get_order_statistics():
             'total_net_profit': float(total_net_profit)
         }
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": "获取订单统计成功",
             "data": statistics_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -394,42 +365,13 @@ def get_order_expense_summary():
         if not target_year:
             target_year = datetime.now().year  # 默认为当前年份
 
-        # 计算该年度的订单总数
-        total_orders = db.session.query(db.func.count(Order.id)).filter(
-            db.extract('year', Order.create_time) == target_year
-        ).scalar() or 0
-
-        # 计算该年度的订单总金额
-        total_contract_amount = db.session.query(
-            db.func.sum(Order.contract_amount)
-        ).filter(
-            db.extract('year', Order.create_time) == target_year
-        ).scalar() or 0.0
-
-        # 计算该年度的总毛利
-        total_gross_profit = db.session.query(
-            db.func.sum(Order.gross_profit)
-        ).filter(
-            db.extract('year', Order.create_time) == target_year
-        ).scalar() or 0.0
-
-        # 计算该年度的费用分摊总金额
-        from app.models.expense import Expense, ExpenseAllocation
-        total_expense_allocation = db.session.query(
-            db.func.sum(ExpenseAllocation.allocated_amount)
-        ).join(Expense, ExpenseAllocation.expense_id == Expense.id).filter(
-            Expense.target_year == target_year
-        ).scalar() or 0.0
-
-        # 计算更新时间（最后计算费用分摊的时间）
-        from app.models.expense import ExpenseCalculationRecord
-        latest_calc = ExpenseCalculationRecord.query.filter(
-            ExpenseCalculationRecord.target_year == target_year
-        ).order_by(ExpenseCalculationRecord.calculation_time.desc()).first()
-
-        # 获取年度目标
-        annual_target_record = AnnualTarget.query.filter_by(target_year=target_year).first()
-        annual_target = float(annual_target_record.target_amount) if annual_target_record else 10000000.00
+        # 读取该年份的物化汇总行（随订单/费用变动在同一事务内维护）
+        summary = get_yearly_summary(target_year)
+        total_orders = summary.total_orders or 0
+        total_contract_amount = summary.total_order_amount or 0.0
+        total_gross_profit = summary.total_gross_profit or 0.0
+        total_expense_allocation = summary.total_expense_allocation or 0.0
+        annual_target = float(summary.annual_target) if summary.annual_target is not None else 10000000.00
 
         summary_data = {
             'year': target_year,
@@ -438,21 +380,17 @@ def get_order_expense_summary():
             'total_gross_profit': float(total_gross_profit),
             'total_expense_allocation': float(total_expense_allocation),
             'net_profit_estimate': float(total_gross_profit) - float(total_expense_allocation),
-            'last_updated': latest_calc.calculation_time.strftime('%Y-%m-%d %H:%M:%S') if latest_calc else '未计算',
-            'calculation_status': latest_calc.status if latest_calc else '未计算',
+            'last_updated': summary.latest_calculation_time.strftime('%Y-%m-%d %H:%M:%S') if summary.latest_calculation_time else '未计算',
+            'calculation_status': summary.latest_calculation_status if summary.latest_calculation_id else '未计算',
             'annual_target': annual_target
         }
 
-        import json
-        from flask import Response
         response_data = {
             "code": 200,
             "msg": f"获取{target_year}年订单费用汇总成功",
             "data": summary_data
         }
-        # 使用自定义编码器处理Decimal类型
-        json_response = json.dumps(response_data, cls=DecimalEncoder, ensure_ascii=False)
-        return Response(json_response, mimetype='application/json')
+        return jsonify(response_data)
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -462,6 +400,7 @@ def get_order_expense_summary():
 
 
 @order_bp.route('/orders/update-proportionate-cost', methods=['POST'])
+@serialized_write
 def update_order_proportionate_cost():
     """更新订单摊分费用 - 按订单金额比例分摊到指定年度的所有订单"""
     try:
@@ -481,167 +420,27 @@ def update_order_proportionate_cost():
                 "data": None
             }), 400
 
-        # 获取年度目标
-        annual_target_record = AnnualTarget.query.filter_by(target_year=target_year).first()
-        if not annual_target_record:
-            # 如果没有找到对应年份的年度目标，则使用默认值创建
-            annual_target_record = AnnualTarget(
-                target_year=target_year,
-                target_amount=10000000.00
-            )
-            db.session.add(annual_target_record)
-            db.session.commit()
-        
-        annual_target = float(annual_target_record.target_amount) if annual_target_record.target_amount else 10000000.00
-
-        # 获取该年份的所有费用记录
-        expenses = Expense.query.filter(Expense.target_year == target_year, Expense.expense_type == '全面分摊').all()
-
-        if not expenses:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark='该年份没有需要分摊的费用'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
-
-            return jsonify({
-                "code": 200,
-                "msg": f"该年份({target_year})没有需要分摊的费用",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": 0,
-                    "total_orders": 0,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-            })
-
-        # 获取该年份的所有订单
-        orders = Order.query.filter(
-            db.extract('year', Order.create_time) == target_year
-        ).all()
-
-        if not orders:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark=f'该年份({target_year})没有订单，无法分摊费用'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
-
-            return jsonify({
-                "code": 200,
-                "msg": f"该年份({target_year})没有订单，无法分摊费用",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": len(expenses),
-                    "total_orders": 0,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
-            })
-
-        # 计算所有订单的总金额
-        total_order_amount = sum(
-            float(order.contract_amount) if order.contract_amount else 0.0
-            for order in orders
+        # 与 /calculate-expense-allocations 共用同一套分摊服务；preview=true 时只返回测算结果不写数据库
+        preview = bool(data.get('preview', False))
+        service = ExpenseAllocationService(
+            target_year,
+            preview=preview,
+            annual_target=data.get('annual_target') if preview else None
         )
-
-        # 计算摊分总额（年度目标和订单总金额中的较大值）
-        allocation_base = max(annual_target, total_order_amount)
-
-        if allocation_base <= 0:
-            # 创建计算记录
-            calc_record = ExpenseCalculationRecord(
-                calculation_time=datetime.now(),
-                target_year=target_year,
-                status='completed',
-                remark=f'该年份({target_year})摊分基础金额为0，无法按比例分摊'
-            )
-            db.session.add(calc_record)
-            db.session.commit()
-
+        service.run(allocated_remark="成功更新{total_orders}个订单的摊分费用")
+        if preview:
             return jsonify({
                 "code": 200,
-                "msg": f"该年份({target_year})摊分基础金额为0，无法按比例分摊",
-                "data": {
-                    "target_year": target_year,
-                    "total_expenses": len(expenses),
-                    "total_orders": len(orders),
-                    "total_order_amount": total_order_amount,
-                    "annual_target": annual_target,
-                    "allocation_base": allocation_base,
-                    "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-                }
+                "msg": service.message("订单摊分费用预览完成"),
+                "data": service.response_data()
             })
 
-        # 更新每个订单的proportionate_cost字段
-        for order in orders:
-            order_amount = float(order.contract_amount) if order.contract_amount else 0.0
-            if allocation_base > 0:
-                # 计算该订单应分摊的费用总和
-                order_total_expense = sum(
-                    (order_amount / allocation_base) * float(expense.amount) if expense.amount else 0.0
-                    for expense in expenses
-                )
-                
-                # 更新订单的摊分费用字段
-                order.proportionate_cost = order_total_expense
-            else:
-                order.proportionate_cost = 0.0
-
-        # 创建计算记录
-        calc_record = ExpenseCalculationRecord(
-            calculation_time=datetime.now(),
-            target_year=target_year,
-            status='completed',
-            remark=f'成功更新{len(orders)}个订单的摊分费用'
-        )
-        db.session.add(calc_record)
         db.session.commit()
 
-        # 计算订单的总成本
-        total_direct_cost = sum(
-            float(order.machine_cost) if order.machine_cost else 0.0
-            for order in orders
-        )
-
-        # 计算总净利 (订单金额 - 成本 - 摊分费用)
-        total_net_profit = total_order_amount - total_direct_cost - sum(
-            float(expense.amount) if expense.amount else 0.0
-            for expense in expenses
-        )
-
-        # 计算总费用
-        total_expense_amount = sum(
-            float(expense.amount) if expense.amount else 0.0
-            for expense in expenses
-        )
-
-        # 计算总毛利 (订单金额 - 成本)
-        total_gross_profit = total_order_amount - total_direct_cost
-
         return jsonify({
             "code": 200,
-            "msg": "订单摊分费用更新完成",
-            "data": {
-                "target_year": target_year,
-                "total_expenses": len(expenses),
-                "total_orders": len(orders),
-                "total_order_amount": total_order_amount,
-                "annual_target": annual_target,
-                "allocation_base": allocation_base,
-                "total_net_profit": total_net_profit,
-                "total_gross_profit": total_gross_profit,
-                "total_direct_cost": total_direct_cost,
-                "total_expense_amount": total_expense_amount,
-                "calculation_time": calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
-            }
+            "msg": service.message("订单摊分费用更新完成"),
+            "data": service.response_data()
         })
     except Exception as e:
         db.session.rollback()
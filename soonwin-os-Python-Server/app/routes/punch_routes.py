@@ -2,14 +2,15 @@ import re
 import json
 import socket
 import uuid
-import jwt
-import config
-from flask import Blueprint, request, jsonify, redirect, Response
+from flask import Blueprint, g, request, jsonify, redirect, Response
 from extensions import db
 from app.models.employee import Employee, UserStatus
 from app.models.employee_device import EmployeeDevice
 from app.models.punch_record import PunchRecord
-from app.utils.auth_utils import require_admin, require_auth
+from app.utils.auth_utils import AUTH_EXPIRED, get_auth_error, get_jwt_payload, require_admin, require_auth
+from app.utils.write_queue_utils import serialized_write
+from app.utils.employee_utils import get_employee_names
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
 from datetime import datetime, timedelta
 
 
@@ -396,6 +397,7 @@ def bind_device_to_employee(emp_id, device_id):
 
 
 @punch_bp.route('/api/device-clock-in', methods=['POST'])
+@serialized_write
 def device_clock_in():
     """新的打卡API端点，支持设备ID验证和绑定"""
     try:
@@ -824,35 +826,32 @@ def reject_device_change():
 def get_employee_info(emp_id):
     """获取员工信息接口（包含备注字段）"""
     try:
-        # 从请求头获取认证信息
-        token = request.headers.get('Authorization')
-        if token and token.startswith("Bearer "):
-            token = token[7:]
-            try:
-                # 解码JWT令牌
-                payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=['HS256'])
-                current_emp_id = payload['emp_id']
-                current_user_role = payload['user_role']
-
-                # 普通用户只能查看自己的信息，管理员可以查看任意员工信息
-                if current_user_role != 'admin' and current_emp_id != emp_id:
-                    return jsonify({
-                        "code": 403,
-                        "msg": "权限不足，只能查看自己的信息",
-                        "data": None
-                    }), 403
-            except jwt.ExpiredSignatureError:
+        # 认证信息（令牌已在请求开始时统一解析）
+        auth_error = get_auth_error()
+        if g.auth_token and request.headers.get('Authorization', '').startswith("Bearer "):
+            if auth_error == AUTH_EXPIRED:
                 return jsonify({
                     "code": 401,
                     "msg": "令牌已过期",
                     "data": None
                 }), 401
-            except jwt.InvalidTokenError:
+            if auth_error:
                 return jsonify({
                     "code": 401,
                     "msg": "无效的令牌",
                     "data": None
                 }), 401
+            payload = get_jwt_payload()
+            current_emp_id = payload['emp_id']
+            current_user_role = payload['user_role']
+
+            # 普通用户只能查看自己的信息，管理员可以查看任意员工信息
+            if current_user_role != 'admin' and current_emp_id != emp_id:
+                return jsonify({
+                    "code": 403,
+                    "msg": "权限不足，只能查看自己的信息",
+                    "data": None
+                }), 403
         else:
             # 如果没有提供token，也只允许查看自己的信息
             return jsonify({
@@ -1140,11 +1139,10 @@ def get_punch_records():
 
         # 应用筛选条件
         if name:
-            # 同时搜索打卡记录中的姓名和关联员工的当前姓名
-            employee_ids = [emp.emp_id for emp in Employee.query.filter(Employee.name.contains(name)).all()]
-            query = query.filter(
+            # 同时搜索打卡记录中的姓名和关联员工的当前姓名（关联查询，在同一条SQL中完成）
+            query = query.outerjoin(Employee, Employee.emp_id == PunchRecord.emp_id).filter(
                 (PunchRecord.name.contains(name)) |
-                (PunchRecord.emp_id.in_(employee_ids))
+                (Employee.name.contains(name))
             )
         if emp_id:
             query = query.filter(PunchRecord.emp_id.contains(emp_id))
@@ -1157,21 +1155,19 @@ def get_punch_records():
             end_datetime = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)  # 包含结束日期的整天
             query = query.filter(PunchRecord.punch_time < end_datetime)
 
-        # 计算总数
-        total = query.count()
+        # 分页（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        punch_records, total, next_cursor = paginate_query(query, PunchRecord.punch_time, PunchRecord.id, page, size)
 
-        # 应用分页和排序
-        punch_records = query.order_by(PunchRecord.punch_time.desc()).offset((page - 1) * size).limit(size).all()
+        # 批量获取关联员工的当前姓名（进程内缓存，未命中的工号一次查询补齐）
+        employee_names = get_employee_names(record.emp_id for record in punch_records)
 
         # 将打卡记录转换为字典格式
         records_list = []
         for record in punch_records:
-            # 获取关联的员工当前信息
-            employee = Employee.query.filter_by(emp_id=record.emp_id).first()
             records_list.append({
                 'id': record.id,
                 'emp_id': record.emp_id,
-                'name': employee.name if employee else record.name,  # 显示当前员工姓名，以反映最新信息
+                'name': employee_names.get(record.emp_id) or record.name,  # 显示当前员工姓名，以反映最新信息
                 'punch_type': record.punch_type,
                 'punch_time': record.punch_time.strftime('%Y-%m-%d %H:%M:%S'),
                 'inner_ip': record.inner_ip,
@@ -1188,10 +1184,17 @@ def get_punch_records():
                 "list": records_list,
                 "total": total,
                 "page": page,
-                "size": size
+                "size": size,
+                "next_cursor": next_cursor
             }
         }
         return jsonify(response_data)
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
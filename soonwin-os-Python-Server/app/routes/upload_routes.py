@@ -3,18 +3,22 @@ from extensions import db
 from werkzeug.utils import secure_filename
 import os
 import uuid
-from datetime import datetime
-import shutil
+from app.utils.file_ops_utils import DELETED_FILES_FOLDER, get_base_path, trash_file, move_file as file_ops_move
+from app.utils.chunk_upload_utils import ChunkUpload, ChunkUploadError
+from app.utils.blob_store_utils import BLOB_FOLDER, sweep_blob_store
+from app.utils.image_derivative_utils import parse_width, send_image
+from app.utils.auth_utils import require_admin
+from app.utils.job_utils import JOB_FAILED, job_handler, submit_job, wait_for_job, job_accepted_data
 
 # 创建蓝图
 upload_bp = Blueprint('upload', __name__)
 
 # 临时上传目录
 TEMP_UPLOAD_FOLDER = 'assets/TempFiles'
-# 已删除文件目录
-DELETED_FILES_FOLDER = 'assets/DeleteFiles'
 # 资源上传目录
 ASSET_UPLOAD_FOLDER = 'assets'
+# 可以通过 /image 接口缩放的图片目录
+IMAGE_FOLDERS = (BLOB_FOLDER, 'assets/OrderInspection', 'assets/DisplayFiles', TEMP_UPLOAD_FOLDER)
 
 def create_upload_directories():
     """创建上传目录"""
@@ -147,31 +151,22 @@ def move_file():
                 "data": None
             }), 400
         
-        # 转换为绝对路径
-        base_path = os.path.join(current_app.root_path, '..')
-        source_abs_path = os.path.join(base_path, source_path)
-        target_abs_path = os.path.join(base_path, target_path)
-        
-        # 验证源文件存在
-        if not os.path.exists(source_abs_path):
+        # 移动文件（与检查项批量保存共用同一实现）
+        try:
+            moved_path = file_ops_move(get_base_path(), source_path, target_path)
+        except FileNotFoundError as e:
             return jsonify({
                 "code": 400,
-                "msg": "源文件不存在",
+                "msg": str(e),
                 "data": None
             }), 400
         
-        # 创建目标目录
-        os.makedirs(os.path.dirname(target_abs_path), exist_ok=True)
-        
-        # 移动文件
-        shutil.move(source_abs_path, target_abs_path)
-        
         return jsonify({
             "code": 200,
             "msg": "文件移动成功",
             "data": {
                 "source_path": source_path,
-                "target_path": os.path.relpath(target_abs_path, base_path)
+                "target_path": moved_path
             }
         })
     except Exception as e:
@@ -202,35 +197,16 @@ def delete_file():
                 "data": None
             }), 400
         
-        # 转换为绝对路径
-        base_path = os.path.join(current_app.root_path, '..')
-        abs_file_path = os.path.join(base_path, file_path)
-        
-        # 验证文件存在
-        if not os.path.exists(abs_file_path):
+        # 移动文件到删除目录（文件名追加时间戳避免冲突）
+        try:
+            relative_new_path = trash_file(get_base_path(), file_path)
+        except FileNotFoundError as e:
             return jsonify({
                 "code": 400,
-                "msg": "文件不存在",
+                "msg": str(e),
                 "data": None
             }), 400
         
-        # 创建删除文件目录
-        deleted_path = os.path.join(base_path, DELETED_FILES_FOLDER)
-        os.makedirs(deleted_path, exist_ok=True)
-        
-        # 生成移动后的新文件名（添加时间戳避免冲突）
-        filename = os.path.basename(abs_file_path)
-        name, ext = os.path.splitext(filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
-        new_filename = f"{name}_{timestamp}{ext}"
-        new_file_path = os.path.join(deleted_path, new_filename)
-        
-        # 移动文件到删除目录
-        shutil.move(abs_file_path, new_file_path)
-        
-        # 获取相对于项目根目录的路径
-        relative_new_path = os.path.relpath(new_file_path, base_path)
-        
         return jsonify({
             "code": 200,
             "msg": "文件移动到删除目录成功",
@@ -246,63 +222,80 @@ def delete_file():
             "data": None
         }), 500
 
+def get_chunk_upload(file_identifier):
+    """分块上传对象（分块保存在 TempFiles/chunks/<文件标识> 目录）"""
+    base_path = os.path.join(current_app.root_path, '..')
+    return ChunkUpload(os.path.join(base_path, TEMP_UPLOAD_FOLDER, 'chunks'), file_identifier, base_path)
+
+def assemble_chunk_upload(upload, filename):
+    """全部分块已齐时合并到 TempFiles/<文件标识>_<文件名>，返回合并结果，未齐时返回 None"""
+    final_filename = f"{upload.safe_identifier}_{sanitize_filename(filename)}"
+    return upload.assemble_if_complete(os.path.join(upload.base_path, TEMP_UPLOAD_FOLDER, final_filename))
+
 @upload_bp.route('/upload/chunk', methods=['POST'])
 def upload_chunk():
-    """分块上传文件"""
+    """
+    分块上传文件
+
+    分块可以乱序、并行上传；任意一个分块到达后全部分块已齐即合并，返回文件路径信息，
+    否则返回已接收的分块。可选参数 chunk_checksum / file_checksum 为分块和整个文件的 SHA-256。
+    """
     try:
         create_upload_directories()
         
         # 获取分块数据
         chunk = request.files.get('chunk')
-        chunk_index = int(request.form.get('chunk_index', 0))
-        total_chunks = int(request.form.get('total_chunks', 1))
+        if chunk is None:
+            return jsonify({
+                "code": 400,
+                "msg": "没有分块数据",
+                "data": None
+            }), 400
+        try:
+            chunk_index = int(request.form.get('chunk_index', 0))
+            total_chunks = int(request.form.get('total_chunks', 1))
+        except ValueError:
+            return jsonify({
+                "code": 400,
+                "msg": "分块序号和分块总数必须是整数",
+                "data": None
+            }), 400
+        if total_chunks < 1 or not 0 <= chunk_index < total_chunks:
+            return jsonify({
+                "code": 400,
+                "msg": "分块序号超出范围",
+                "data": None
+            }), 400
         original_filename = request.form.get('filename', 'unknown')
         file_identifier = request.form.get('file_identifier', str(uuid.uuid4()))
         
         # 清理文件名
         original_filename = secure_filename(original_filename)
-        sanitized_filename = sanitize_filename(original_filename)
-        
-        # 创建临时分块存储目录
-        chunk_dir = os.path.join(current_app.root_path, '..', TEMP_UPLOAD_FOLDER, 'chunks')
-        os.makedirs(chunk_dir, exist_ok=True)
         
-        # 保存当前分块
-        chunk_filename = f"{file_identifier}_chunk_{chunk_index}"
-        chunk_path = os.path.join(chunk_dir, chunk_filename)
-        chunk.save(chunk_path)
-        
-        # 检查是否所有分块都已上传
-        if chunk_index == total_chunks - 1:
-            # 所有分块都已上传，合并文件
-            final_filename = f"{file_identifier}_{sanitized_filename}"
-            temp_path = os.path.join(current_app.root_path, '..', TEMP_UPLOAD_FOLDER)
-            final_path = os.path.join(temp_path, final_filename)
-            
-            with open(final_path, 'wb') as final_file:
-                for i in range(total_chunks):
-                    chunk_file_path = os.path.join(chunk_dir, f"{file_identifier}_chunk_{i}")
-                    if os.path.exists(chunk_file_path):
-                        with open(chunk_file_path, 'rb') as chunk_file:
-                            final_file.write(chunk_file.read())
-                        # 删除已合并的分块
-                        os.remove(chunk_file_path)
-            
-            # 删除空的分块目录
-            if not os.listdir(chunk_dir):
-                os.rmdir(chunk_dir)
-            
-            # 返回文件路径信息
-            relative_path = os.path.relpath(final_path, os.path.join(current_app.root_path, '..'))
-            
+        upload = get_chunk_upload(file_identifier)
+        meta = upload.update_meta(
+            filename=original_filename,
+            total_chunks=total_chunks,
+            file_checksum=request.form.get('file_checksum')
+        )
+
+        # 已合并完成的上传（重复发送的分块）不再保存
+        chunk_info = None
+        if not meta.get('result'):
+            chunk_info = upload.save_chunk(chunk_index, chunk.stream, request.form.get('chunk_checksum'))
+
+        # 全部分块已齐时流式合并（并行到达的分块只会合并一次）
+        result = assemble_chunk_upload(upload, original_filename)
+        if result:
             return jsonify({
                 "code": 200,
                 "msg": "文件上传成功",
                 "data": {
                     "original_filename": original_filename,
-                    "filename": final_filename,
-                    "path": relative_path,
-                    "size": os.path.getsize(final_path),
+                    "filename": result['filename'],
+                    "path": result['path'],
+                    "size": result['size'],
+                    "sha256": result['sha256'],
                     "file_identifier": file_identifier
                 }
             })
@@ -312,12 +305,132 @@ def upload_chunk():
             "msg": "分块上传成功",
             "data": {
                 "chunk_index": chunk_index,
+                "chunk_sha256": chunk_info['sha256'],
+                "received_chunks": upload.received_chunks(),
                 "file_identifier": file_identifier
             }
         })
+    except ChunkUploadError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
             "msg": f"分块上传失败: {str(e)}",
             "data": None
-        }), 500
\ No newline at end of file
+        }), 500
+
+@upload_bp.route('/upload/chunk/status', methods=['GET'])
+def get_chunk_upload_status():
+    """查询分块上传进度：已接收和缺少的分块，合并完成后返回文件路径信息（用于断点续传）"""
+    try:
+        file_identifier = request.args.get('file_identifier', '')
+        upload = get_chunk_upload(file_identifier)
+        # 分块已齐但未合并（如合并前服务中断）时补做合并
+        meta = upload.load_meta()
+        if meta.get('filename') and not meta.get('result'):
+            assemble_chunk_upload(upload, meta['filename'])
+        return jsonify({
+            "code": 200,
+            "msg": "获取分块上传状态成功",
+            "data": upload.status()
+        })
+    except ChunkUploadError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"获取分块上传状态失败: {str(e)}",
+            "data": None
+        }), 500
+
+@job_handler('blob_gc')
+def run_blob_gc_job(ctx, dry_run=False):
+    """后台任务：回收未被引用的存储文件、过期的临时文件和已删除文件"""
+    config = current_app.config
+    return sweep_blob_store(
+        grace_hours=config.get('BLOB_GC_GRACE_HOURS', 24),
+        temp_retention_hours=config.get('TEMP_FILE_RETENTION_HOURS', 72),
+        deleted_retention_days=config.get('DELETED_FILE_RETENTION_DAYS', 30),
+        dry_run=dry_run,
+        progress=ctx.progress
+    )
+
+@upload_bp.route('/upload/gc', methods=['POST'])
+@require_admin
+def collect_upload_garbage():
+    """清理存储文件和临时文件（仅管理员），参数 dry_run=true 时只统计不删除"""
+    try:
+        data = request.get_json(silent=True) or {}
+        job_id = submit_job('blob_gc', {'dry_run': bool(data.get('dry_run', False))})
+        job = wait_for_job(job_id)
+        if job is None:
+            return jsonify({
+                "code": 202,
+                "msg": "文件清理任务已提交",
+                "data": job_accepted_data(job_id)
+            }), 202
+
+        if job['status'] == JOB_FAILED:
+            return jsonify({
+                "code": 500,
+                "msg": f"文件清理失败: {job['error']}",
+                "data": None
+            }), 500
+
+        return jsonify({
+            "code": 200,
+            "msg": job['message'],
+            "data": job['result']
+        })
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"文件清理失败: {str(e)}",
+            "data": None
+        }), 500
+
+@upload_bp.route('/image/<path:file_path>', methods=['GET'])
+def serve_image(file_path):
+    """
+    返回上传的图片，参数 w=宽度 或 size=thumb/medium 时返回缩放图（供检查项照片、图片组列表使用）
+    例如 /api/image/assets/Blobs/ab/cd/xxx.jpg?w=320
+    """
+    try:
+        normalized_path = os.path.normpath(file_path).replace('\\', '/')
+        if normalized_path.startswith('..') or not any(
+                normalized_path.startswith(f'{folder}/') for folder in IMAGE_FOLDERS):
+            return jsonify({
+                "code": 400,
+                "msg": "非法路径访问",
+                "data": None
+            }), 400
+
+        width, error = parse_width()
+        if error:
+            return jsonify({
+                "code": 400,
+                "msg": error,
+                "data": None
+            }), 400
+
+        return send_image(normalized_path, width)
+    except FileNotFoundError:
+        return jsonify({
+            "code": 404,
+            "msg": f"文件不存在: {file_path}",
+            "data": None
+        }), 404
+    except Exception as e:
+        return jsonify({
+            "code": 500,
+            "msg": f"图片服务错误: {str(e)}",
+            "data": None
+        }), 500
@@ -5,7 +5,9 @@ from app.models.punch_record import PunchRecord
 from app.models.totp_user import TotpUser
 from app.models.order import Order
 from app.models.cost_allocation import CostAllocation
-from app.utils.auth_utils import require_admin, require_auth
+from app.utils.auth_utils import require_admin, require_auth, invalidate_employee_identity
+from app.utils.employee_utils import invalidate_employee_names
+from app.utils.pagination_utils import InvalidCursorError, paginate_query
 from datetime import datetime, timedelta
 import pyotp
 import jwt
@@ -64,6 +66,7 @@ def init_admin():
         )
         db.session.add(totp_user)
         db.session.commit()
+        invalidate_employee_names('admin')
 
         return jsonify({
             "code": 200,
@@ -138,6 +141,7 @@ def create_employee():
         )
         db.session.add(totp_user)
         db.session.commit()
+        invalidate_employee_names(new_employee.emp_id)
 
         return jsonify({
             "code": 200,
@@ -165,11 +169,10 @@ def get_employees():
         page = request.args.get('page', 1, type=int)
         size = request.args.get('size', 10, type=int)
 
-        # 分页查询
-        pagination = db.session.query(Employee).paginate(
-            page=page, per_page=size, error_out=False
+        # 分页查询（支持 page/size 与 cursor 游标，with_total=false 时跳过总数统计）
+        employees, total, next_cursor = paginate_query(
+            db.session.query(Employee), Employee.create_time, Employee.id, page, size, descending=False
         )
-        employees = pagination.items
 
         return jsonify({
             "code": 200,
@@ -190,10 +193,17 @@ def get_employees():
                     "create_time": emp.create_time.strftime("%Y-%m-%d %H:%M:%S")
                 } for emp in employees
             ],
-            "total": pagination.total,
+            "total": total,
             "page": page,
-            "size": size
+            "size": size,
+            "next_cursor": next_cursor
         })
+    except InvalidCursorError as e:
+        return jsonify({
+            "code": 400,
+            "msg": str(e),
+            "data": None
+        }), 400
     except Exception as e:
         return jsonify({
             "code": 500,
@@ -275,6 +285,8 @@ def update_employee(emp_id):
                 totp_user.name = employee.name
 
         db.session.commit()
+        invalidate_employee_names(old_emp_id, employee.emp_id)
+        invalidate_employee_identity(old_emp_id, employee.emp_id)
 
         return jsonify({
             "code": 200,
@@ -320,6 +332,8 @@ def delete_employee(emp_id):
             db.session.delete(totp_user)
 
         db.session.commit()
+        invalidate_employee_names(employee.emp_id)
+        invalidate_employee_identity(employee.emp_id)
 
         return jsonify({
             "code": 200,
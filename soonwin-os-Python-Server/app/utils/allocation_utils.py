@@ -0,0 +1,524 @@
+"""
+费用分摊计算引擎
+按列读取费用与订单数据，一次性计算 费用×订单 分摊矩阵，
+分摊金额使用 Decimal 精确计算并四舍五入到分，
+分摊记录批量插入，订单摊分费用（即该订单分摊记录之和）通过一条集合式 UPDATE 回写。
+"""
+
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from operator import add
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, Integer, MetaData, Numeric, Table, func, select, update
+
+from extensions import db
+from app.models.expense import AnnualTarget, Expense, ExpenseAllocation, ExpenseCalculationRecord
+from app.models.order import Order
+
+# 参与全面分摊的费用类型
+ALLOCATION_EXPENSE_TYPE = '全面分摊'
+# 未设置年度目标时的默认值
+DEFAULT_ANNUAL_TARGET = Decimal('10000000.00')
+# 金额精度（分）
+CENT = Decimal('0.01')
+
+
+def to_decimal(value: Any) -> Decimal:
+    """将数据库数值（Decimal/float/int/None）统一转换为 Decimal"""
+    if value is None:
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    # float 先转字符串，避免二进制浮点误差被带入
+    return Decimal(str(value))
+
+
+def load_expense_columns(target_year: int) -> Tuple[List[int], List[Decimal]]:
+    """
+    按列读取指定年份需要全面分摊的费用
+
+    Returns:
+        (费用ID列表, 费用金额列表)
+    """
+    rows = db.session.execute(
+        select(Expense.id, Expense.amount).where(
+            Expense.target_year == target_year,
+            Expense.expense_type == ALLOCATION_EXPENSE_TYPE
+        ).order_by(Expense.id)
+    ).all()
+    return [row[0] for row in rows], [to_decimal(row[1]) for row in rows]
+
+
+def load_order_columns(target_year: int) -> Tuple[List[int], List[Decimal], List[Decimal]]:
+    """
+    按列读取指定年份的订单（只取分摊所需的列，不构造ORM对象）
+
+    Returns:
+        (订单ID列表, 合同金额列表, 机器成本列表)
+    """
+    rows = db.session.execute(
+        select(Order.id, Order.contract_amount, Order.machine_cost).where(
+            Order.year_filter(target_year)
+        ).order_by(Order.id)
+    ).all()
+    return (
+        [row[0] for row in rows],
+        [to_decimal(row[1]) for row in rows],
+        [to_decimal(row[2]) for row in rows]
+    )
+
+
+def iter_allocation_matrix(expense_ids: List[int], expense_amounts: List[Decimal],
+                           order_ids: List[int], order_amounts: List[Decimal],
+                           allocation_base: Decimal) -> Iterator[Tuple[int, List[int], List[Decimal]]]:
+    """
+    逐行（每笔费用一行）生成分摊矩阵
+
+    分摊金额 = 订单合同金额 / 摊分基数 * 费用金额，只对合同金额大于0的订单分摊。
+    订单比例只计算一次，矩阵每个单元只做一次乘法和一次舍入。
+
+    Yields:
+        (费用ID, 参与分摊的订单ID列表, 对应的分摊金额列表)
+    """
+    # 先过滤出参与分摊的订单列，并预计算各订单占摊分基数的比例
+    share_order_ids = []
+    share_ratios = []
+    for order_id, order_amount in zip(order_ids, order_amounts):
+        if order_amount > 0:
+            share_order_ids.append(order_id)
+            share_ratios.append(order_amount / allocation_base)
+
+    for expense_id, expense_amount in zip(expense_ids, expense_amounts):
+        amounts = [
+            (ratio * expense_amount).quantize(CENT, rounding=ROUND_HALF_UP)
+            for ratio in share_ratios
+        ]
+        yield expense_id, share_order_ids, amounts
+
+
+def _mark_summary_year(target_year: Optional[int]) -> None:
+    """分摊记录通过 Core 语句批量写入，ORM 事件捕获不到，需要手动标记年度汇总待刷新"""
+    # 汇总模块依赖本模块的常量，延迟导入
+    from app.utils.summary_utils import mark_summary_year
+    mark_summary_year(target_year)
+
+
+def delete_year_allocations(target_year: int) -> None:
+    """删除指定年份所有费用的分摊记录"""
+    expense_ids = select(Expense.id).where(Expense.target_year == target_year)
+    db.session.execute(
+        ExpenseAllocation.__table__.delete().where(ExpenseAllocation.expense_id.in_(expense_ids))
+    )
+    _mark_summary_year(target_year)
+
+
+def write_allocation_matrix(matrix: Iterator[Tuple[int, List[int], List[Decimal]]],
+                            create_time: Optional[datetime] = None) -> Tuple[int, Dict[int, Decimal]]:
+    """
+    将分摊矩阵批量写入 ExpenseAllocation 表，同时按订单累加分摊金额
+
+    每笔费用的一整行作为一次 executemany 直接交给数据库驱动，
+    不创建ORM对象，也不逐行经过SQLAlchemy的参数处理。
+
+    Returns:
+        (写入的分摊记录数, {订单ID: 分摊金额合计})
+    """
+    connection = db.session.connection()
+    table = ExpenseAllocation.__table__
+    insert_sql = str(table.insert().compile(
+        dialect=connection.dialect,
+        column_keys=['expense_id', 'order_id', 'allocated_amount', 'create_time']
+    ))
+    # 创建时间按 DateTime 列的存储格式只转换一次
+    time_processor = table.c.create_time.type.dialect_impl(connection.dialect).bind_processor(connection.dialect)
+    create_time = create_time or datetime.now()
+    create_time_value = time_processor(create_time) if time_processor else create_time
+
+    written = 0
+    row_order_ids = []
+    row_totals = None
+    for expense_id, order_ids, amounts in matrix:
+        if not order_ids:
+            continue
+        connection.exec_driver_sql(insert_sql, [
+            (expense_id, order_id, float(amount), create_time_value)
+            for order_id, amount in zip(order_ids, amounts)
+        ])
+        written += len(order_ids)
+        # 每行的订单列相同，按位置累加即可得到各订单的分摊合计
+        row_order_ids = order_ids
+        row_totals = amounts if row_totals is None else list(map(add, row_totals, amounts))
+    return written, dict(zip(row_order_ids, row_totals or []))
+
+
+# 订单摊分费用暂存表（连接级临时表），用于一次性集合式回写
+_order_cost_stage = Table(
+    'order_cost_stage', MetaData(),
+    Column('order_id', Integer, primary_key=True),
+    Column('proportionate_cost', Numeric(12, 2), nullable=False),
+    prefixes=['TEMPORARY']
+)
+
+
+def update_proportionate_cost(order_values: Dict[int, Decimal], increment: bool = False) -> None:
+    """
+    用一条集合式 UPDATE 回写订单的摊分费用
+
+    先把各订单的金额批量写入临时表，再通过主键关联一次性更新 Order 表。
+
+    Args:
+        order_values: {订单ID: 金额}
+        increment: False 时直接覆盖摊分费用，True 时在原摊分费用上累加（增量分摊使用）
+    """
+    if not order_values:
+        return
+    connection = db.session.connection()
+    _order_cost_stage.create(connection, checkfirst=True)
+    try:
+        connection.execute(_order_cost_stage.delete())
+        connection.execute(_order_cost_stage.insert(), [
+            {'order_id': order_id, 'proportionate_cost': value}
+            for order_id, value in order_values.items()
+        ])
+        order_table = Order.__table__
+        staged_cost = select(_order_cost_stage.c.proportionate_cost).where(
+            _order_cost_stage.c.order_id == order_table.c.id
+        ).scalar_subquery()
+        if increment:
+            staged_cost = func.round(func.coalesce(order_table.c.proportionate_cost, 0) + staged_cost, 2)
+        connection.execute(
+            update(order_table).where(
+                order_table.c.id.in_(select(_order_cost_stage.c.order_id))
+            ).values(proportionate_cost=staged_cost)
+        )
+    finally:
+        _order_cost_stage.drop(connection, checkfirst=True)
+
+
+def sum_matrix_by_order(matrix: Iterator[Tuple[int, List[int], List[Decimal]]]) -> Dict[int, Decimal]:
+    """只在内存中按订单累加分摊矩阵（预览使用，不写数据库）"""
+    row_order_ids = []
+    row_totals = None
+    for _, order_ids, amounts in matrix:
+        row_order_ids = order_ids
+        row_totals = amounts if row_totals is None else list(map(add, row_totals, amounts))
+    return dict(zip(row_order_ids, row_totals or []))
+
+
+def allocate_expenses(target_year: int, annual_target: Decimal, preview: bool = False) -> Dict[str, Any]:
+    """
+    重新计算指定年份的费用分摊（不提交事务，由调用方提交）
+
+    摊分基数取年度目标与订单合同总额中的较大值。
+
+    Args:
+        preview: True 时只在内存中计算，不删除/写入分摊记录，也不回写订单，
+                 结果中额外返回 order_results（各订单的合同金额与摊分费用）
+
+    Returns:
+        计算结果统计，包含费用数、订单数、摊分基数、各项合计金额以及 status：
+        - no_expenses: 该年份没有需要分摊的费用
+        - no_orders: 该年份没有订单
+        - zero_base: 摊分基数不大于0
+        - allocated: 分摊完成
+    """
+    annual_target = to_decimal(annual_target)
+
+    if not preview:
+        # 先清空该年份已有的分摊记录
+        delete_year_allocations(target_year)
+
+    expense_ids, expense_amounts = load_expense_columns(target_year)
+    order_ids, order_amounts, machine_costs = load_order_columns(target_year)
+    total_order_amount = sum(order_amounts, Decimal('0'))
+    allocation_base = max(annual_target, total_order_amount)
+    result = {
+        'total_expenses': len(expense_ids),
+        'total_orders': len(order_ids),
+        'annual_target': annual_target,
+        'total_order_amount': total_order_amount,
+        'allocation_base': allocation_base,
+        'total_direct_cost': sum(machine_costs, Decimal('0')),
+        'total_expense_amount': sum(expense_amounts, Decimal('0')),
+        'allocation_count': 0
+    }
+
+    if not expense_ids:
+        result['status'] = 'no_expenses'
+    elif not order_ids:
+        result['status'] = 'no_orders'
+    elif allocation_base <= 0:
+        result['status'] = 'zero_base'
+    else:
+        result['status'] = 'allocated'
+
+    order_totals = {}
+    if result['status'] == 'allocated':
+        matrix = iter_allocation_matrix(expense_ids, expense_amounts, order_ids, order_amounts, allocation_base)
+        if preview:
+            order_totals = sum_matrix_by_order(matrix)
+            result['allocation_count'] = len(expense_ids) * len(order_totals)
+        else:
+            result['allocation_count'], order_totals = write_allocation_matrix(matrix)
+    order_costs = {order_id: order_totals.get(order_id, Decimal('0')) for order_id in order_ids}
+
+    if preview:
+        result['order_results'] = [
+            {'order_id': order_id, 'contract_amount': order_amount, 'proportionate_cost': order_costs[order_id]}
+            for order_id, order_amount in zip(order_ids, order_amounts)
+        ]
+    else:
+        # 没有发生分摊时摊分费用置0，与已清空的分摊记录保持一致
+        update_proportionate_cost(order_costs)
+    return result
+
+
+class ExpenseAllocationService:
+    """
+    费用分摊服务
+
+    /calculate-expense-allocations 与 /orders/update-proportionate-cost 共用的整年分摊流程：
+    读取年度目标、计算分摊、写计算记录、组装返回数据。
+    preview=True 时只在内存中计算各订单结果，不写任何数据，可传入 annual_target 做"假设"测算。
+    """
+
+    # 未发生分摊时的提示（同时用作计算记录备注）
+    STATUS_MESSAGES = {
+        'no_expenses': '该年份({year})没有需要分摊的费用',
+        'no_orders': '该年份({year})没有订单，无法分摊费用',
+        'zero_base': '该年份({year})摊分基础金额为0，无法按比例分摊'
+    }
+
+    def __init__(self, target_year: int, preview: bool = False, annual_target: Any = None):
+        self.target_year = target_year
+        self.preview = preview
+        self.annual_target = to_decimal(annual_target) if annual_target is not None else None
+        self.result = None
+        self.calc_record = None
+
+    def _resolve_annual_target(self) -> Decimal:
+        """获取年度目标；正式计算时若该年份没有年度目标则按默认值创建"""
+        if self.annual_target is not None:
+            return self.annual_target
+        if self.preview:
+            return get_annual_target_amount(self.target_year)
+        annual_target_record = AnnualTarget.query.filter_by(target_year=self.target_year).first()
+        if not annual_target_record:
+            annual_target_record = AnnualTarget(target_year=self.target_year, target_amount=DEFAULT_ANNUAL_TARGET)
+            db.session.add(annual_target_record)
+            db.session.flush()
+        return to_decimal(annual_target_record.target_amount) if annual_target_record.target_amount else DEFAULT_ANNUAL_TARGET
+
+    def run(self, allocated_remark: Optional[str] = None) -> Dict[str, Any]:
+        """
+        执行整年分摊（不提交事务）
+
+        Args:
+            allocated_remark: 分摊成功时计算记录的备注，可包含 {total_expenses}、{total_orders} 占位符；
+                              预览模式下忽略
+        """
+        self.result = allocate_expenses(self.target_year, self._resolve_annual_target(), preview=self.preview)
+        if not self.preview:
+            self.calc_record = ExpenseCalculationRecord(
+                calculation_time=datetime.now(),
+                target_year=self.target_year,
+                status='completed',
+                allocation_base=self.result['allocation_base'],
+                remark=self.message((allocated_remark or '').format(**self.result))
+            )
+            db.session.add(self.calc_record)
+        return self.result
+
+    def message(self, allocated_message: str) -> str:
+        """根据分摊状态返回提示信息"""
+        template = self.STATUS_MESSAGES.get(self.result['status'])
+        return template.format(year=self.target_year) if template else allocated_message
+
+    def response_data(self) -> Dict[str, Any]:
+        """组装接口返回数据（与原接口字段保持一致）"""
+        result = self.result
+        status = result['status']
+        data = {
+            "target_year": self.target_year,
+            "total_expenses": result['total_expenses'] if status != 'no_expenses' else 0,
+            "total_orders": result['total_orders'] if status not in ('no_expenses', 'no_orders') else 0
+        }
+        if status in ('zero_base', 'allocated') or self.preview:
+            data.update({
+                "total_order_amount": float(result['total_order_amount']),
+                "annual_target": float(result['annual_target']),
+                "allocation_base": float(result['allocation_base'])
+            })
+        if status == 'allocated':
+            total_order_amount = float(result['total_order_amount'])
+            total_direct_cost = float(result['total_direct_cost'])
+            total_expense_amount = float(result['total_expense_amount'])
+            data.update({
+                # 总净利 (订单金额 - 成本 - 摊分费用)
+                "total_net_profit": total_order_amount - total_direct_cost - total_expense_amount,
+                # 总毛利 (订单金额 - 成本)
+                "total_gross_profit": total_order_amount - total_direct_cost,
+                "total_direct_cost": total_direct_cost,
+                "total_expense_amount": total_expense_amount
+            })
+        if self.preview:
+            data["preview"] = True
+            data["orders"] = [
+                {
+                    "order_id": item['order_id'],
+                    "contract_amount": float(item['contract_amount']),
+                    "proportionate_cost": float(item['proportionate_cost'])
+                }
+                for item in result['order_results']
+            ]
+        else:
+            data["calculation_time"] = self.calc_record.calculation_time.strftime('%Y-%m-%d %H:%M:%S')
+        return data
+
+
+# ===================== 增量分摊 =====================
+# 全量分摊时会把摊分基数记录在 ExpenseCalculationRecord.allocation_base 中。
+# 之后单笔费用或单个订单发生变化时，只要摊分基数不变，就只改动受影响的分摊记录；
+# 摊分基数变化（年度目标或订单总额变化导致）时才整年重新分摊。
+
+def get_annual_target_amount(target_year: int) -> Decimal:
+    """获取年度目标金额，未设置时使用默认值"""
+    target_amount = db.session.execute(
+        select(AnnualTarget.target_amount).where(AnnualTarget.target_year == target_year)
+    ).scalar()
+    return to_decimal(target_amount) if target_amount else DEFAULT_ANNUAL_TARGET
+
+
+def compute_allocation_base(target_year: int) -> Decimal:
+    """按当前数据计算摊分基数：年度目标与订单合同总额中的较大值"""
+    total_order_amount = db.session.execute(
+        select(func.sum(Order.contract_amount)).where(
+            Order.year_filter(target_year)
+        )
+    ).scalar()
+    return max(get_annual_target_amount(target_year), to_decimal(total_order_amount))
+
+
+def get_stored_allocation_base(target_year: int) -> Optional[Decimal]:
+    """
+    获取最近一次全量分摊记录的摊分基数
+
+    Returns:
+        摊分基数；该年份从未做过全量分摊（或最近一次没有记录基数）时返回 None
+    """
+    allocation_base = db.session.execute(
+        select(ExpenseCalculationRecord.allocation_base).where(
+            ExpenseCalculationRecord.target_year == target_year,
+            ExpenseCalculationRecord.status == 'completed'
+        ).order_by(ExpenseCalculationRecord.calculation_time.desc(), ExpenseCalculationRecord.id.desc()).limit(1)
+    ).scalar()
+    return to_decimal(allocation_base) if allocation_base is not None else None
+
+
+def rebuild_year_allocations(target_year: int, remark: str) -> Dict[str, Any]:
+    """整年重新分摊，并写入带摊分基数的计算记录（不提交事务）"""
+    return ExpenseAllocationService(target_year).run(allocated_remark=remark)
+
+
+def sync_allocation_base(target_year: int, reason: str) -> Optional[bool]:
+    """
+    检查摊分基数是否变化，变化时整年重新分摊
+
+    Returns:
+        None: 该年份尚未分摊，无需处理
+        True: 摊分基数已变化，已整年重新分摊
+        False: 摊分基数未变化，可以增量处理
+    """
+    stored_base = get_stored_allocation_base(target_year)
+    if stored_base is None:
+        return None
+    current_base = compute_allocation_base(target_year)
+    if current_base == stored_base:
+        return False
+    rebuild_year_allocations(target_year, f'{reason}导致摊分基数由{stored_base}变为{current_base}，已自动重新分摊')
+    return True
+
+
+def release_expense_allocations(expense_id: int) -> None:
+    """删除单笔费用的分摊记录，并从相关订单的摊分费用中扣减"""
+    rows = db.session.execute(
+        select(ExpenseAllocation.order_id, ExpenseAllocation.allocated_amount).where(
+            ExpenseAllocation.expense_id == expense_id
+        )
+    ).all()
+    if not rows:
+        return
+    db.session.execute(
+        ExpenseAllocation.__table__.delete().where(ExpenseAllocation.expense_id == expense_id)
+    )
+    deltas = {}
+    for order_id, amount in rows:
+        deltas[order_id] = deltas.get(order_id, Decimal('0')) - to_decimal(amount)
+    update_proportionate_cost(deltas, increment=True)
+
+
+def reallocate_expense(expense_id: int) -> None:
+    """
+    单笔费用新增/修改后增量重算（不提交事务）
+
+    只重写该费用自己的分摊记录，订单摊分费用按差额调整。
+    调用前需先 flush，使费用的最新金额、类型、年份对查询可见。
+    """
+    release_expense_allocations(expense_id)
+
+    expense = db.session.get(Expense, expense_id)
+    if not expense or expense.expense_type != ALLOCATION_EXPENSE_TYPE:
+        return
+
+    target_year = expense.target_year
+    _mark_summary_year(target_year)
+    base_changed = sync_allocation_base(target_year, '费用变动')
+    if base_changed is None or base_changed:
+        # 未分摊的年份不做处理；基数变化时整年重算已包含该费用
+        return
+
+    allocation_base = get_stored_allocation_base(target_year)
+    if allocation_base <= 0:
+        return
+    order_ids, order_amounts, _ = load_order_columns(target_year)
+    matrix = iter_allocation_matrix([expense.id], [to_decimal(expense.amount)], order_ids, order_amounts, allocation_base)
+    _, order_totals = write_allocation_matrix(matrix)
+    update_proportionate_cost(order_totals, increment=True)
+
+
+def reallocate_order(order_id: int, target_year: int) -> None:
+    """
+    单个订单新增/修改合同金额/删除后增量重算（不提交事务）
+
+    订单金额变化会改变订单总额，若因此改变了摊分基数则整年重算；
+    否则只重写该订单自己的分摊记录。订单删除时需在删除前调用 release_order_allocations。
+    """
+    base_changed = sync_allocation_base(target_year, '订单金额变动')
+    if base_changed is None or base_changed:
+        return
+
+    order = db.session.get(Order, order_id)
+    if not order:
+        return
+    db.session.execute(
+        ExpenseAllocation.__table__.delete().where(ExpenseAllocation.order_id == order_id)
+    )
+    _mark_summary_year(target_year)
+
+    allocation_base = get_stored_allocation_base(target_year)
+    order_amount = to_decimal(order.contract_amount)
+    order_totals = {}
+    if allocation_base > 0 and order_amount > 0:
+        expense_ids, expense_amounts = load_expense_columns(target_year)
+        # 转置为单列矩阵：只有这一个订单参与，每笔费用一行
+        matrix = iter_allocation_matrix(expense_ids, expense_amounts, [order_id], [order_amount], allocation_base)
+        _, order_totals = write_allocation_matrix(matrix)
+    update_proportionate_cost({order_id: order_totals.get(order_id, Decimal('0'))})
+
+
+def release_order_allocations(order_id: int) -> None:
+    """删除单个订单的全部分摊记录（删除订单前调用）"""
+    db.session.execute(
+        ExpenseAllocation.__table__.delete().where(ExpenseAllocation.order_id == order_id)
+    )
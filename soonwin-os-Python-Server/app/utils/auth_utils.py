@@ -1,5 +1,10 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from functools import wraps
-from flask import request, jsonify
+from typing import Optional
+from flask import g, request, jsonify
+from sqlalchemy import select
 import jwt
 import config
 from app.models.employee import Employee
@@ -7,29 +12,204 @@ from extensions import db
 from datetime import timedelta
 
 
+# 鉴权所需的员工信息快照（不是ORM对象，可跨请求、跨线程复用）
+EmployeeIdentity = namedtuple('EmployeeIdentity', ['id', 'emp_id', 'name', 'user_role'])
+
+
+class IdentityCache:
+    """
+    员工身份缓存（LRU + TTL）
+    每个页面会同时发起多个接口请求，每个请求的鉴权都要按工号查询一次员工表，
+    这里按工号缓存鉴权结果，超过容量淘汰最久未使用的，超过有效期重新查询。
+    """
+
+    def __init__(self, max_size: int = 256, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, emp_id: str) -> Optional[EmployeeIdentity]:
+        with self._lock:
+            item = self._items.get(emp_id)
+            if item is not None:
+                identity, expires_at = item
+                if expires_at > time.monotonic():
+                    self._items.move_to_end(emp_id)
+                    self.hits += 1
+                    return identity
+                del self._items[emp_id]
+            self.misses += 1
+            return None
+
+    def put(self, emp_id: str, identity: EmployeeIdentity) -> None:
+        with self._lock:
+            self._items[emp_id] = (identity, time.monotonic() + self.ttl)
+            self._items.move_to_end(emp_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, *emp_ids: str) -> None:
+        """使缓存失效（不传工号时清空全部）"""
+        with self._lock:
+            if not emp_ids:
+                self._items.clear()
+                return
+            for emp_id in emp_ids:
+                self._items.pop(emp_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+
+_identity_cache = IdentityCache(
+    max_size=getattr(config.Config, 'IDENTITY_CACHE_SIZE', 256),
+    ttl=getattr(config.Config, 'IDENTITY_CACHE_TTL', 60)
+)
+
+
+def get_employee_identity(emp_id: str) -> Optional[EmployeeIdentity]:
+    """按工号获取员工身份（优先读缓存），员工不存在时返回 None（不存在的结果不缓存）"""
+    if not emp_id:
+        return None
+    identity = _identity_cache.get(emp_id)
+    if identity is not None:
+        return identity
+    row = db.session.execute(
+        select(Employee.id, Employee.emp_id, Employee.name, Employee.user_role).where(Employee.emp_id == emp_id)
+    ).first()
+    if row is None:
+        return None
+    identity = EmployeeIdentity(*row)
+    _identity_cache.put(emp_id, identity)
+    return identity
+
+
+def invalidate_employee_identity(*emp_ids: str) -> None:
+    """员工信息修改、删除后调用，使身份缓存失效（不传工号时清空全部）"""
+    _identity_cache.invalidate(*emp_ids)
+
+
+def identity_cache_stats() -> dict:
+    return _identity_cache.stats()
+
+
+# 令牌解析结果
+AUTH_MISSING = 'missing'    # 未提供令牌
+AUTH_EXPIRED = 'expired'    # 令牌已过期
+AUTH_INVALID = 'invalid'    # 令牌无效
+
+
+def load_request_identity() -> None:
+    """
+    before_request 阶段：每个请求只解析一次 Authorization 令牌，结果保存在 g 中
+    - g.auth_token: 去掉 "Bearer " 前缀后的令牌
+    - g.jwt_payload: 解码后的载荷（解析失败时为 None）
+    - g.auth_error: None 或 AUTH_MISSING / AUTH_EXPIRED / AUTH_INVALID
+    员工身份在第一次调用 get_current_user() 时再查询（带缓存）。
+    """
+    g.auth_token = None
+    g.jwt_payload = None
+    g.auth_error = None
+    g.pop('current_user', None)
+
+    token = request.headers.get('Authorization')
+    if not token:
+        g.auth_error = AUTH_MISSING
+        return
+    # 移除 "Bearer " 前缀
+    if token.startswith("Bearer "):
+        token = token[7:]
+    g.auth_token = token
+
+    try:
+        g.jwt_payload = jwt.decode(token, config.Config.JWT_SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        g.auth_error = AUTH_EXPIRED
+    except jwt.InvalidTokenError:
+        g.auth_error = AUTH_INVALID
+
+
+def register_auth_middleware(app) -> None:
+    """在 create_app 中调用，注册令牌解析的 before_request 阶段"""
+    app.before_request(load_request_identity)
+
+
+def _ensure_request_identity() -> None:
+    # 未经过 before_request 的调用（如测试中直接调用视图函数）在这里补做解析
+    if 'auth_error' not in g:
+        load_request_identity()
+
+
+def get_jwt_payload() -> Optional[dict]:
+    """当前请求的令牌载荷，令牌缺失或无效时返回 None"""
+    _ensure_request_identity()
+    return g.jwt_payload
+
+
+def get_auth_error() -> Optional[str]:
+    _ensure_request_identity()
+    return g.auth_error
+
+
+def get_current_user() -> Optional[EmployeeIdentity]:
+    """当前请求的员工身份（同一请求内只查询一次），令牌无效或员工不存在时返回 None"""
+    _ensure_request_identity()
+    if 'current_user' not in g:
+        payload = g.jwt_payload
+        g.current_user = get_employee_identity(payload.get('emp_id')) if payload else None
+    return g.current_user
+
+
+def is_admin_request() -> bool:
+    """当前请求是否来自管理员（用于按权限控制返回字段的公开接口，未登录视为非管理员）"""
+    user = get_current_user()
+    return user is not None and user.user_role == 'admin'
+
+
+def _auth_error_response(auth_error: str, expired_msg: str = "令牌已过期"):
+    if auth_error == AUTH_MISSING:
+        return jsonify({
+            "code": 401,
+            "msg": "缺少访问令牌",
+            "data": None
+        }), 401
+    if auth_error == AUTH_EXPIRED:
+        return jsonify({
+            "code": 401,
+            "msg": expired_msg,
+            "data": None
+        }), 401
+    return jsonify({
+        "code": 401,
+        "msg": "无效的令牌",
+        "data": None
+    }), 401
+
+
 def require_admin(f):
     """管理员权限装饰器"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({
-                "code": 401,
-                "msg": "缺少访问令牌",
-                "data": None
-            }), 401
-
-        # 移除 "Bearer " 前缀
-        if token.startswith("Bearer "):
-            token = token[7:]
-
         try:
-            # 解码JWT令牌
-            payload = jwt.decode(token, config.Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            emp_id = payload['emp_id']
+            auth_error = get_auth_error()
+            if auth_error:
+                return _auth_error_response(auth_error)
 
-            # 查询员工信息
-            employee = Employee.query.filter_by(emp_id=emp_id).first()
+            # 查询员工信息（同一请求内复用，跨请求带缓存）
+            employee = get_current_user()
             if not employee:
                 return jsonify({
                     "code": 401,
@@ -45,18 +225,6 @@ def require_admin(f):
                     "data": None
                 }), 403
 
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                "code": 401,
-                "msg": "令牌已过期",
-                "data": None
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                "code": 401,
-                "msg": "无效的令牌",
-                "data": None
-            }), 401
         except Exception as e:
             return jsonify({
                 "code": 500,
@@ -73,25 +241,13 @@ def require_auth(f):
     """基本认证装饰器 - 不允许过期token"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({
-                "code": 401,
-                "msg": "缺少访问令牌",
-                "data": None
-            }), 401
-
-        # 移除 "Bearer " 前缀
-        if token.startswith("Bearer "):
-            token = token[7:]
-
         try:
-            # 解码JWT令牌
-            payload = jwt.decode(token, config.Config.JWT_SECRET_KEY, algorithms=['HS256'])
-            emp_id = payload['emp_id']
+            auth_error = get_auth_error()
+            if auth_error:
+                return _auth_error_response(auth_error)
 
-            # 查询员工信息
-            employee = Employee.query.filter_by(emp_id=emp_id).first()
+            # 查询员工信息（同一请求内复用，跨请求带缓存）
+            employee = get_current_user()
             if not employee:
                 return jsonify({
                     "code": 401,
@@ -99,18 +255,6 @@ def require_auth(f):
                     "data": None
                 }), 401
 
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                "code": 401,
-                "msg": "令牌已过期",
-                "data": None
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                "code": 401,
-                "msg": "无效的令牌",
-                "data": None
-            }), 401
         except Exception as e:
             return jsonify({
                 "code": 500,
@@ -127,33 +271,30 @@ def require_auth_with_leeway(f):
     """基本认证装饰器 - 允许过期token在一定宽限时间内使用（用于token刷新）"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({
-                "code": 401,
-                "msg": "缺少访问令牌",
-                "data": None
-            }), 401
-
-        # 移除 "Bearer " 前缀
-        if token.startswith("Bearer "):
-            token = token[7:]
-
         try:
-            # 解码JWT令牌，允许5分钟宽限期
-            payload = jwt.decode(
-                token,
-                config.Config.JWT_SECRET_KEY,
-                algorithms=['HS256'],
-                options={
-                    "verify_exp": True
-                },
-                leeway=timedelta(minutes=5)  # 允许5分钟的宽限时间
-            )
-            emp_id = payload['emp_id']
+            auth_error = get_auth_error()
+            payload = g.jwt_payload
+            if auth_error == AUTH_EXPIRED:
+                # 只有过期的令牌需要按5分钟宽限期重新解码
+                try:
+                    payload = jwt.decode(
+                        g.auth_token,
+                        config.Config.JWT_SECRET_KEY,
+                        algorithms=['HS256'],
+                        options={
+                            "verify_exp": True
+                        },
+                        leeway=timedelta(minutes=5)  # 允许5分钟的宽限时间
+                    )
+                except jwt.ExpiredSignatureError:
+                    return _auth_error_response(AUTH_EXPIRED, "令牌已过期超过宽限时间")
+                except jwt.InvalidTokenError:
+                    return _auth_error_response(AUTH_INVALID)
+            elif auth_error:
+                return _auth_error_response(auth_error)
 
             # 查询员工信息
-            employee = Employee.query.filter_by(emp_id=emp_id).first()
+            employee = get_employee_identity(payload.get('emp_id'))
             if not employee:
                 return jsonify({
                     "code": 401,
@@ -161,18 +302,6 @@ def require_auth_with_leeway(f):
                     "data": None
                 }), 401
 
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                "code": 401,
-                "msg": "令牌已过期超过宽限时间",
-                "data": None
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                "code": 401,
-                "msg": "无效的令牌",
-                "data": None
-            }), 401
         except Exception as e:
             return jsonify({
                 "code": 500,
@@ -182,4 +311,4 @@ def require_auth_with_leeway(f):
 
         return f(*args, **kwargs)
 
-    return decorated_function
\ No newline at end of file
+    return decorated_function
@@ -0,0 +1,429 @@
+"""
+内容寻址存储模块
+上传的图片保存到 assets/Blobs/<前2位>/<3-4位>/<SHA-256><扩展名>，相同内容只保存一份：
+- 检查项批量保存、订单保存时，TempFiles 中的文件按内容哈希存入（已存在则直接删除临时文件），
+  InspectionItem.photo_path、Order.attachment_imgs 中记录存储路径，可直接通过 /assets 静态路由访问；
+- Blob 表记录每个文件的引用次数：flush 后根据上述字段的新旧值统计增减，
+  提交前在同一事务内更新（与年度财务汇总的维护方式一致）；
+- 清理任务（sweep_blob_store）先按数据库实际引用重算引用次数，再删除引用为0且超过保留期的文件、
+  没有记录的孤立文件、过期的 TempFiles 临时文件和 DeleteFiles 中过期的已删除文件。
+删除检查项或图片时不再移动存储中的文件，只减少引用次数。
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from flask import current_app
+from sqlalchemy import event, func, inspect, select, update
+
+from extensions import db
+from app.models.blob import Blob
+from app.models.order import Order
+from app.models.order_inspection import InspectionItem
+from app.utils.file_ops_utils import DELETED_FILES_FOLDER, get_base_path, get_file_ops
+
+# 内容寻址存储目录
+BLOB_FOLDER = 'assets/Blobs'
+# 临时上传目录（与 upload_routes 一致）
+TEMP_FILES_FOLDER = 'assets/TempFiles'
+
+# 引用存储文件的字段（逗号分隔的多个路径）
+BLOB_REF_COLUMNS = {
+    InspectionItem: ('photo_path',),
+    Order: ('attachment_imgs',),
+}
+
+_BLOB_PATH_RE = re.compile(r'^assets/Blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[A-Za-z0-9]{1,9})?$')
+_HASH_BUFFER_SIZE = 1024 * 1024
+
+# session.info 中保存待更新引用次数的键：{sha256: [增减数, 扩展名]}
+_REF_DELTA_KEY = 'blob_ref_delta'
+
+
+def blob_store_enabled() -> bool:
+    return current_app.config.get('BLOB_STORE_ENABLED', True)
+
+
+def normalize_path(path: str) -> str:
+    return path.strip().replace('\\', '/')
+
+
+def split_paths(value: Optional[str]):
+    """拆分逗号分隔的多个路径"""
+    return [path.strip() for path in value.split(',') if path.strip()] if value else []
+
+
+def blob_path(sha256: str, ext: str = '') -> str:
+    """存储文件的相对路径"""
+    return f'{BLOB_FOLDER}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}'
+
+
+def parse_blob_path(path: str) -> Optional[Tuple[str, str]]:
+    """存储路径解析为 (sha256, 扩展名)，不是存储路径时返回 None"""
+    match = _BLOB_PATH_RE.match(normalize_path(path))
+    return (match.group(1), match.group(2) or '') if match else None
+
+
+def is_blob_path(path: str) -> bool:
+    return parse_blob_path(path) is not None
+
+
+def is_temp_path(path: str) -> bool:
+    return normalize_path(path).startswith(TEMP_FILES_FOLDER + '/')
+
+
+def hash_file(abs_path: str) -> Tuple[str, int]:
+    """流式计算文件的 SHA-256，返回 (十六进制摘要, 文件大小)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(abs_path, 'rb') as f:
+        while True:
+            buffer = f.read(_HASH_BUFFER_SIZE)
+            if not buffer:
+                break
+            digest.update(buffer)
+            size += len(buffer)
+    return digest.hexdigest(), size
+
+
+def _find_existing_blob(base_path: str, sha256: str) -> Optional[str]:
+    """查找已保存的同内容文件（扩展名可能不同），返回相对路径"""
+    fanout_dir = os.path.join(base_path, os.path.dirname(blob_path(sha256)))
+    if not os.path.isdir(fanout_dir):
+        return None
+    for name in os.listdir(fanout_dir):
+        if name.startswith(sha256) and not name.endswith('.tmp'):
+            return f'{os.path.dirname(blob_path(sha256))}/{name}'
+    return None
+
+
+def store_file(base_path: str, source_path: str, keep_source: bool = False) -> str:
+    """
+    把文件存入内容寻址存储，返回存储路径（相同内容只保存一份）
+
+    Args:
+        keep_source: True 时复制（导入已有文件），否则移动（临时上传文件）
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+    """
+    if is_blob_path(source_path):
+        return normalize_path(source_path)
+    source_abs_path = os.path.join(base_path, source_path)
+    if not os.path.exists(source_abs_path):
+        raise FileNotFoundError('源文件不存在')
+
+    sha256, _ = hash_file(source_abs_path)
+    existing = _find_existing_blob(base_path, sha256)
+    if existing:
+        if not keep_source:
+            os.remove(source_abs_path)
+        # 刷新修改时间，避免刚被复用的孤立文件被清理
+        os.utime(os.path.join(base_path, existing))
+        return existing
+
+    ext = os.path.splitext(source_path)[1].lower()
+    ext = ext if re.fullmatch(r'\.[a-z0-9]{1,9}', ext) else ''
+    relative_path = blob_path(sha256, ext)
+    target_abs_path = os.path.join(base_path, relative_path)
+    os.makedirs(os.path.dirname(target_abs_path), exist_ok=True)
+    temp_path = f'{target_abs_path}.{threading.get_ident()}.tmp'
+    try:
+        if keep_source:
+            shutil.copyfile(source_abs_path, temp_path)
+        else:
+            shutil.move(source_abs_path, temp_path)
+        os.replace(temp_path, target_abs_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    os.utime(target_abs_path)
+    return relative_path
+
+
+def store_temp_paths(value: Optional[str]) -> Optional[str]:
+    """把逗号分隔路径中的 TempFiles 临时文件存入存储，返回替换后的路径（失败的保留原路径）"""
+    paths = split_paths(value)
+    temp_paths = [path for path in paths if is_temp_path(path)]
+    if not temp_paths or not blob_store_enabled():
+        return value
+    stored = {}
+    for result in get_file_ops().store_many(temp_paths):
+        if result.ok:
+            stored[result.source] = result.target
+        else:
+            print(f"文件存入存储失败: {result.source}, 错误: {result.error}")
+    return ','.join(stored.get(path, path) for path in paths)
+
+
+# ===================== 引用计数 =====================
+
+def _add_refs(delta: Dict[str, list], value: Optional[str], sign: int) -> None:
+    for path in split_paths(value):
+        parsed = parse_blob_path(path)
+        if parsed:
+            sha256, ext = parsed
+            entry = delta.setdefault(sha256, [0, ext])
+            entry[0] += sign
+
+
+def _after_flush(session, flush_context) -> None:
+    delta = None
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        columns = BLOB_REF_COLUMNS.get(type(obj))
+        if not columns:
+            continue
+        if delta is None:
+            delta = session.info.setdefault(_REF_DELTA_KEY, {})
+        state = inspect(obj)
+        for column in columns:
+            history = state.attrs[column].history
+            if obj in session.deleted:
+                for value in list(history.unchanged or []) + list(history.deleted or []):
+                    _add_refs(delta, value, -1)
+            elif obj in session.new or history.has_changes():
+                for value in history.added or []:
+                    _add_refs(delta, value, 1)
+                for value in history.deleted or []:
+                    _add_refs(delta, value, -1)
+
+
+def _blob_size(sha256: str, ext: str) -> Optional[int]:
+    try:
+        return os.path.getsize(os.path.join(get_base_path(), blob_path(sha256, ext)))
+    except OSError:
+        return None
+
+
+def _before_commit(session) -> None:
+    session.flush()
+    delta = session.info.pop(_REF_DELTA_KEY, None)
+    if not delta:
+        return
+    now = datetime.now()
+    for sha256, (count, ext) in delta.items():
+        if count == 0:
+            continue
+        updated = session.execute(
+            update(Blob).where(Blob.sha256 == sha256).values(
+                ref_count=func.max(Blob.ref_count + count, 0),
+                update_time=now
+            )
+        ).rowcount
+        if not updated:
+            session.add(Blob(sha256=sha256, ext=ext, size=_blob_size(sha256, ext), ref_count=max(count, 0)))
+    session.flush()
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_REF_DELTA_KEY, None)
+
+
+def register_blob_ref_events(session=None) -> None:
+    """在 create_app 中调用，注册维护存储文件引用次数的事件"""
+    session = session or db.session
+    if not event.contains(session, 'after_flush', _after_flush):
+        # 修改前未加载的字段在赋值时先加载旧值，才能减少旧路径的引用
+        for model, columns in BLOB_REF_COLUMNS.items():
+            for column in columns:
+                event.listen(getattr(model, column), 'set', lambda target, value, oldvalue, initiator: value,
+                             active_history=True, retval=True)
+        event.listen(session, 'after_flush', _after_flush)
+        event.listen(session, 'before_commit', _before_commit)
+        event.listen(session, 'after_soft_rollback', lambda s, previous_transaction: _after_rollback(s))
+
+
+# ===================== 清理 =====================
+
+def collect_references() -> Tuple[Counter, Dict[str, str], Set[str]]:
+    """扫描引用字段，返回 (各存储文件的引用次数, 扩展名, 仍被引用的非存储路径)"""
+    counts = Counter()
+    exts = {}
+    plain_paths = set()
+    for model, columns in BLOB_REF_COLUMNS.items():
+        for column in columns:
+            attr = getattr(model, column)
+            for value in db.session.execute(select(attr).where(attr.isnot(None))).scalars():
+                for path in split_paths(value):
+                    parsed = parse_blob_path(path)
+                    if parsed:
+                        counts[parsed[0]] += 1
+                        exts[parsed[0]] = parsed[1]
+                    else:
+                        plain_paths.add(normalize_path(path))
+    return counts, exts, plain_paths
+
+
+def recount_blob_refs(counts: Counter, exts: Dict[str, str]) -> int:
+    """按实际引用修正 Blob 表的引用次数（不提交事务），返回修正的行数"""
+    fixed = 0
+    blobs = {blob.sha256: blob for blob in Blob.query.all()}
+    for sha256, blob in blobs.items():
+        if blob.ref_count != counts.get(sha256, 0):
+            blob.ref_count = counts.get(sha256, 0)
+            fixed += 1
+    for sha256 in counts.keys() - blobs.keys():
+        db.session.add(Blob(sha256=sha256, ext=exts[sha256], size=_blob_size(sha256, exts[sha256]),
+                            ref_count=counts[sha256]))
+        fixed += 1
+    return fixed
+
+
+def _remove(abs_path: str, stats: dict, key: str, dry_run: bool) -> None:
+    try:
+        size = os.path.getsize(abs_path) if os.path.isfile(abs_path) else 0
+        if not dry_run:
+            if os.path.isdir(abs_path):
+                shutil.rmtree(abs_path)
+            else:
+                os.remove(abs_path)
+        stats[key] += 1
+        stats['bytes_freed'] += size
+    except OSError as e:
+        print(f"清理文件失败: {abs_path}, 错误: {str(e)}")
+
+
+def _latest_mtime(abs_path: str) -> float:
+    """文件的修改时间；目录（如分块上传目录）取其中最新的修改时间"""
+    latest = os.path.getmtime(abs_path)
+    if os.path.isdir(abs_path):
+        for root, _, files in os.walk(abs_path):
+            for name in files:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+
+def sweep_blob_store(grace_hours: float = 24, temp_retention_hours: float = 72,
+                     deleted_retention_days: float = 30, dry_run: bool = False,
+                     progress: Optional[Callable[[int, str], None]] = None) -> dict:
+    """
+    清理存储文件与临时文件，返回统计信息
+
+    Args:
+        grace_hours: 引用为0（或没有记录）的存储文件保留的小时数
+        temp_retention_hours: TempFiles 中未被引用的临时文件保留的小时数
+        deleted_retention_days: DeleteFiles 中已删除文件保留的天数
+        dry_run: 只统计不删除
+        progress: 进度回调 progress(百分比, 说明)
+    """
+    from app.utils.write_queue_utils import run_write
+
+    progress = progress or (lambda percent, message: None)
+    base_path = get_base_path()
+    now = time.time()
+    stats = Counter(refs_fixed=0, blobs_deleted=0, orphan_blobs_deleted=0,
+                    temp_files_deleted=0, deleted_files_purged=0, bytes_freed=0)
+
+    # 1. 修正引用次数，删除引用为0且超过保留期的记录（文件在事务提交后删除）
+    progress(10, "正在统计存储文件引用")
+
+    def collect_garbage():
+        counts, exts, plain_paths = collect_references()
+        fixed = recount_blob_refs(counts, exts)
+        cutoff = datetime.now() - timedelta(hours=grace_hours)
+        garbage = Blob.query.filter(Blob.ref_count <= 0, Blob.update_time < cutoff).all()
+        garbage_paths = [blob_path(blob.sha256, blob.ext) for blob in garbage]
+        known = {blob.sha256 for blob in Blob.query.all()} - {blob.sha256 for blob in garbage}
+        if dry_run:
+            db.session.rollback()
+        else:
+            for blob in garbage:
+                db.session.delete(blob)
+        return fixed, garbage_paths, known, plain_paths
+
+    fixed, garbage_paths, known_shas, plain_paths = run_write(collect_garbage)
+    stats['refs_fixed'] = fixed
+    grace_cutoff = now - grace_hours * 3600
+    for path in garbage_paths:
+        abs_path = os.path.join(base_path, path)
+        # store_file 复用已有文件时会更新修改时间，此时引用它的事务可能尚未提交，保留文件
+        if os.path.exists(abs_path) and os.path.getmtime(abs_path) < grace_cutoff:
+            _remove(abs_path, stats, 'blobs_deleted', dry_run)
+
+    # 2. 没有记录的孤立存储文件（写入中断留下的临时文件、入库后事务未提交的文件）
+    progress(40, "正在清理孤立的存储文件")
+    blob_root = os.path.join(base_path, BLOB_FOLDER)
+    for root, _, files in os.walk(blob_root):
+        for name in files:
+            abs_path = os.path.join(root, name)
+            if name[:64] in known_shas or os.path.getmtime(abs_path) >= grace_cutoff:
+                continue
+            _remove(abs_path, stats, 'orphan_blobs_deleted', dry_run)
+
+    # 3. 过期且未被引用的临时文件（含未完成的分块上传目录）
+    progress(60, "正在清理过期的临时文件")
+    temp_root = os.path.join(base_path, TEMP_FILES_FOLDER)
+    temp_cutoff = now - temp_retention_hours * 3600
+    if os.path.isdir(temp_root):
+        entries = [os.path.join(temp_root, name) for name in os.listdir(temp_root)]
+        chunk_root = os.path.join(temp_root, 'chunks')
+        if os.path.isdir(chunk_root):
+            entries.remove(chunk_root)
+            entries.extend(os.path.join(chunk_root, name) for name in os.listdir(chunk_root))
+        for abs_path in entries:
+            relative_path = normalize_path(os.path.relpath(abs_path, base_path))
+            if relative_path in plain_paths or _latest_mtime(abs_path) >= temp_cutoff:
+                continue
+            _remove(abs_path, stats, 'temp_files_deleted', dry_run)
+
+    # 4. 超过保留期的已删除文件
+    progress(80, "正在清理过期的已删除文件")
+    deleted_root = os.path.join(base_path, DELETED_FILES_FOLDER)
+    deleted_cutoff = now - deleted_retention_days * 86400
+    if os.path.isdir(deleted_root):
+        for name in os.listdir(deleted_root):
+            abs_path = os.path.join(deleted_root, name)
+            if _latest_mtime(abs_path) < deleted_cutoff:
+                _remove(abs_path, stats, 'deleted_files_purged', dry_run)
+
+    progress(100, "清理完成" if not dry_run else "清理统计完成（未删除文件）")
+    return dict(stats, dry_run=dry_run)
+
+
+def import_existing_files(batch_size: int = 200) -> dict:
+    """
+    把引用字段中已有的非存储路径（如 assets/OrderInspection 下的文件）复制到存储并改写路径
+
+    原文件保留不动，确认无误后可手动删除。
+    """
+    from app.utils.write_queue_utils import run_write
+
+    base_path = get_base_path()
+    stats = Counter(rows_updated=0, files_imported=0, files_missing=0)
+    for model, columns in BLOB_REF_COLUMNS.items():
+        pk = inspect(model).primary_key[0]
+        last_id = None
+        while True:
+            def import_batch():
+                query = model.query.order_by(pk)
+                if last_id is not None:
+                    query = query.filter(pk > last_id)
+                rows = query.limit(batch_size).all()
+                for row in rows:
+                    for column in columns:
+                        paths = split_paths(getattr(row, column))
+                        new_paths = []
+                        for path in paths:
+                            if is_blob_path(path) or not os.path.exists(os.path.join(base_path, path)):
+                                if not is_blob_path(path):
+                                    stats['files_missing'] += 1
+                                new_paths.append(path)
+                                continue
+                            new_paths.append(store_file(base_path, path, keep_source=True))
+                            stats['files_imported'] += 1
+                        if new_paths != paths:
+                            setattr(row, column, ','.join(new_paths))
+                            stats['rows_updated'] += 1
+                return getattr(rows[-1], pk.key) if rows else None
+
+            last_id = run_write(import_batch)
+            if last_id is None:
+                break
+    return dict(stats)
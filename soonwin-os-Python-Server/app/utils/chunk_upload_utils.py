@@ -0,0 +1,236 @@
+"""
+分块上传模块（可断点续传）
+每个上传（file_identifier）在 assets/TempFiles/chunks/<标识> 目录下保存：
+- <序号>.part：已完整接收的分块（先写临时文件，接收完成并校验通过后再改名，存在即表示完整）；
+- meta.json：文件名、分块总数、整个文件的校验值，合并完成后还记录结果。
+  合并后的文件被取走（存入存储或移到验收目录）后结果作废，同一标识再次上传时重新开始；
+分块可以乱序、并行上传，任意一个分块到达后发现全部分块已齐就合并：
+- 分块和合并都以固定大小的缓冲区流式读写，同时计算 SHA-256，不把整个分块读入内存；
+- 客户端可为每个分块提供 chunk_checksum、为整个文件提供 file_checksum（SHA-256 十六进制），
+  不一致时拒绝该分块或丢弃合并结果，不会静默生成损坏的文件；
+- 同一上传的合并和 meta.json 读写由进程内的锁串行化，锁在没有线程使用时即删除。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from werkzeug.utils import secure_filename
+
+# 流式读写的缓冲区大小
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# 上传目录 -> [锁, 正在使用或等待的线程数]
+_upload_locks: Dict[str, list] = {}
+_upload_locks_guard = threading.Lock()
+
+
+class ChunkUploadError(ValueError):
+    """分块参数错误或校验失败"""
+
+
+@contextmanager
+def _upload_lock(key: str):
+    """同一上传的互斥锁；最后一个使用者退出时删除（放弃或校验失败的上传不会留下锁）"""
+    with _upload_locks_guard:
+        entry = _upload_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _upload_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _upload_locks.pop(key, None)
+
+
+def copy_stream(source: BinaryIO, target: BinaryIO, digest=None) -> int:
+    """以固定缓冲区复制数据（可同时更新摘要），返回复制的字节数"""
+    size = 0
+    while True:
+        buffer = source.read(COPY_BUFFER_SIZE)
+        if not buffer:
+            break
+        target.write(buffer)
+        if digest is not None:
+            digest.update(buffer)
+        size += len(buffer)
+    return size
+
+
+def _normalize_checksum(checksum: Optional[str]) -> Optional[str]:
+    return checksum.strip().lower() if checksum and checksum.strip() else None
+
+
+class ChunkUpload:
+    """
+    一次分块上传
+
+    Args:
+        chunk_root: 分块存储根目录（绝对路径）
+        file_identifier: 客户端生成的上传标识
+        base_path: 服务端根目录，合并结果中的路径相对该目录
+    """
+
+    def __init__(self, chunk_root: str, file_identifier: str, base_path: str):
+        safe_identifier = secure_filename(file_identifier or '')
+        if not safe_identifier:
+            raise ChunkUploadError('无效的文件标识')
+        self.file_identifier = file_identifier
+        self.base_path = base_path
+        self.safe_identifier = safe_identifier
+        self.upload_dir = os.path.join(chunk_root, safe_identifier)
+        self.meta_path = os.path.join(self.upload_dir, 'meta.json')
+
+    def chunk_path(self, chunk_index: int) -> str:
+        return os.path.join(self.upload_dir, f'{chunk_index}.part')
+
+    def _read_meta(self) -> Dict[str, Any]:
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _drop_consumed_result(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """在锁内调用：合并后的文件已不存在时删除 meta.json，按新的上传处理"""
+        result = meta.get('result')
+        if result and not os.path.exists(os.path.join(self.base_path, result['path'])):
+            try:
+                os.remove(self.meta_path)
+            except FileNotFoundError:
+                pass
+            return {}
+        return meta
+
+    def load_meta(self) -> Dict[str, Any]:
+        """读取 meta.json，合并结果已被取走时返回空字典"""
+        meta = self._read_meta()
+        if meta.get('result'):
+            with _upload_lock(self.upload_dir):
+                meta = self._drop_consumed_result(self._read_meta())
+        return meta
+
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        temp_path = f'{self.meta_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, self.meta_path)
+
+    def update_meta(self, **values) -> Dict[str, Any]:
+        """合并非空字段到 meta.json；分块总数与已记录的不一致时报错"""
+        with _upload_lock(self.upload_dir):
+            os.makedirs(self.upload_dir, exist_ok=True)
+            meta = self._drop_consumed_result(self._read_meta())
+            total_chunks = values.get('total_chunks')
+            if total_chunks and meta.get('total_chunks') and meta['total_chunks'] != total_chunks:
+                raise ChunkUploadError(f"分块总数不一致：已记录{meta['total_chunks']}，本次{total_chunks}")
+            changed = False
+            for key, value in values.items():
+                if value and meta.get(key) != value:
+                    meta[key] = value
+                    changed = True
+            if changed:
+                self._save_meta(meta)
+            return meta
+
+    def received_chunks(self) -> List[int]:
+        if not os.path.isdir(self.upload_dir):
+            return []
+        indexes = []
+        for name in os.listdir(self.upload_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == '.part' and stem.isdigit():
+                indexes.append(int(stem))
+        return sorted(indexes)
+
+    def save_chunk(self, chunk_index: int, stream: BinaryIO, checksum: Optional[str] = None) -> Dict[str, Any]:
+        """
+        流式保存一个分块，返回 {'size', 'sha256'}
+
+        Raises:
+            ChunkUploadError: 提供的分块校验值与实际内容不一致（该分块不会被保存）
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        final_path = self.chunk_path(chunk_index)
+        # 同一分块可能被并行重传，各自使用不同的临时文件
+        temp_path = f'{final_path}.{threading.get_ident()}.tmp'
+        digest = hashlib.sha256()
+        try:
+            with open(temp_path, 'wb') as f:
+                size = copy_stream(stream, f, digest)
+            expected = _normalize_checksum(checksum)
+            if expected and expected != digest.hexdigest():
+                raise ChunkUploadError(f'分块{chunk_index}校验失败，请重新上传该分块')
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return {'size': size, 'sha256': digest.hexdigest()}
+
+    def missing_chunks(self, total_chunks: int) -> List[int]:
+        received = set(self.received_chunks())
+        return [i for i in range(total_chunks) if i not in received]
+
+    def assemble_if_complete(self, final_path: str) -> Optional[Dict[str, Any]]:
+        """
+        全部分块已齐时合并到 final_path，返回合并结果；未齐时返回 None
+
+        已合并过且合并后的文件仍在的上传直接返回记录的结果，并行到达的多个分块只会合并一次。
+
+        Raises:
+            ChunkUploadError: 整个文件的校验值不一致（合并结果被删除，分块保留可重新校验）
+        """
+        with _upload_lock(self.upload_dir):
+            meta = self._drop_consumed_result(self._read_meta())
+            if meta.get('result'):
+                return meta['result']
+            total_chunks = meta.get('total_chunks')
+            if not total_chunks or self.missing_chunks(total_chunks):
+                return None
+
+            digest = hashlib.sha256()
+            temp_path = f'{final_path}.assembling'
+            size = 0
+            try:
+                with open(temp_path, 'wb') as final_file:
+                    for i in range(total_chunks):
+                        with open(self.chunk_path(i), 'rb') as chunk_file:
+                            size += copy_stream(chunk_file, final_file, digest)
+                expected = _normalize_checksum(meta.get('file_checksum'))
+                if expected and expected != digest.hexdigest():
+                    raise ChunkUploadError('文件校验失败，请检查后重新上传')
+                os.replace(temp_path, final_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+            # 删除已合并的分块，只保留记录了结果的 meta.json 供状态查询
+            for i in range(total_chunks):
+                os.remove(self.chunk_path(i))
+            meta['result'] = {
+                'path': os.path.relpath(final_path, self.base_path),
+                'filename': os.path.basename(final_path),
+                'size': size,
+                'sha256': digest.hexdigest()
+            }
+            self._save_meta(meta)
+            return meta['result']
+
+    def status(self) -> Dict[str, Any]:
+        meta = self.load_meta()
+        total_chunks = meta.get('total_chunks')
+        received = self.received_chunks()
+        return {
+            'file_identifier': self.file_identifier,
+            'filename': meta.get('filename'),
+            'total_chunks': total_chunks,
+            'received_chunks': received,
+            'missing_chunks': self.missing_chunks(total_chunks) if total_chunks and not meta.get('result') else [],
+            'completed': bool(meta.get('result')),
+            'result': meta.get('result')
+        }
@@ -0,0 +1,50 @@
+"""
+员工信息缓存模块
+列表接口需要按工号显示员工当前姓名，逐行查询员工表会产生 N+1 查询。
+这里在进程内缓存 工号 -> 姓名，缺失的工号一次批量查询补齐；
+员工新增、修改、删除后调用 invalidate_employee_names 使缓存失效。
+"""
+
+import threading
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import select
+
+from extensions import db
+from app.models.employee import Employee
+
+_name_cache: Dict[str, Optional[str]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_employee_names(emp_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    """
+    批量获取员工当前姓名
+
+    Returns:
+        {工号: 姓名}，员工不存在时姓名为 None
+    """
+    emp_ids = {emp_id for emp_id in emp_ids if emp_id}
+    with _cache_lock:
+        names = {emp_id: _name_cache[emp_id] for emp_id in emp_ids if emp_id in _name_cache}
+    missing = emp_ids - names.keys()
+    if missing:
+        loaded = dict(db.session.execute(
+            select(Employee.emp_id, Employee.name).where(Employee.emp_id.in_(missing))
+        ).all())
+        # 不存在的工号也缓存为 None，避免已删除员工的历史记录反复查询
+        loaded.update({emp_id: None for emp_id in missing - loaded.keys()})
+        with _cache_lock:
+            _name_cache.update(loaded)
+        names.update(loaded)
+    return names
+
+
+def invalidate_employee_names(*emp_ids: str) -> None:
+    """使员工姓名缓存失效（不传工号时清空全部）"""
+    with _cache_lock:
+        if not emp_ids:
+            _name_cache.clear()
+            return
+        for emp_id in emp_ids:
+            _name_cache.pop(emp_id, None)
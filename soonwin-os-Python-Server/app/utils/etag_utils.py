@@ -0,0 +1,120 @@
+"""
+条件请求（ETag / If-None-Match）模块
+机型、部件、展示文件列表和订单统计被所有客户端轮询，但很少变化。
+这里为每张表维护一个进程内版本号：
+- 会话 flush 的新增/修改/删除对象，以及通过 session.execute 执行的 insert/update/delete 语句，
+  记录其所在的表，事务提交后对应表的版本号加一（回滚则丢弃）；
+- 接口的 ETag 由相关表的版本号、请求路径参数和 Authorization 头计算得出，
+  客户端带上 If-None-Match 且未变化时直接返回 304，不执行查询和序列化。
+版本号中带有进程启动标识，服务重启后所有 ETag 自动失效。
+"""
+
+import hashlib
+import threading
+import uuid
+from functools import wraps
+from typing import Dict, Iterable
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from extensions import db
+
+_DIRTY_TABLES_KEY = 'etag_dirty_tables'
+
+_boot_id = uuid.uuid4().hex[:8]
+_versions: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+
+def get_table_versions(tables: Iterable[str]) -> Dict[str, int]:
+    with _versions_lock:
+        return {table: _versions.get(table, 0) for table in tables}
+
+
+def bump_table_versions(*tables: str) -> None:
+    """手动使表的 ETag 失效（绕过会话直接写库时调用）"""
+    with _versions_lock:
+        for table in tables:
+            _versions[table] = _versions.get(table, 0) + 1
+
+
+def _dirty_tables(session) -> set:
+    return session.info.setdefault(_DIRTY_TABLES_KEY, set())
+
+
+def _after_flush(session, flush_context) -> None:
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__tablename__', None)
+        if table:
+            _dirty_tables(session).add(table)
+
+
+def _do_orm_execute(orm_execute_state) -> None:
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _dirty_tables(orm_execute_state.session).add(table.name)
+
+
+def _after_commit(session) -> None:
+    tables = session.info.pop(_DIRTY_TABLES_KEY, None)
+    if tables:
+        bump_table_versions(*tables)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_DIRTY_TABLES_KEY, None)
+
+
+def register_table_version_events(session=None) -> None:
+    """在 create_app 中调用，注册维护表版本号的会话事件"""
+    session = session or db.session
+    if not event.contains(session, 'after_flush', _after_flush):
+        event.listen(session, 'after_flush', _after_flush)
+        event.listen(session, 'do_orm_execute', _do_orm_execute)
+        event.listen(session, 'after_commit', _after_commit)
+        event.listen(session, 'after_soft_rollback', lambda s, previous_transaction: _after_rollback(s))
+
+
+def compute_etag(tables: Iterable[str]) -> str:
+    versions = get_table_versions(tables)
+    raw = '|'.join([
+        _boot_id,
+        ','.join(f'{table}:{version}' for table, version in sorted(versions.items())),
+        request.full_path,
+        request.headers.get('Authorization', '')
+    ])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def conditional_get(*tables: str):
+    """
+    GET 接口装饰器：按所依赖表的版本号生成弱 ETag，If-None-Match 命中时返回 304
+
+    放在权限装饰器之后（更靠近函数），未通过鉴权的请求不会得到 304。
+
+    Args:
+        tables: 接口数据所依赖的表名
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not current_app.config.get('CONDITIONAL_GET_ENABLED', True):
+                return f(*args, **kwargs)
+
+            etag = compute_etag(tables)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                response.set_etag(etag, weak=True)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                # 允许浏览器缓存，但每次使用前都要带 If-None-Match 重新验证
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return decorated_function
+    return decorator
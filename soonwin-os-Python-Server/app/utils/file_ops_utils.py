@@ -0,0 +1,175 @@
+"""
+文件操作服务模块
+上传目录下的文件移动、移入回收目录（assets/DeleteFiles）统一在进程内完成：
+- upload_routes 的 /upload/move、/upload/delete 接口与 inspection_routes 的批量保存共用同一套实现，
+  不再通过 HTTP 调用本服务自己的接口；
+- 批量操作提交到后台线程池并行执行，调用方等待全部完成后再根据结果写数据库，
+  或者（如删除检查项后清理照片）提交后不等待。
+路径均为相对服务端根目录（app 的上一级目录）的相对路径。
+"""
+
+import os
+import shutil
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, List, Tuple
+
+from flask import current_app
+
+# 已删除文件目录
+DELETED_FILES_FOLDER = 'assets/DeleteFiles'
+
+# 单个文件操作的结果：target 为移动后的相对路径，失败时 ok=False 且 error 为原因
+FileOpResult = namedtuple('FileOpResult', ['source', 'target', 'ok', 'error'])
+
+
+def get_base_path() -> str:
+    """服务端根目录（上传路径的相对基准）"""
+    return os.path.join(current_app.root_path, '..')
+
+
+def move_file(base_path: str, source_path: str, target_path: str) -> str:
+    """
+    移动文件，返回移动后相对 base_path 的路径
+
+    Raises:
+        FileNotFoundError: 源文件不存在
+    """
+    source_abs_path = os.path.join(base_path, source_path)
+    target_abs_path = os.path.join(base_path, target_path)
+    if not os.path.exists(source_abs_path):
+        raise FileNotFoundError('源文件不存在')
+
+    os.makedirs(os.path.dirname(target_abs_path), exist_ok=True)
+    shutil.move(source_abs_path, target_abs_path)
+    return os.path.relpath(target_abs_path, base_path)
+
+
+def trash_file(base_path: str, file_path: str) -> str:
+    """
+    把文件移到已删除文件目录（文件名追加时间戳避免冲突），返回移动后的相对路径
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    abs_file_path = os.path.join(base_path, file_path)
+    if not os.path.exists(abs_file_path):
+        raise FileNotFoundError('文件不存在')
+
+    deleted_path = os.path.join(base_path, DELETED_FILES_FOLDER)
+    os.makedirs(deleted_path, exist_ok=True)
+
+    name, ext = os.path.splitext(os.path.basename(abs_file_path))
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    new_file_path = os.path.join(deleted_path, f"{name}_{timestamp}{ext}")
+    shutil.move(abs_file_path, new_file_path)
+    return os.path.relpath(new_file_path, base_path)
+
+
+def _run_move(base_path: str, source_path: str, target_path: str) -> FileOpResult:
+    try:
+        return FileOpResult(source_path, move_file(base_path, source_path, target_path), True, None)
+    except Exception as e:
+        return FileOpResult(source_path, target_path, False, str(e))
+
+
+def _run_trash(base_path: str, file_path: str) -> FileOpResult:
+    try:
+        return FileOpResult(file_path, trash_file(base_path, file_path), True, None)
+    except Exception as e:
+        return FileOpResult(file_path, None, False, str(e))
+
+
+def _run_store(base_path: str, source_path: str) -> FileOpResult:
+    # 内容寻址存储依赖模型，延迟导入
+    from app.utils.blob_store_utils import store_file
+    try:
+        return FileOpResult(source_path, store_file(base_path, source_path), True, None)
+    except Exception as e:
+        return FileOpResult(source_path, source_path, False, str(e))
+
+
+def _log_failures(futures: List[Future], action: str) -> None:
+    """后台执行（不等待结果）的操作完成后记录失败项"""
+    def log_result(future: Future) -> None:
+        result = future.result()
+        if not result.ok:
+            print(f"{action}失败: {result.source}, 错误: {result.error}")
+    for future in futures:
+        future.add_done_callback(log_result)
+
+
+def _warn_if_writer_thread(action: str) -> None:
+    """在写线程中等待文件操作会让排队的其他写操作（打卡等）一起等待，应在写操作之外调用"""
+    dispatcher = current_app.extensions.get('write_dispatcher')
+    if dispatcher is not None and dispatcher.in_writer_thread():
+        current_app.logger.warning(f"在写线程中等待文件操作（{action}），请移到 run_write 之外执行")
+
+
+class FileOpsService:
+    """
+    文件操作线程池，每个应用一个实例，首次提交时创建线程池
+
+    等待结果的方法（move_many、store_many、trash_many）在请求线程或后台任务中调用，不要放在写操作（run_write）中。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='file-ops')
+        return self._executor
+
+    def submit_moves(self, moves: Iterable[Tuple[str, str]]) -> List[Future]:
+        base_path = get_base_path()
+        return [self.executor.submit(_run_move, base_path, source, target) for source, target in moves]
+
+    def submit_trash(self, paths: Iterable[str]) -> List[Future]:
+        base_path = get_base_path()
+        return [self.executor.submit(_run_trash, base_path, path) for path in paths]
+
+    def submit_stores(self, paths: Iterable[str]) -> List[Future]:
+        base_path = get_base_path()
+        return [self.executor.submit(_run_store, base_path, path) for path in paths]
+
+    def move_many(self, moves: Iterable[Tuple[str, str]]) -> List[FileOpResult]:
+        """并行移动一批文件，全部完成后按提交顺序返回结果"""
+        _warn_if_writer_thread('移动文件')
+        return [future.result() for future in self.submit_moves(moves)]
+
+    def store_many(self, paths: Iterable[str]) -> List[FileOpResult]:
+        """并行把一批文件存入内容寻址存储，全部完成后按提交顺序返回结果（target 为存储路径）"""
+        _warn_if_writer_thread('存入内容寻址存储')
+        return [future.result() for future in self.submit_stores(paths)]
+
+    def trash_many(self, paths: Iterable[str], wait: bool = True) -> List[FileOpResult]:
+        """
+        并行把一批文件移到已删除文件目录
+
+        Args:
+            wait: False 时提交后立即返回空列表，失败项只记录日志
+        """
+        if wait:
+            _warn_if_writer_thread('移动文件到删除目录')
+        futures = self.submit_trash(paths)
+        if not wait:
+            _log_failures(futures, '移动文件到删除目录')
+            return []
+        return [future.result() for future in futures]
+
+
+def init_file_ops(app) -> None:
+    """在 create_app 中调用，按 Config 创建文件操作服务"""
+    app.extensions['file_ops'] = FileOpsService(max_workers=app.config.get('FILE_OPS_WORKERS', 4))
+
+
+def get_file_ops() -> FileOpsService:
+    return current_app.extensions['file_ops']
@@ -0,0 +1,262 @@
+"""
+文件响应模块
+展示文件（PDF、图片）、PDF页面图片和缩放图统一由 send_file_response 返回：
+- 支持 Range 请求：单个范围（含 bytes=-500 这类末尾范围）返回 206，多个范围返回 multipart/byteranges，
+  范围全部超出文件时返回 416；范围过多（超过 FILE_RESPONSE_MAX_RANGES）时忽略 Range 返回整个文件；
+- ETag（修改时间+大小）、Last-Modified，If-None-Match / If-Modified-Since 命中时返回 304，
+  If-Range 与当前文件不符时忽略 Range 返回整个文件；
+- 整个文件和单个范围都交给 wsgi.file_wrapper 发送（waitress 直接按文件位置和长度从文件发送，
+  不经过逐块 yield 的 Python 生成器）；
+- 请求经前置 nginx 转发（带 X-Sendfile-Type: X-Accel-Redirect 请求头）且启用 X_ACCEL_REDIRECT_ENABLED 时，
+  只返回 X-Accel-Redirect 头，由 nginx 的 internal location 发送文件（sendfile 零拷贝，
+  Range、条件请求由 nginx 处理，Cache-Control 仍按 Flask 设置的返回），直接访问后端端口的请求仍由 Flask 发送。
+/assets 静态文件（检查项照片、存储文件等）也改用 send_file_response，见 register_static_assets。
+"""
+
+import mimetypes
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+
+from flask import abort, current_app, request
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+# 读取文件的缓冲区大小（多范围响应、没有 file_wrapper 的服务器）
+FILE_BUFFER_SIZE = 256 * 1024
+
+# nginx 转发请求时设置该请求头，表示可以用 X-Accel-Redirect 交给 nginx 发送文件
+ACCEL_REQUEST_HEADER = 'X-Sendfile-Type'
+
+# 跨域请求时需要让前端（PDF.js）读取的响应头
+EXPOSE_HEADERS = 'Content-Range, Accept-Ranges, Content-Length, Content-Type, ETag'
+
+
+class FileRange:
+    """
+    文件中的一段，作为类文件对象交给 wsgi.file_wrapper
+
+    read/seek/tell 都限定在这一段内：waitress 按 seek/tell 计算剩余长度后直接从文件发送，
+    其他服务器的 FileWrapper 读到这一段末尾即结束。
+    """
+
+    def __init__(self, path: str, start: int, length: int):
+        self._file = open(path, 'rb')
+        self._start = start
+        self._end = start + length
+        self._file.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self._end - self._file.tell()
+        if remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_SET:
+            position = self._start + offset
+        elif whence == os.SEEK_CUR:
+            position = self._file.tell() + offset
+        else:
+            position = self._end + offset
+        self._file.seek(min(max(position, self._start), self._end))
+        return self.tell()
+
+    def tell(self) -> int:
+        return self._file.tell() - self._start
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def accel_redirect_uri(relative_path: str) -> Optional[str]:
+    """
+    文件（相对服务端根目录的路径）对应的 nginx internal location 地址，
+    未启用 X-Accel-Redirect、请求不是经 nginx 转发或路径不在 X_ACCEL_LOCATIONS 中时返回 None
+    """
+    if not current_app.config.get('X_ACCEL_REDIRECT_ENABLED', False):
+        return None
+    if request.headers.get(ACCEL_REQUEST_HEADER, '').lower() != 'x-accel-redirect':
+        return None
+    relative_path = relative_path.replace('\\', '/')
+    for prefix, location in current_app.config.get('X_ACCEL_LOCATIONS', {}).items():
+        if relative_path.startswith(prefix):
+            return location + quote(relative_path[len(prefix):], safe='/')
+    return None
+
+
+def _file_etag(stat: os.stat_result) -> str:
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+def _if_range_matches(etag: str, last_modified: datetime) -> bool:
+    """If-Range 为空或与当前文件一致时 Range 有效"""
+    if_range = request.if_range
+    if if_range.etag is not None:
+        return if_range.etag == etag
+    if if_range.date is not None:
+        return last_modified <= if_range.date
+    return True
+
+
+def parse_byte_ranges(size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    把请求的 Range 解析为按起点排序、合并重叠后的 [(start, end)]（end 不含）
+
+    Returns:
+        None 表示不按范围处理（没有或无法解析 Range 头）；空列表表示范围全部超出文件（416）
+    """
+    # 不用 request.range：werkzeug 会拒绝重叠或乱序的多个范围
+    header = request.headers.get('Range', '')
+    units, _, spec = header.partition('=')
+    if not spec or units.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = (value.strip() for value in part.partition('-'))
+        if not dash or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+            # 语法错误时忽略整个 Range 头
+            return None
+        if not first:
+            # 末尾范围 bytes=-N
+            start, stop = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            if last and int(last) < start:
+                return None
+            stop = min(int(last) + 1, size) if last else size
+        if start < stop:
+            ranges.append((start, stop))
+    ranges.sort()
+    merged = []
+    for start, stop in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _multipart_body(path: str, ranges: List[Tuple[int, int]], parts: List[bytes], boundary: str):
+    with open(path, 'rb') as f:
+        for (start, stop), part_header in zip(ranges, parts):
+            yield part_header
+            f.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                data = f.read(min(FILE_BUFFER_SIZE, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+            yield b'\r\n'
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def send_file_response(abs_path: str, mimetype: Optional[str] = None, relative_path: Optional[str] = None,
+                       max_age: Optional[int] = None, download_name: Optional[str] = None):
+    """
+    返回文件响应（支持 Range、多范围、条件请求）
+
+    Args:
+        abs_path: 文件绝对路径
+        mimetype: 默认按扩展名判断
+        relative_path: 相对服务端根目录的路径，启用 X-Accel-Redirect 时用于计算 nginx 地址
+        max_age: 浏览器缓存秒数，默认只允许缓存后重新验证（no-cache）
+        download_name: 指定时以附件形式下载
+
+    Raises:
+        FileNotFoundError: 文件不存在
+    """
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(abs_path)[0] or 'application/octet-stream'
+
+    response_class = current_app.response_class
+    stat = os.stat(abs_path)
+    accel_uri = accel_redirect_uri(relative_path) if relative_path else None
+    if accel_uri:
+        # 由 nginx 发送文件，Flask 只返回头
+        response = response_class(status=200, mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_uri
+    else:
+        size = stat.st_size
+        etag = _file_etag(stat)
+        # HTTP 日期只精确到秒
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = response_class(status=304)
+            response.set_etag(etag)
+        else:
+            ranges = parse_byte_ranges(size) if _if_range_matches(etag, last_modified) else None
+            if ranges is not None and len(ranges) > current_app.config.get('FILE_RESPONSE_MAX_RANGES', 32):
+                ranges = None
+
+            if ranges == []:
+                response = response_class(status=416)
+                response.headers['Content-Range'] = f'bytes */{size}'
+            elif ranges and len(ranges) == 1:
+                start, stop = ranges[0]
+                response = response_class(
+                    wrap_file(request.environ, FileRange(abs_path, start, stop - start), FILE_BUFFER_SIZE),
+                    status=206, mimetype=mimetype, direct_passthrough=True
+                )
+                response.content_length = stop - start
+                response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+            elif ranges:
+                boundary = uuid.uuid4().hex
+                parts = [
+                    (f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+                     f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode('ascii')
+                    for start, stop in ranges
+                ]
+                content_length = sum(len(part) + (stop - start) + 2 for part, (start, stop) in zip(parts, ranges)) \
+                    + len(f'--{boundary}--\r\n')
+                response = response_class(
+                    _multipart_body(abs_path, ranges, parts, boundary), status=206,
+                    content_type=f'multipart/byteranges; boundary={boundary}', direct_passthrough=True
+                )
+                response.content_length = content_length
+            else:
+                response = response_class(
+                    wrap_file(request.environ, open(abs_path, 'rb'), FILE_BUFFER_SIZE),
+                    status=200, mimetype=mimetype, direct_passthrough=True
+                )
+                response.content_length = size
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+        response.headers['Accept-Ranges'] = 'bytes'
+
+    if download_name:
+        response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    # 经 nginx 发送时 nginx 保留该响应头（原地替换的文件，如优化后的 PDF，需要重新验证）
+    response.headers['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'no-cache'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    response.headers['Access-Control-Expose-Headers'] = EXPOSE_HEADERS
+    return response
+
+
+def serve_static_asset(filename: str):
+    """/assets 静态文件（检查项照片、存储文件等），支持 Range，经 nginx 访问时交给 nginx 发送"""
+    abs_path = safe_join(current_app.static_folder, filename)
+    if abs_path is None or not os.path.isfile(abs_path):
+        abort(404)
+    return send_file_response(abs_path, relative_path=f'assets/{filename}',
+                              max_age=current_app.get_send_file_max_age(filename))
+
+
+def register_static_assets(app) -> None:
+    """在 create_app 中调用，/assets 静态文件改由 send_file_response 返回"""
+    app.view_functions['static'] = serve_static_asset
@@ -0,0 +1,322 @@
+"""
+图片缩略图模块
+检查项照片和图片组原图是相机分辨率的大图，列表、报告和手机端只需要小图：
+- 请求图片时带参数 w（宽度）返回缩放后的图片，宽度向上取整到 IMAGE_DERIVATIVE_WIDTHS 中的档位，
+  不放大原图；客户端 Accept 支持 image/webp 时返回 WebP，否则返回 JPEG（PNG 原图仍为 PNG）；
+- 缩放结果缓存在 assets/Derivatives 下，总大小超过 IMAGE_DERIVATIVE_CACHE_MB 时按最近使用时间淘汰；
+- 上传检查项照片和图片组后，在后台线程池中预先生成缩略图（thumb）和中图（medium）两档；
+- 未安装 Pillow 时不生成缩放图，直接返回原图。
+缓存文件名由原图标识（存储文件为内容摘要，其他为路径、大小和修改时间）、宽度和格式计算，
+原图被替换后自动使用新的缓存文件。
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Optional, Tuple
+
+from flask import current_app, request
+
+from app.utils.blob_store_utils import normalize_path, parse_blob_path
+from app.utils.file_ops_utils import get_base_path
+from app.utils.file_response_utils import send_file_response
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+# 缩放图缓存目录
+DERIVATIVE_FOLDER = 'assets/Derivatives'
+
+# 可以缩放的图片格式（GIF 可能是动图，返回原图）
+RESIZABLE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+_EXIF_ORIENTATION = 0x0112
+
+_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def _webp_supported() -> bool:
+    return Image is not None and features.check('webp')
+
+
+def snap_width(width: int) -> int:
+    """把请求的宽度向上取整到配置的档位（超过最大档位时取最大档位），避免任意宽度生成大量缓存文件"""
+    widths = sorted(current_app.config.get('IMAGE_DERIVATIVE_WIDTHS', [160, 320, 640, 960, 1280, 1920]))
+    for allowed in widths:
+        if width <= allowed:
+            return allowed
+    return widths[-1]
+
+
+def rendition_width(name: str) -> int:
+    """预设档位（thumb、medium）对应的宽度"""
+    return current_app.config.get('IMAGE_RENDITIONS', {'thumb': 320, 'medium': 1280})[name]
+
+
+def _source_key(relative_path: str, abs_path: str) -> str:
+    parsed = parse_blob_path(relative_path)
+    if parsed:
+        # 存储文件内容不变，直接使用内容摘要
+        return parsed[0]
+    stat = os.stat(abs_path)
+    return f'{relative_path}|{stat.st_size}|{stat.st_mtime_ns}'
+
+
+def render_image(source_path: str, target_path: str, width: int, fmt: str) -> bool:
+    """
+    把图片按宽度等比缩小后保存为指定格式，原图不超过该宽度时返回 False（不生成）
+
+    先写临时文件再改名，并发读取不会读到半个文件。
+    """
+    with Image.open(source_path) as img:
+        if getattr(img, 'is_animated', False):
+            return False
+        source_width, source_height = img.size
+        if img.getexif().get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+            # 旋转了90度的照片，显示宽度是原始高度
+            source_width, source_height = source_height, source_width
+        if source_width <= width:
+            return False
+        # JPEG 按接近目标的尺寸解码，大幅减少解码大图的时间和内存
+        scale = width / source_width
+        img.draft('RGB', (round(img.width * scale), round(img.height * scale)))
+        img = ImageOps.exif_transpose(img)
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.LANCZOS)
+
+        pil_format, _ = _FORMATS[fmt]
+        if pil_format == 'JPEG' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        elif img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            img = img.convert('RGBA')
+
+        quality = current_app.config.get('IMAGE_DERIVATIVE_QUALITY', 80)
+        save_options = {
+            'WEBP': {'quality': quality, 'method': 4},
+            'JPEG': {'quality': quality, 'optimize': True, 'progressive': True},
+            'PNG': {'optimize': True},
+        }[pil_format]
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        temp_path = f'{target_path}.{threading.get_ident()}.tmp'
+        try:
+            img.save(temp_path, pil_format, **save_options)
+            os.replace(temp_path, target_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return True
+
+
+class ImageDerivativeCache:
+    """
+    缩放图磁盘缓存，每个应用一个实例
+
+    进程内按最近使用顺序记录缓存文件和总大小（首次使用时扫描缓存目录，按修改时间恢复顺序），
+    命中时刷新文件修改时间，服务重启后仍能按使用时间淘汰。
+    """
+
+    def __init__(self, app, max_bytes: int, max_workers: int = 2):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._executor = None
+        # 同一缩放图只生成一次，并发请求等待生成结果
+        self._render_locks = defaultdict(threading.Lock)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image')
+        return self._executor
+
+    def _load(self, cache_root: str) -> None:
+        """在锁内调用：扫描缓存目录"""
+        files = []
+        for dirpath, _, filenames in os.walk(cache_root):
+            for name in filenames:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._total += size
+        self._loaded = True
+
+    def _touch(self, path: str) -> None:
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _add(self, path: str, size: int) -> None:
+        evicted = []
+        with self._lock:
+            self._total += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_path)
+        for old_path in evicted:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+
+    def derivative_path(self, relative_path: str, width: int, fmt: str) -> Optional[str]:
+        """
+        返回缩放图的绝对路径（不存在时生成）；原图不需要缩放时返回 None
+
+        Raises:
+            FileNotFoundError: 原图不存在
+        """
+        base_path = get_base_path()
+        abs_path = os.path.join(base_path, relative_path)
+        if not os.path.isfile(abs_path):
+            raise FileNotFoundError('文件不存在')
+        if Image is None or os.path.splitext(relative_path)[1].lower() not in RESIZABLE_EXTENSIONS:
+            return None
+
+        cache_root = os.path.join(base_path, DERIVATIVE_FOLDER)
+        key = hashlib.sha1(f'{_source_key(relative_path, abs_path)}|{width}|{fmt}'.encode('utf-8')).hexdigest()
+        target_path = os.path.join(cache_root, key[:2], f'{key}.{fmt}')
+        # 原图不需要缩放时写一个空标记文件，避免每次请求都重新解码原图
+        skip_marker = f'{target_path}.orig'
+        with self._lock:
+            if not self._loaded:
+                self._load(cache_root)
+            render_lock = self._render_locks[target_path]
+
+        try:
+            with render_lock:
+                if os.path.exists(target_path):
+                    self._touch(target_path)
+                    return target_path
+                if os.path.exists(skip_marker):
+                    return None
+                if not render_image(abs_path, target_path, width, fmt):
+                    os.makedirs(os.path.dirname(skip_marker), exist_ok=True)
+                    open(skip_marker, 'wb').close()
+                    self._add(skip_marker, 0)
+                    return None
+                self._add(target_path, os.path.getsize(target_path))
+                return target_path
+        finally:
+            with self._lock:
+                self._render_locks.pop(target_path, None)
+
+    def _pregenerate(self, paths: Iterable[str], widths: Iterable[int], fmt: str) -> None:
+        with self.app.app_context():
+            for path in paths:
+                for width in widths:
+                    try:
+                        self.derivative_path(path, width, fmt)
+                    except Exception as e:
+                        print(f"生成缩略图失败: {path}, 错误: {str(e)}")
+
+    def submit_renditions(self, paths: Iterable[str]) -> None:
+        """上传后在后台生成预设档位的缩放图（不等待）"""
+        paths = [normalize_path(path) for path in paths if path]
+        if Image is None or not paths:
+            return
+        widths = list(current_app.config.get('IMAGE_RENDITIONS', {'thumb': 320, 'medium': 1280}).values())
+        fmt = 'webp' if _webp_supported() else 'jpg'
+        self.executor.submit(self._pregenerate, paths, widths, fmt)
+
+
+def init_image_derivatives(app) -> None:
+    """在 create_app 中调用，按 Config 创建缩放图缓存"""
+    app.extensions['image_derivatives'] = ImageDerivativeCache(
+        app,
+        max_bytes=app.config.get('IMAGE_DERIVATIVE_CACHE_MB', 1024) * 1024 * 1024,
+        max_workers=app.config.get('IMAGE_DERIVATIVE_WORKERS', 2)
+    )
+
+
+def get_image_derivatives() -> ImageDerivativeCache:
+    return current_app.extensions['image_derivatives']
+
+
+def negotiate_format(relative_path: str) -> str:
+    """按 Accept 请求头和原图格式选择输出格式"""
+    # 只认明确声明的 image/webp，*/* 不算（旧浏览器可能不支持 WebP）
+    if _webp_supported() and 'image/webp' in request.accept_mimetypes.values():
+        return 'webp'
+    return 'png' if os.path.splitext(relative_path)[1].lower() == '.png' else 'jpg'
+
+
+def parse_width() -> Tuple[Optional[int], Optional[str]]:
+    """解析请求参数 w（或预设档位 size=thumb/medium），返回 (宽度, 错误信息)"""
+    size = request.args.get('size')
+    if size:
+        try:
+            return rendition_width(size), None
+        except KeyError:
+            return None, f'不支持的尺寸: {size}'
+    width = request.args.get('w')
+    if not width:
+        return None, None
+    if not width.isdigit() or int(width) <= 0:
+        return None, '宽度必须是正整数'
+    return snap_width(int(width)), None
+
+
+def send_image(relative_path: str, width: Optional[int], mimetype: Optional[str] = None):
+    """
+    返回图片响应：指定宽度时返回缩放图（生成失败时返回原图），否则返回原图
+
+    Raises:
+        FileNotFoundError: 原图不存在
+    """
+    relative_path = normalize_path(relative_path)
+    abs_path = os.path.join(get_base_path(), relative_path)
+    derivative = None
+    fmt = None
+    if width:
+        fmt = negotiate_format(relative_path)
+        try:
+            derivative = get_image_derivatives().derivative_path(relative_path, width, fmt)
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            # 图片损坏等无法缩放的情况，返回原图
+            current_app.logger.error(f"生成缩放图失败: {relative_path}, 错误: {str(e)}")
+
+    base_path = get_base_path()
+    if derivative:
+        response = send_file_response(derivative, _FORMATS[fmt][1],
+                                      relative_path=os.path.relpath(derivative, base_path),
+                                      max_age=current_app.config.get('IMAGE_DERIVATIVE_MAX_AGE', 86400))
+    else:
+        if not os.path.isfile(abs_path):
+            raise FileNotFoundError('文件不存在')
+        response = send_file_response(abs_path, mimetype, relative_path=relative_path)
+    if width:
+        response.headers['Vary'] = 'Accept'
+    return response
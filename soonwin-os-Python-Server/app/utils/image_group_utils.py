@@ -0,0 +1,139 @@
+"""
+图片组清单模块
+图片组上传时已经知道图片的顺序，把清单（文件名、顺序、尺寸、大小、缩略图地址）写入
+DisplayFile.image_manifest，查看图片组时不再扫描文件夹并按文件名自然排序：
+- 上传时由 build_image_group_manifest 生成清单；
+- 旧图片组（没有清单）第一次查看时扫描文件夹生成清单并保存；
+- 接口返回的数据按 uuid 缓存在进程内，DisplayFile 表版本号（etag_utils）变化后失效，
+  命中时不查询数据库、不访问文件系统。
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.models.display_file import DisplayFile
+from app.utils.etag_utils import get_table_versions
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 图片组中可以展示的图片格式
+IMAGE_GROUP_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp'}
+
+# 图片地址前缀（serve_display_files 路由为 /api/assets/DisplayFiles/...）
+IMAGE_GROUP_URL_PREFIX = '/api'
+
+_EXIF_ORIENTATION = 0x0112
+
+# 最多缓存的图片组数量，超过时清空重建
+_CACHE_MAX_ENTRIES = 256
+
+_cache: Dict[str, Tuple[Dict[str, int], Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+
+def natural_sort_key(filename: str) -> list:
+    """按文件名自然排序（1,2,3,10 而不是 1,10,2,3）"""
+    return [int(text) if text.isdigit() else text.lower() for text in re.split(r'(\d+)', filename)]
+
+
+def image_dimensions(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """图片的显示宽高（按 EXIF 方向旋转后），只读取文件头；未安装 Pillow 或无法识别时返回 (None, None)"""
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            if img.getexif().get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+                width, height = height, width
+            return width, height
+    except Exception:
+        return None, None
+
+
+def build_image_group_manifest(base_path: str, folder: str, filenames: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    按给定顺序生成图片组清单
+
+    Args:
+        base_path: 服务端根目录
+        folder: 图片组文件夹（相对服务端根目录，如 assets/DisplayFiles/<文件夹>）
+        filenames: 图片文件名（已排好顺序）
+    """
+    folder = folder.replace('\\', '/')
+    manifest = []
+    for order, filename in enumerate(filenames, start=1):
+        abs_path = os.path.join(base_path, folder, filename)
+        width, height = image_dimensions(abs_path)
+        url = f"{IMAGE_GROUP_URL_PREFIX}/{folder}/{filename}"
+        manifest.append({
+            'filename': filename,
+            'order': order,
+            'width': width,
+            'height': height,
+            'size': os.path.getsize(abs_path),
+            'url': url,
+            # 缩放图（同一路由带 size 参数，按 Accept 返回 WebP 或 JPEG）
+            'thumbnail': f"{url}?size=thumb",
+            'medium': f"{url}?size=medium"
+        })
+    return manifest
+
+
+def scan_image_group(base_path: str, folder: str) -> List[Dict[str, Any]]:
+    """扫描图片组文件夹生成清单（没有清单的旧图片组）"""
+    group_path = os.path.join(base_path, folder)
+    filenames = [name for name in os.listdir(group_path)
+                 if os.path.splitext(name)[1].lower() in IMAGE_GROUP_EXTENSIONS]
+    filenames.sort(key=natural_sort_key)
+    return build_image_group_manifest(base_path, folder, filenames)
+
+
+def dump_manifest(manifest: List[Dict[str, Any]]) -> str:
+    return json.dumps(manifest, ensure_ascii=False)
+
+
+def image_group_data(display_file, manifest: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """图片组接口返回的数据"""
+    return {
+        "uuid": display_file.uuid,
+        "title": display_file.title,
+        "total_images": len(manifest),
+        "images": [item['url'] for item in manifest],
+        "thumbnails": [item['thumbnail'] for item in manifest],
+        "items": manifest
+    }
+
+
+def image_group_versions() -> Dict[str, int]:
+    return get_table_versions([DisplayFile.__tablename__])
+
+
+def get_cached_image_group(file_uuid: str) -> Optional[Dict[str, Any]]:
+    """返回缓存的图片组数据，DisplayFile 表有修改后返回 None"""
+    with _cache_lock:
+        entry = _cache.get(file_uuid)
+    if entry is None:
+        return None
+    versions, data = entry
+    if versions != image_group_versions():
+        return None
+    return data
+
+
+def cache_image_group(file_uuid: str, versions: Dict[str, int], data: Dict[str, Any]) -> None:
+    """
+    缓存图片组数据
+
+    Args:
+        versions: 读取数据库之前取得的表版本号（读取期间有写入时缓存会在下次请求时失效）
+    """
+    with _cache_lock:
+        if len(_cache) >= _CACHE_MAX_ENTRIES:
+            _cache.clear()
+        _cache[file_uuid] = (versions, data)
@@ -0,0 +1,308 @@
+"""
+后台任务模块
+费用分摊计算、机型/部件JSON导入、PDF线性化、清空检查项等耗时操作不再占用 waitress 请求线程：
+- 路由把操作提交为任务（Job 表一行记录），任务在进程内线程池中执行；
+- 任务函数用 job_handler 注册，通过 JobContext.progress 上报进度（进度保存在内存中，
+  开始、重试和结束时写入 Job 表），数据库写操作通过 run_write 交给单写线程执行；
+- 任务失败且未达到最多执行次数时，延迟一段时间后自动重试；
+- 客户端请求头带 Prefer: respond-async（或参数 async=1）时立即返回 202 和任务ID，
+  否则最多等待 JOB_SYNC_WAIT 秒，期间完成则按原接口格式返回结果，超时再返回 202；
+- /api/jobs/<id> 查询任务状态，服务重启前未完成的任务在查询时标记为失败。
+"""
+
+import json
+import threading
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app, request, url_for
+
+from extensions import db
+from app.models.job import Job
+from app.utils.auth_utils import get_current_user
+from app.utils.write_queue_utils import run_write
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+JOB_FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# 已注册的任务类型：处理函数与默认最多执行次数
+JobSpec = namedtuple('JobSpec', ['func', 'max_attempts'])
+_job_specs: Dict[str, JobSpec] = {}
+
+
+class UnknownJobTypeError(ValueError):
+    """任务类型未注册"""
+
+
+def job_handler(job_type: str, max_attempts: int = 1):
+    """
+    注册任务处理函数，函数签名为 func(ctx: JobContext, **params)，返回值（可JSON序列化）保存为任务结果
+
+    Args:
+        job_type: 任务类型
+        max_attempts: 默认最多执行次数（失败后自动重试 max_attempts-1 次）
+    """
+    def decorator(func: Callable) -> Callable:
+        _job_specs[job_type] = JobSpec(func, max_attempts)
+        return func
+    return decorator
+
+
+class JobContext:
+    """传给任务处理函数的上下文，用于上报进度和提交后续任务"""
+
+    def __init__(self, runner: 'JobRunner', job_id: str, attempt: int, max_attempts: int = 1,
+                 created_by: Optional[str] = None):
+        self.runner = runner
+        self.job_id = job_id
+        self.attempt = attempt
+        self.max_attempts = max_attempts
+        self.created_by = created_by
+        self.message = None
+
+    @property
+    def is_last_attempt(self) -> bool:
+        """本次失败后不会再重试"""
+        return self.attempt >= self.max_attempts
+
+    def submit_followup(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> str:
+        """提交后续任务（提交人与当前任务相同），返回任务ID"""
+        return self.runner.submit(job_type, params, created_by=self.created_by)
+
+    def progress(self, percent: int, message: Optional[str] = None) -> None:
+        if message is not None:
+            self.message = message
+        self.runner.set_progress(self.job_id, percent, self.message)
+
+
+def _update_job(job_id: str, **values) -> None:
+    """在写线程中更新任务记录"""
+    def update():
+        job = db.session.get(Job, job_id)
+        if job:
+            for key, value in values.items():
+                setattr(job, key, value)
+    run_write(update)
+
+
+class JobRunner:
+    """后台任务执行器，每个应用一个实例，首次提交任务时创建线程池"""
+
+    def __init__(self, app, max_workers: int = 2, retry_delay: float = 5):
+        self.app = app
+        self.max_workers = max_workers
+        self.retry_delay = retry_delay
+        # 进程标识：Job.worker_id 与之不同且未完成的任务，说明执行它的进程已经退出
+        self.worker_id = uuid.uuid4().hex[:8]
+        self._executor = None
+        self._lock = threading.Lock()
+        # 运行中任务的实时进度 {job_id: (progress, message)} 与完成通知
+        self._live: Dict[str, tuple] = {}
+        self._events: Dict[str, threading.Event] = {}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+        return self._executor
+
+    def submit(self, job_type: str, params: Optional[Dict[str, Any]] = None,
+               created_by: Optional[str] = None, max_attempts: Optional[int] = None) -> str:
+        """
+        创建任务记录并提交执行，返回任务ID
+
+        Raises:
+            UnknownJobTypeError: 任务类型未注册
+        """
+        spec = _job_specs.get(job_type)
+        if spec is None:
+            raise UnknownJobTypeError(f'不支持的任务类型: {job_type}')
+
+        job_id = str(uuid.uuid4())
+        params_json = current_app.json.dumps(params or {})
+
+        def create():
+            db.session.add(Job(
+                id=job_id,
+                job_type=job_type,
+                status=JOB_PENDING,
+                progress=0,
+                params=params_json,
+                attempts=0,
+                max_attempts=max_attempts or spec.max_attempts,
+                worker_id=self.worker_id,
+                created_by=created_by
+            ))
+        run_write(create)
+        self._schedule(job_id)
+        return job_id
+
+    def retry(self, job_id: str) -> None:
+        """重新执行失败的任务（执行次数清零）"""
+        _update_job(job_id, status=JOB_PENDING, progress=0, error=None, attempts=0,
+                    finish_time=None, worker_id=self.worker_id)
+        self._schedule(job_id)
+
+    def _schedule(self, job_id: str, delay: float = 0) -> None:
+        with self._lock:
+            self._events.setdefault(job_id, threading.Event())
+        if delay > 0:
+            timer = threading.Timer(delay, self.executor.submit, args=(self._run, job_id))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.executor.submit(self._run, job_id)
+
+    def set_progress(self, job_id: str, percent: int, message: Optional[str]) -> None:
+        with self._lock:
+            self._live[job_id] = (max(0, min(100, int(percent))), message)
+
+    def live_progress(self, job_id: str) -> Optional[tuple]:
+        with self._lock:
+            return self._live.get(job_id)
+
+    def _finish(self, job_id: str) -> None:
+        with self._lock:
+            self._live.pop(job_id, None)
+            event = self._events.pop(job_id, None)
+        if event:
+            event.set()
+
+    def wait(self, job_id: str, timeout: float) -> bool:
+        """等待任务结束，返回是否已结束"""
+        with self._lock:
+            event = self._events.get(job_id)
+        if event is None:
+            return True
+        return event.wait(timeout)
+
+    def _run(self, job_id: str) -> None:
+        with self.app.app_context():
+            try:
+                self._execute(job_id)
+            except Exception as e:
+                # 更新任务记录本身失败（如数据库不可用），只能记录日志
+                current_app.logger.error(f"后台任务 {job_id} 执行异常: {str(e)}")
+                self._finish(job_id)
+            finally:
+                db.session.remove()
+
+    def _execute(self, job_id: str) -> None:
+        job = db.session.get(Job, job_id)
+        if job is None or job.status != JOB_PENDING:
+            self._finish(job_id)
+            return
+        job_type = job.job_type
+        spec = _job_specs.get(job_type)
+        params = json.loads(job.params) if job.params else {}
+        attempt = job.attempts + 1
+        max_attempts = job.max_attempts
+        created_by = job.created_by
+        db.session.rollback()
+
+        _update_job(job_id, status=JOB_RUNNING, attempts=attempt, start_time=datetime.now(),
+                    worker_id=self.worker_id)
+        ctx = JobContext(self, job_id, attempt, max_attempts, created_by)
+        self.set_progress(job_id, 0, None)
+        try:
+            if spec is None:
+                raise UnknownJobTypeError(f'不支持的任务类型: {job_type}')
+            result = spec.func(ctx, **params)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+            current_app.logger.error(f"后台任务 {job_id}（第{attempt}次）失败: {error}")
+            if attempt < max_attempts:
+                # 按已执行次数递增延迟后重试
+                _update_job(job_id, status=JOB_PENDING, error=error,
+                            message=f"第{attempt}次执行失败，稍后重试")
+                self._schedule(job_id, delay=self.retry_delay * attempt)
+                return
+            _update_job(job_id, status=JOB_FAILED, error=error, message=ctx.message,
+                        finish_time=datetime.now())
+            self._finish(job_id)
+            return
+
+        _update_job(job_id, status=JOB_SUCCEEDED, progress=100, message=ctx.message, error=None,
+                    result=current_app.json.dumps(result) if result is not None else None,
+                    finish_time=datetime.now())
+        self._finish(job_id)
+
+
+def init_job_runner(app) -> None:
+    """在 create_app 中调用，按 Config 创建后台任务执行器"""
+    app.extensions['job_runner'] = JobRunner(
+        app,
+        max_workers=app.config.get('JOB_WORKERS', 2),
+        retry_delay=app.config.get('JOB_RETRY_DELAY', 5)
+    )
+
+
+def get_job_runner() -> JobRunner:
+    return current_app.extensions['job_runner']
+
+
+def submit_job(job_type: str, params: Optional[Dict[str, Any]] = None, max_attempts: Optional[int] = None) -> str:
+    """以当前请求的用户为提交人提交任务，返回任务ID"""
+    user = get_current_user()
+    return get_job_runner().submit(job_type, params, created_by=user.emp_id if user else None,
+                                   max_attempts=max_attempts)
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    任务状态字典（运行中的任务使用内存中的实时进度），任务不存在时返回 None
+
+    执行它的服务进程已退出（服务重启）而未完成的任务，标记为失败。
+    """
+    runner = get_job_runner()
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return None
+    if job.status not in JOB_FINISHED_STATUSES and job.worker_id != runner.worker_id:
+        _update_job(job_id, status=JOB_FAILED, error='服务重启，任务已中断', finish_time=datetime.now())
+        db.session.expire(job)
+    data = job.to_dict()
+    live = runner.live_progress(job_id)
+    if live and data['status'] == JOB_RUNNING:
+        data['progress'], data['message'] = live
+    return data
+
+
+def wants_async() -> bool:
+    """客户端是否要求立即返回任务ID（Prefer: respond-async 或 async=1）"""
+    prefer = request.headers.get('Prefer', '')
+    return 'respond-async' in prefer.lower() or request.args.get('async') in ('1', 'true')
+
+
+def wait_for_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    按客户端要求等待任务结束
+
+    Returns:
+        已结束任务的状态字典；客户端要求异步或等待超时时返回 None（路由应返回 202）
+    """
+    if wants_async():
+        return None
+    if not get_job_runner().wait(job_id, current_app.config.get('JOB_SYNC_WAIT', 3)):
+        return None
+    # 结束当前会话的读事务，读取任务的最新状态
+    db.session.rollback()
+    return get_job_status(job_id)
+
+
+def job_accepted_data(job_id: str) -> Dict[str, Any]:
+    """202 响应中的任务信息"""
+    return {
+        "job_id": job_id,
+        "status_url": url_for('job.get_job', job_id=job_id)
+    }
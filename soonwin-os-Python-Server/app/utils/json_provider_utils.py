@@ -0,0 +1,73 @@
+"""
+全局JSON序列化模块
+替代各路由文件中重复定义的 DecimalEncoder + json.dumps + Response 写法，
+在 create_app 中注册为 app.json 后，jsonify 即可直接处理 Decimal、日期时间和 UUID：
+- Decimal 转为 float（与原 DecimalEncoder 输出一致）；
+- datetime 转为 'YYYY-MM-DD HH:MM:SS'，date 转为 'YYYY-MM-DD'；
+- UUID 转为字符串。
+安装了 orjson 时使用其 C 实现序列化，未安装或遇到其不支持的数据时回退到标准库 json。
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, datetime):
+        return obj.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(obj, date):
+        return obj.strftime('%Y-%m-%d')
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    """应用JSON提供者：保持中文原样输出、不重排字段顺序"""
+
+    ensure_ascii = False
+    sort_keys = False
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', True)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        # 只有在调用方未要求 indent 等 orjson 不支持的参数时才使用 orjson
+        if self.use_orjson and not kwargs.get('indent') and not kwargs.get('cls'):
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            try:
+                return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+            except TypeError:
+                # 超出 64 位的整数等 orjson 不支持的数据，交给标准库处理
+                pass
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if self.use_orjson and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                # 交给标准库抛出与原来一致的异常
+                pass
+        return json.loads(s, **kwargs)
@@ -0,0 +1,114 @@
+"""
+列表分页工具模块
+在原有 page/size 偏移分页的基础上，支持按 (排序列, 主键) 的游标分页：
+- 请求参数 cursor 为上一页返回的 next_cursor，传入后忽略 page，直接从游标位置向后取，
+  深分页不再随页码线性变慢；
+- 请求参数 with_total=false 时跳过 COUNT(*)，返回的 total 为 None。
+"""
+
+import base64
+import json
+import uuid
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple
+
+from flask import request
+from sqlalchemy import and_, or_
+from sqlalchemy.engine import Row
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析"""
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def encode_cursor(sort_value: Any, id_value: Any) -> str:
+    raw = json.dumps([_encode_value(sort_value), _encode_value(id_value)], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort_column, id_column) -> Tuple[Any, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        sort_value, id_value = json.loads(raw)
+        return _decode_value(sort_column, sort_value), _decode_value(id_column, id_value)
+    except Exception:
+        raise InvalidCursorError('无效的分页游标')
+
+
+def _after_cursor(sort_column, id_column, sort_value, id_value, descending: bool):
+    """游标之后的记录条件（排序列为空的记录在 SQLite 中降序排最后、升序排最前）"""
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < id_value)
+        return or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < id_value),
+            sort_column.is_(None)
+        )
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > id_value), sort_column.isnot(None))
+    return or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > id_value))
+
+
+def paginate_query(query, sort_column, id_column, page: int, size: int,
+                   descending: bool = True) -> Tuple[List[Any], Optional[int], Optional[str]]:
+    """
+    按 (排序列, 主键) 排序并分页
+
+    Args:
+        query: 已应用筛选条件的查询
+        sort_column: 排序列
+        id_column: 主键列（排序列相同时的次序，保证游标唯一）
+        page, size: 偏移分页参数（传入 cursor 时忽略 page）
+
+    Returns:
+        (当前页记录, 总数或None, 下一页游标或None)
+
+    Raises:
+        InvalidCursorError: cursor 参数无法解析
+    """
+    cursor = request.args.get('cursor')
+    with_total = request.args.get('with_total', 'true').lower() != 'false'
+    total = query.order_by(None).count() if with_total else None
+
+    if descending:
+        ordered = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        ordered = query.order_by(sort_column.asc(), id_column.asc())
+
+    if cursor:
+        sort_value, id_value = decode_cursor(cursor, sort_column, id_column)
+        ordered = ordered.filter(_after_cursor(sort_column, id_column, sort_value, id_value, descending))
+    else:
+        ordered = ordered.offset((page - 1) * size)
+
+    # 多取一条判断是否还有下一页
+    items = ordered.limit(size + 1).all()
+    next_cursor = None
+    if len(items) > size:
+        items = items[:size]
+        # 多实体查询（如 验收+订单）以第一个实体作为游标来源
+        last = items[-1][0] if isinstance(items[-1], Row) else items[-1]
+        next_cursor = encode_cursor(
+            getattr(last, sort_column.key), getattr(last, id_column.key)
+        )
+    return items, total, next_cursor
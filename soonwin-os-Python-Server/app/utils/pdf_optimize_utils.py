@@ -0,0 +1,142 @@
+"""
+PDF 优化模块
+展示文件中的 PDF 上传后在后台任务中优化，让前端通过 Range 请求尽快显示第1页：
+- 超过 PDF_IMAGE_DPI_THRESHOLD 的图片降采样到 PDF_IMAGE_DPI_TARGET，清理无用对象，
+  压缩内容流、字体并生成对象流（PyMuPDF）；
+- 线性化（Fast Web View，pikepdf）：第1页需要的对象排在文件开头，客户端读到 /E 偏移量即可显示第1页；
+- 优化前后各记录一次文件大小、显示第1页需要的字节数和渲染第1页的耗时。
+两个库都是可选的：缺少 PyMuPDF 时只做线性化，缺少 pikepdf 时只压缩，都缺少时保留原文件。
+优化结果比原文件大且没有完成线性化时，也保留原文件。
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from app.utils.pdf_render_utils import load_pymupdf
+
+# 线性化字典位于文件开头，/E 为第1页内容结束的偏移量
+_LINEARIZED_RE = re.compile(rb'/Linearized\s+[\d.]+(.{0,512}?)>>', re.S)
+_FIRST_PAGE_END_RE = re.compile(rb'/E\s+(\d+)')
+_LINEARIZATION_HEAD_SIZE = 2048
+
+
+def load_pikepdf():
+    """导入 pikepdf，未安装时返回 None"""
+    try:
+        import pikepdf
+    except ImportError:
+        return None
+    return pikepdf
+
+
+def first_page_bytes(pdf_path: str) -> int:
+    """显示第1页需要读取的字节数：线性化文件为 /E 偏移量，否则为整个文件（需要先读到文件末尾的交叉引用表）"""
+    file_size = os.path.getsize(pdf_path)
+    with open(pdf_path, 'rb') as f:
+        head = f.read(_LINEARIZATION_HEAD_SIZE)
+    match = _LINEARIZED_RE.search(head)
+    if match:
+        end_match = _FIRST_PAGE_END_RE.search(match.group(1))
+        if end_match:
+            return min(int(end_match.group(1)), file_size)
+    return file_size
+
+
+def first_page_render_ms(pdf_path: str) -> Optional[float]:
+    """打开文件并渲染第1页（72 DPI）的耗时（毫秒），未安装 PyMuPDF 时返回 None"""
+    fitz = load_pymupdf()
+    if fitz is None:
+        return None
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as pdf_document:
+        if len(pdf_document):
+            pdf_document.load_page(0).get_pixmap()
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def measure_pdf(pdf_path: str) -> Dict[str, Any]:
+    return {
+        'size': os.path.getsize(pdf_path),
+        'first_page_bytes': first_page_bytes(pdf_path),
+        'first_page_ms': first_page_render_ms(pdf_path)
+    }
+
+
+def optimize_pdf(input_path: str, output_path: str, dpi_threshold: Optional[int] = 150,
+                 dpi_target: int = 120, image_quality: int = 80) -> Dict[str, bool]:
+    """
+    优化 PDF 写到 output_path，返回完成的步骤 {'compressed', 'images_downsampled', 'linearized'}
+
+    没有可用的库时不生成 output_path（各步骤均为 False）。
+
+    Args:
+        dpi_threshold: 有效分辨率超过该值的图片降采样，为 None 时不处理图片
+        dpi_target: 降采样后的分辨率
+        image_quality: 降采样后有损图片的质量
+    """
+    steps = {'compressed': False, 'images_downsampled': False, 'linearized': False}
+    fitz = load_pymupdf()
+    pikepdf = load_pikepdf()
+    source_path = input_path
+    stage_path = f'{output_path}.{threading.get_ident()}.stage'
+    try:
+        if fitz is not None:
+            with fitz.open(input_path) as pdf_document:
+                if dpi_threshold:
+                    pdf_document.rewrite_images(dpi_threshold=dpi_threshold, dpi_target=dpi_target,
+                                                quality=image_quality)
+                    steps['images_downsampled'] = True
+                # garbage=3 合并重复对象并删除无用对象，use_objstms 把小对象打包进压缩的对象流
+                pdf_document.save(stage_path if pikepdf is not None else output_path,
+                                  garbage=3, deflate=True, deflate_images=True, deflate_fonts=True,
+                                  use_objstms=1)
+            steps['compressed'] = True
+            source_path = stage_path
+
+        if pikepdf is not None:
+            with pikepdf.open(source_path) as pdf:
+                pdf.save(output_path, linearize=True, compress_streams=True,
+                         object_stream_mode=pikepdf.ObjectStreamMode.generate)
+            steps['linearized'] = True
+            steps['compressed'] = True
+    finally:
+        if os.path.exists(stage_path):
+            os.remove(stage_path)
+    return steps
+
+
+def optimize_pdf_in_place(pdf_path: str, dpi_threshold: Optional[int] = 150, dpi_target: int = 120,
+                          image_quality: int = 80) -> Dict[str, Any]:
+    """
+    优化 PDF 并替换原文件（写到临时文件后改名），返回优化指标
+
+    Returns:
+        {'before': {...}, 'after': {...}, 'steps': {...}, 'replaced': bool, 'duration_ms': float}，
+        before/after 含 size、first_page_bytes、first_page_ms
+    """
+    start = time.perf_counter()
+    before = measure_pdf(pdf_path)
+    temp_path = f'{pdf_path}.optimizing'
+    try:
+        steps = optimize_pdf(pdf_path, temp_path, dpi_threshold, dpi_target, image_quality)
+        replaced = False
+        if os.path.exists(temp_path):
+            optimized_size = os.path.getsize(temp_path)
+            # 线性化后文件可能略大，但第1页可以更早显示，仍然使用优化结果
+            if steps['linearized'] or optimized_size < before['size']:
+                os.replace(temp_path, pdf_path)
+                replaced = True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return {
+        'before': before,
+        'after': measure_pdf(pdf_path) if replaced else before,
+        'steps': steps,
+        'replaced': replaced,
+        'duration_ms': round((time.perf_counter() - start) * 1000, 1)
+    }
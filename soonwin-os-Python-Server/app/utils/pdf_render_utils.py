@@ -0,0 +1,166 @@
+"""
+PDF 页面图片模块
+展示文件中的 PDF 上传后在后台任务中逐页渲染为 JPG（低、高两种分辨率），
+手机、展示终端可以直接按页请求图片，不必先下载并解析整个 PDF：
+- 图片保存在 assets/DisplayFilePages/<展示文件uuid>/<分辨率名>/page_<页码>.jpg；
+- 先渲染第1页的各分辨率，再渲染其余页面，第1页最先可用；
+- 请求的页面尚未渲染（任务未完成或失败）时，按需渲染该页后返回；
+- 渲染使用 PyMuPDF（与 other/pdf_to_jpg.py 共用 render_pdf_pages），未安装时跳过。
+"""
+
+import os
+import shutil
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Optional
+
+from flask import current_app
+
+# PDF 页面图片目录
+PDF_PAGES_FOLDER = 'assets/DisplayFilePages'
+
+# 同一文件同一页只渲染一次，并发请求等待渲染结果
+_render_locks = defaultdict(threading.Lock)
+_render_locks_guard = threading.Lock()
+
+
+class PyMuPDFMissingError(RuntimeError):
+    """未安装 PyMuPDF"""
+
+
+def load_pymupdf():
+    """导入 PyMuPDF，未安装时返回 None"""
+    try:
+        import pymupdf
+        return pymupdf
+    except ImportError:
+        pass
+    try:
+        # 旧版本 PyMuPDF 只提供 fitz 模块名
+        import fitz
+        return fitz
+    except ImportError:
+        return None
+
+
+def page_filename(page_number: int) -> str:
+    return f'page_{page_number}.jpg'
+
+
+def render_pdf_pages(pdf_path: str, output_dir: str, dpi: int = 150,
+                     filename_format: str = 'page_{page}.jpg',
+                     pages: Optional[Iterable[int]] = None,
+                     jpg_quality: int = 85,
+                     progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    把 PDF 页面渲染为 JPG，返回 PDF 总页数
+
+    Args:
+        pdf_path: PDF 文件路径
+        output_dir: 输出目录
+        dpi: 分辨率（PDF 默认 72 DPI）
+        filename_format: 图片文件名格式，{page} 为从1开始的页码，{name} 为 PDF 文件名（不含扩展名）
+        pages: 要渲染的页码（从1开始），默认全部
+        progress: 每渲染完一页调用 progress(已完成页数, 本次要渲染的页数)
+
+    Raises:
+        PyMuPDFMissingError: 未安装 PyMuPDF
+    """
+    fitz = load_pymupdf()
+    if fitz is None:
+        raise PyMuPDFMissingError('未安装 PyMuPDF，无法渲染PDF页面')
+
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    zoom = dpi / 72.0
+    matrix = fitz.Matrix(zoom, zoom)
+    with fitz.open(pdf_path) as pdf_document:
+        page_count = len(pdf_document)
+        page_numbers = [n for n in (pages or range(1, page_count + 1)) if 1 <= n <= page_count]
+        for done, page_number in enumerate(page_numbers, start=1):
+            page = pdf_document.load_page(page_number - 1)
+            pix = page.get_pixmap(matrix=matrix, alpha=False)
+            target_path = os.path.join(output_dir, filename_format.format(page=page_number, name=base_name))
+            # 先写临时文件再改名，并发读取不会读到半个文件
+            temp_path = f'{target_path}.{threading.get_ident()}.tmp'
+            try:
+                pix.save(temp_path, output='jpg', jpg_quality=jpg_quality)
+                os.replace(temp_path, target_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            if progress:
+                progress(done, len(page_numbers))
+    return page_count
+
+
+def get_page_dpis() -> Dict[str, int]:
+    """分辨率名 -> DPI，按 DPI 从低到高"""
+    dpis = current_app.config.get('PDF_PAGE_DPIS', {'low': 72, 'high': 150})
+    return dict(sorted(dpis.items(), key=lambda item: item[1]))
+
+
+def pages_dir(base_path: str, file_uuid: str, quality: Optional[str] = None) -> str:
+    path = os.path.join(base_path, PDF_PAGES_FOLDER, file_uuid)
+    return os.path.join(path, quality) if quality else path
+
+
+def render_display_file_pages(base_path: str, pdf_path: str, file_uuid: str,
+                              progress: Optional[Callable[[int, str], None]] = None) -> int:
+    """
+    渲染展示文件的全部页面（各分辨率），返回总页数
+
+    Args:
+        progress: progress(百分比, 说明)
+    """
+    dpis = get_page_dpis()
+    quality = current_app.config.get('PDF_PAGE_JPEG_QUALITY', 85)
+    # 第1页的各分辨率最先渲染
+    for name, dpi in dpis.items():
+        page_count = render_pdf_pages(pdf_path, pages_dir(base_path, file_uuid, name), dpi,
+                                      pages=[1], jpg_quality=quality)
+    if progress:
+        progress(10, '第1页已生成')
+
+    total = max(1, (page_count - 1) * len(dpis))
+    for index, (name, dpi) in enumerate(dpis.items()):
+        def report(done, _count, index=index):
+            if progress:
+                percent = 10 + int(90 * (index * (page_count - 1) + done) / total)
+                progress(percent, f'正在生成页面图片（{name}）第{done + 1}/{page_count}页')
+        render_pdf_pages(pdf_path, pages_dir(base_path, file_uuid, name), dpi,
+                         pages=range(2, page_count + 1), jpg_quality=quality, progress=report)
+    return page_count
+
+
+def get_page_image(base_path: str, pdf_path: str, file_uuid: str, page_number: int,
+                   quality_name: str) -> Optional[str]:
+    """
+    返回页面图片的绝对路径，尚未渲染时按需渲染该页；页码超出范围时返回 None
+
+    Raises:
+        PyMuPDFMissingError: 未安装 PyMuPDF 且页面图片不存在
+    """
+    output_dir = pages_dir(base_path, file_uuid, quality_name)
+    image_path = os.path.join(output_dir, page_filename(page_number))
+    if os.path.exists(image_path):
+        return image_path
+
+    with _render_locks_guard:
+        lock = _render_locks[image_path]
+    try:
+        with lock:
+            if not os.path.exists(image_path):
+                page_count = render_pdf_pages(pdf_path, output_dir, get_page_dpis()[quality_name],
+                                              pages=[page_number],
+                                              jpg_quality=current_app.config.get('PDF_PAGE_JPEG_QUALITY', 85))
+                if page_number > page_count:
+                    return None
+    finally:
+        with _render_locks_guard:
+            _render_locks.pop(image_path, None)
+    return image_path
+
+
+def remove_display_file_pages(base_path: str, file_uuid: str) -> None:
+    shutil.rmtree(pages_dir(base_path, file_uuid), ignore_errors=True)
@@ -0,0 +1,91 @@
+"""
+热点查询执行计划自检模块
+启动时对登记的热点查询执行 EXPLAIN QUERY PLAN，
+发现某条查询退化为全表扫描（缺少索引或迁移未执行）时输出警告。
+"""
+
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from app.models.expense import Expense, ExpenseAllocation, ExpenseCalculationRecord
+from app.models.inquiry import InquiryCommunication, InquiryLog
+from app.models.order import Order
+from app.models.order_inspection import InspectionItem, OrderInspection
+from app.models.punch_record import PunchRecord
+
+
+def _hot_queries() -> List[Tuple[str, Callable]]:
+    """登记的热点查询（名称, 构造查询的函数），与路由中的实际查询形状保持一致"""
+    now = datetime.now()
+    return [
+        ('打卡-当天打卡记录', lambda: select(PunchRecord).where(
+            PunchRecord.emp_id == 'emp', PunchRecord.punch_time >= now, PunchRecord.punch_time <= now
+        ).order_by(PunchRecord.punch_time.asc()).limit(1)),
+        ('打卡记录列表', lambda: select(PunchRecord).order_by(PunchRecord.punch_time.desc()).limit(10)),
+        ('订单列表', lambda: select(Order).order_by(Order.create_time.desc()).limit(10)),
+        ('订单年度汇总', lambda: select(func.count(Order.id), func.sum(Order.contract_amount)).where(
+            Order.year_filter(now.year)
+        )),
+        ('订单验收记录', lambda: select(OrderInspection).where(OrderInspection.order_id == 1).limit(1)),
+        ('验收检查项列表', lambda: select(InspectionItem).where(InspectionItem.inspection_id == 1).order_by(
+            InspectionItem.sort_order, InspectionItem.create_time
+        )),
+        ('验收子检查项', lambda: select(InspectionItem).where(
+            InspectionItem.parent_id == 1, InspectionItem.inspection_id == 1
+        )),
+        ('询盘沟通记录', lambda: select(InquiryCommunication).where(
+            InquiryCommunication.inquiry_id == 1
+        ).order_by(InquiryCommunication.create_time.desc()).limit(10)),
+        ('询盘日志列表', lambda: select(InquiryLog).order_by(InquiryLog.create_time.desc()).limit(10)),
+        ('年度分摊费用', lambda: select(Expense.id, Expense.amount).where(
+            Expense.target_year == now.year, Expense.expense_type == '全面分摊'
+        )),
+        ('费用分摊记录', lambda: select(ExpenseAllocation.order_id, ExpenseAllocation.allocated_amount).where(
+            ExpenseAllocation.expense_id == 1
+        )),
+        ('订单分摊记录', lambda: select(ExpenseAllocation).where(ExpenseAllocation.order_id == 1)),
+        ('最近计算记录', lambda: select(ExpenseCalculationRecord).where(
+            ExpenseCalculationRecord.target_year == now.year
+        ).order_by(ExpenseCalculationRecord.calculation_time.desc()).limit(1)),
+    ]
+
+
+def _is_full_scan(detail: str) -> bool:
+    """SQLite 计划中 'SCAN 表' 且未使用索引即为全表扫描（子查询/临时B树不计）"""
+    return detail.startswith('SCAN ') and 'INDEX' not in detail and 'SUBQUERY' not in detail
+
+
+def check_query_plans(app) -> List[str]:
+    """
+    检查热点查询的执行计划，全表扫描的查询通过 app.logger 输出警告
+
+    Returns:
+        退化为全表扫描的查询名称列表
+    """
+    full_scans = []
+    with app.app_context():
+        try:
+            connection = db.session.connection()
+            if connection.dialect.name != 'sqlite':
+                return full_scans
+            for name, build_query in _hot_queries():
+                compiled = build_query().compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+                try:
+                    plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}').all()
+                except OperationalError as e:
+                    # 数据表尚未创建（新库未迁移）时跳过
+                    app.logger.warning(f"热点查询[{name}]执行计划自检跳过: {e.orig}")
+                    continue
+                scans = [row[-1] for row in plan if _is_full_scan(row[-1])]
+                if scans:
+                    full_scans.append(name)
+                    app.logger.warning(f"热点查询[{name}]执行计划为全表扫描: {'; '.join(scans)}，请检查索引或执行数据库迁移")
+        except Exception as e:
+            app.logger.warning(f"热点查询执行计划自检失败: {str(e)}")
+        finally:
+            db.session.remove()
+    return full_scans
@@ -0,0 +1,137 @@
+"""
+声明式序列化模块
+每个模型声明一份字段表和若干命名字段集（list 列表、detail 详情、export 导出），
+同一个字段集同时决定：
+- 查询时用 load_only() 只加载需要的列（关联对象也只加载用到的列）；
+- 序列化时只输出这些字段。
+列表接口因此不再读取和编码验收要求、附件路径等表格中不显示的大字段。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from flask import request
+from sqlalchemy.orm import load_only, selectinload
+
+
+class InvalidFieldSetError(ValueError):
+    """请求的字段集不存在"""
+
+
+def _format_date(value):
+    return value.strftime('%Y-%m-%d') if value else None
+
+
+def _format_datetime(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+class Field:
+    """
+    序列化字段
+
+    Args:
+        name: 输出的键名
+        attr: 模型属性名，默认与 name 相同
+        kind: 'date' / 'datetime' 按固定格式输出字符串；'money' 输出 float，值为空或0时输出 default
+        default: kind='money' 时的缺省值
+        relation: 取关联对象上的属性（如 relation='creator', attr='name'），关联为空时输出 None
+    """
+
+    def __init__(self, name: str, attr: Optional[str] = None, kind: Optional[str] = None,
+                 default: Any = None, relation: Optional[str] = None):
+        self.name = name
+        self.attr = attr or name
+        self.kind = kind
+        self.default = default
+        self.relation = relation
+
+    def get(self, obj) -> Any:
+        if self.relation:
+            obj = getattr(obj, self.relation)
+            if obj is None:
+                return None
+        value = getattr(obj, self.attr)
+        if self.kind == 'date':
+            return _format_date(value)
+        if self.kind == 'datetime':
+            return _format_datetime(value)
+        if self.kind == 'money':
+            return float(value) if value else self.default
+        return value
+
+
+class Schema:
+    """
+    模型序列化描述
+
+    Args:
+        model: 模型类
+        fields: 全部字段，顺序即输出顺序
+        field_sets: {字段集名: 字段名列表}
+    """
+
+    def __init__(self, model, fields: Sequence[Field], field_sets: Dict[str, Sequence[str]]):
+        self.model = model
+        self.fields = {field.name: field for field in fields}
+        self.field_sets = {}
+        for set_name, names in field_sets.items():
+            unknown = set(names) - self.fields.keys()
+            if unknown:
+                raise ValueError(f'{model.__name__} 字段集 {set_name} 包含未定义字段: {sorted(unknown)}')
+            self.field_sets[set_name] = [self.fields[name] for name in names]
+
+    def get_fields(self, field_set: str) -> List[Field]:
+        try:
+            return self.field_sets[field_set]
+        except KeyError:
+            raise InvalidFieldSetError(f'不支持的字段集: {field_set}，可选值: {", ".join(self.field_sets)}')
+
+    def load_options(self, field_set: str, extra_columns: Sequence[Any] = ()) -> list:
+        """
+        字段集对应的加载选项：本表 load_only，关联对象 selectinload + load_only
+
+        Args:
+            extra_columns: 不输出但需要加载的列（如分页游标使用的排序列）
+        """
+        columns = [column.key for column in extra_columns]
+        relations: Dict[str, List[str]] = {}
+        for field in self.get_fields(field_set):
+            if field.relation:
+                relations.setdefault(field.relation, []).append(field.attr)
+            elif field.attr not in columns:
+                columns.append(field.attr)
+        mapper = self.model.__mapper__
+        for relation in relations:
+            # 关联对象依赖本表的外键列
+            for column in mapper.relationships[relation].local_columns:
+                key = mapper.get_property_by_column(column).key
+                if key not in columns:
+                    columns.append(key)
+        options = [load_only(*[getattr(self.model, attr) for attr in columns])]
+        for relation, attrs in relations.items():
+            rel_attr = getattr(self.model, relation)
+            target = rel_attr.property.mapper.class_
+            options.append(selectinload(rel_attr).load_only(*[getattr(target, attr) for attr in attrs]))
+        return options
+
+    def apply(self, query, field_set: str, *extra_columns):
+        """给查询加上字段集的列投影"""
+        return query.options(*self.load_options(field_set, extra_columns))
+
+    def dump(self, obj, field_set: str = 'detail') -> Dict[str, Any]:
+        return {field.name: field.get(obj) for field in self.get_fields(field_set)}
+
+    def dump_many(self, objs: Iterable[Any], field_set: str = 'detail') -> List[Dict[str, Any]]:
+        fields = self.get_fields(field_set)
+        return [{field.name: field.get(obj) for field in fields} for obj in objs]
+
+    def request_field_set(self, default: str = 'detail') -> str:
+        """
+        读取请求参数 fields 指定的字段集（未传时使用 default）
+
+        Raises:
+            InvalidFieldSetError: 字段集不存在
+        """
+        field_set = request.args.get('fields') or default
+        self.get_fields(field_set)
+        return field_set
@@ -0,0 +1,245 @@
+"""
+年度财务汇总维护模块
+YearlyFinancialSummary 按年份物化存储汇总数据：
+- 订单、费用、个别费用、年度目标、计算记录在一次事务中发生变化时，
+  flush 后记录受影响的年份，提交前在同一事务内重算这些年份的汇总行；
+- 汇总接口只读取一行，不再每次扫描订单和费用表。
+"""
+
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional, Set
+
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from app.models.expense import (
+    AnnualTarget, Expense, ExpenseAllocation, ExpenseCalculationRecord, IndividualExpense, YearlyFinancialSummary
+)
+from app.models.order import Order
+from app.utils.allocation_utils import ALLOCATION_EXPENSE_TYPE, DEFAULT_ANNUAL_TARGET
+from app.utils.write_queue_utils import get_write_dispatcher, run_write
+
+# session.info 中保存待刷新年份/订单的键
+_DIRTY_YEARS_KEY = 'financial_summary_dirty_years'
+_DIRTY_ORDER_IDS_KEY = 'financial_summary_dirty_order_ids'
+
+
+def _dirty_years(session) -> Set[int]:
+    return session.info.setdefault(_DIRTY_YEARS_KEY, set())
+
+
+def mark_summary_year(target_year: Optional[int], session=None) -> None:
+    """标记某年份的汇总需要在本事务提交前刷新（Core 批量写入等ORM事件捕获不到的场景使用）"""
+    if target_year:
+        _dirty_years(session or db.session()).add(int(target_year))
+
+
+def _collect_years(obj, years: Set[int], order_ids: Set[int]) -> None:
+    """根据变化的对象收集受影响的年份（含修改前的旧年份）"""
+    state = inspect(obj)
+    if isinstance(obj, Order):
+        history = state.attrs.create_time.history
+        for value in list(history.added or []) + list(history.deleted or []) + list(history.unchanged or []):
+            if value:
+                years.add(value.year)
+    elif isinstance(obj, (Expense, AnnualTarget, ExpenseCalculationRecord)):
+        history = state.attrs.target_year.history
+        for value in list(history.added or []) + list(history.deleted or []) + list(history.unchanged or []):
+            if value:
+                years.add(int(value))
+    elif isinstance(obj, (IndividualExpense, ExpenseAllocation)):
+        # 个别费用/分摊记录的年份取决于所属订单，提交前再统一查询
+        if obj.order_id:
+            order_ids.add(obj.order_id)
+
+
+def _after_flush(session, flush_context) -> None:
+    years = _dirty_years(session)
+    order_ids = session.info.setdefault(_DIRTY_ORDER_IDS_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, YearlyFinancialSummary):
+            _collect_years(obj, years, order_ids)
+
+
+def _before_commit(session) -> None:
+    # 刷新汇总时的查询会触发 autoflush，可能产生新的待刷新年份，循环直到处理完
+    session.flush()
+    refreshed = set()
+    while True:
+        order_ids = session.info.pop(_DIRTY_ORDER_IDS_KEY, set())
+        if order_ids:
+            for order_year in session.execute(
+                select(Order.order_year).where(Order.id.in_(order_ids))
+            ).scalars():
+                if order_year:
+                    _dirty_years(session).add(order_year)
+        pending = _dirty_years(session) - refreshed
+        if not pending:
+            break
+        for target_year in sorted(pending):
+            refresh_yearly_summary(target_year, session)
+            refreshed.add(target_year)
+        session.flush()
+    session.info.pop(_DIRTY_YEARS_KEY, None)
+
+
+def _after_rollback(session) -> None:
+    session.info.pop(_DIRTY_YEARS_KEY, None)
+    session.info.pop(_DIRTY_ORDER_IDS_KEY, None)
+
+
+def register_summary_events(session=None) -> None:
+    """在 create_app 中调用，注册维护年度汇总的会话事件"""
+    session = session or db.session
+    if not event.contains(session, 'after_flush', _after_flush):
+        event.listen(session, 'after_flush', _after_flush)
+        event.listen(session, 'before_commit', _before_commit)
+        event.listen(session, 'after_soft_rollback', lambda s, previous_transaction: _after_rollback(s))
+
+
+def _to_decimal(value: Any) -> Decimal:
+    return Decimal(str(value)) if value is not None else Decimal('0')
+
+
+def refresh_yearly_summary(target_year: int, session=None) -> YearlyFinancialSummary:
+    """按当前数据重算某年份的汇总行（不提交事务）"""
+    session = session or db.session()
+
+    expense_row = session.execute(
+        select(
+            func.sum(Expense.amount),
+            func.sum(case((Expense.amount > 0, Expense.amount), else_=0)),
+            func.sum(case((Expense.amount < 0, Expense.amount), else_=0))
+        ).where(
+            Expense.target_year == target_year,
+            Expense.expense_type == ALLOCATION_EXPENSE_TYPE
+        )
+    ).one()
+    latest_expense_create_time = session.execute(
+        select(func.max(Expense.create_time)).where(Expense.target_year == target_year)
+    ).scalar()
+
+    order_row = session.execute(
+        select(
+            func.count(Order.id),
+            func.sum(Order.contract_amount),
+            func.sum(Order.machine_cost),
+            func.sum(Order.individual_cost),
+            func.sum(Order.gross_profit)
+        ).where(Order.year_filter(target_year))
+    ).one()
+
+    total_expense_allocation = session.execute(
+        select(func.sum(ExpenseAllocation.allocated_amount)).join(
+            Expense, ExpenseAllocation.expense_id == Expense.id
+        ).where(Expense.target_year == target_year)
+    ).scalar()
+
+    latest_calc = session.execute(
+        select(ExpenseCalculationRecord).where(
+            ExpenseCalculationRecord.target_year == target_year
+        ).order_by(ExpenseCalculationRecord.calculation_time.desc()).limit(1)
+    ).scalar()
+
+    target_amount = session.execute(
+        select(AnnualTarget.target_amount).where(AnnualTarget.target_year == target_year)
+    ).scalar()
+
+    summary = session.execute(
+        select(YearlyFinancialSummary).where(YearlyFinancialSummary.target_year == target_year)
+    ).scalar()
+    if not summary:
+        summary = YearlyFinancialSummary(target_year=target_year)
+        session.add(summary)
+
+    summary.total_expenses = _to_decimal(expense_row[0])
+    summary.total_expenditure = _to_decimal(expense_row[1])
+    summary.total_income = _to_decimal(expense_row[2])
+    summary.latest_expense_create_time = latest_expense_create_time
+    summary.total_orders = order_row[0] or 0
+    summary.total_order_amount = _to_decimal(order_row[1])
+    summary.machine_cost_amount = _to_decimal(order_row[2])
+    summary.individual_cost_amount = _to_decimal(order_row[3])
+    summary.total_gross_profit = _to_decimal(order_row[4])
+    summary.total_expense_allocation = _to_decimal(total_expense_allocation)
+    summary.annual_target = _to_decimal(target_amount) if target_amount is not None else DEFAULT_ANNUAL_TARGET
+    summary.latest_calculation_id = latest_calc.id if latest_calc else None
+    summary.latest_calculation_time = latest_calc.calculation_time if latest_calc else None
+    summary.latest_calculation_status = latest_calc.status if latest_calc else None
+    summary.latest_calculation_remark = latest_calc.remark if latest_calc else None
+    return summary
+
+
+def _create_yearly_summary(target_year: int) -> None:
+    """写线程中生成汇总行（排队期间其他请求可能已经生成）"""
+    if not YearlyFinancialSummary.query.filter_by(target_year=target_year).first():
+        refresh_yearly_summary(target_year)
+
+
+def get_yearly_summary(target_year: int) -> YearlyFinancialSummary:
+    """读取某年份的汇总行；尚未生成时交给写线程现算一次并保存"""
+    summary = YearlyFinancialSummary.query.filter_by(target_year=target_year).first()
+    if summary:
+        return summary
+
+    try:
+        run_write(_create_yearly_summary, target_year)
+    except IntegrityError:
+        # 并发的写操作已经生成了该年份的汇总行
+        pass
+    if not get_write_dispatcher().in_writer_thread():
+        # 结束当前会话的读事务，读取写线程提交的汇总行
+        db.session.rollback()
+    return YearlyFinancialSummary.query.filter_by(target_year=target_year).first()
+
+
+def rebuild_all_summaries(years: Optional[Iterable[int]] = None) -> Set[int]:
+    """
+    重建年度汇总（不传年份时重建所有出现过数据的年份）
+
+    Returns:
+        重建的年份集合
+    """
+    if years is None:
+        years = set(db.session.execute(select(Expense.target_year).distinct()).scalars())
+        years |= set(db.session.execute(select(AnnualTarget.target_year).distinct()).scalars())
+        years |= set(db.session.execute(select(ExpenseCalculationRecord.target_year).distinct()).scalars())
+        years |= set(db.session.execute(select(Order.order_year).distinct()).scalars())
+    years = {int(year) for year in years if year}
+    for target_year in sorted(years):
+        refresh_yearly_summary(target_year)
+    db.session.commit()
+    return years
+
+
+def serialize_yearly_summary(summary: YearlyFinancialSummary) -> Dict[str, Any]:
+    """汇总行转换为 /expenses 与 /get-yearly-expense-summary 返回的 yearly_summary 格式"""
+    total_order_amount = float(summary.total_order_amount or 0)
+    machine_cost_amount = float(summary.machine_cost_amount or 0)
+    total_expenses = float(summary.total_expenses or 0)
+    individual_cost_amount = float(summary.individual_cost_amount or 0)
+    latest_calculation = None
+    if summary.latest_calculation_id:
+        latest_calculation = {
+            'id': summary.latest_calculation_id,
+            'calculation_time': summary.latest_calculation_time.strftime('%Y-%m-%d %H:%M:%S') if summary.latest_calculation_time else None,
+            'target_year': summary.target_year,
+            'status': summary.latest_calculation_status,
+            'remark': summary.latest_calculation_remark
+        }
+    return {
+        "year": summary.target_year,
+        "total_expenses": total_expenses,
+        "total_expenditure": float(summary.total_expenditure or 0),
+        "total_income": float(summary.total_income or 0),
+        "total_orders": summary.total_orders or 0,
+        "total_order_amount": total_order_amount,
+        "latest_calculation": latest_calculation,
+        "annual_target": float(summary.annual_target) if summary.annual_target is not None else float(DEFAULT_ANNUAL_TARGET),
+        "machine_cost_amount": machine_cost_amount,
+        "individual_cost_amount": individual_cost_amount,
+        # 净利 = 合同金额 - 机器成本 - 运营成本 - 个别费用
+        "net_profit": total_order_amount - machine_cost_amount - total_expenses - individual_cost_amount,
+        "latest_expense_create_time": summary.latest_expense_create_time.strftime('%Y-%m-%d %H:%M:%S') if summary.latest_expense_create_time else None
+    }
@@ -0,0 +1,156 @@
+"""
+SQLite 单写线程调度模块
+SQLite 同一时间只允许一个写事务，多个请求线程同时写入时会相互争抢写锁，
+超过 busy_timeout 后报 database is locked。
+这里用一个专用写线程按提交顺序依次执行写操作：
+- 写操作以函数形式提交到有界队列，提交方拿到 Future 等待结果；
+- 队列已满时等待一段时间，仍无空位则抛出 WriteQueueFullError（由路由返回503），形成背压；
+- 写线程在自己的应用上下文中执行，每个写操作结束后提交或回滚自己的会话。
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Callable
+
+from flask import copy_current_request_context, current_app, g, has_request_context, jsonify
+
+from extensions import db
+
+
+class WriteQueueFullError(Exception):
+    """写队列已满（系统繁忙）"""
+
+
+class WriteDispatcher:
+    """单写线程调度器，每个应用一个实例，首次提交时启动写线程"""
+
+    def __init__(self, app, max_size: int = 64, put_timeout: float = 10):
+        self.app = app
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        # 统计信息
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if not (self._thread and self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def in_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        提交一个写操作，返回 Future
+
+        Raises:
+            WriteQueueFullError: 等待 put_timeout 秒后队列仍已满
+        """
+        future = Future()
+        if self.in_writer_thread():
+            # 写操作内部再次提交时直接执行，避免写线程等待自己造成死锁
+            self._execute(future, func, args, kwargs, commit=False)
+            return future
+
+        self._ensure_started()
+        try:
+            self._queue.put((future, func, args, kwargs), timeout=self.put_timeout)
+        except queue.Full:
+            self.rejected += 1
+            raise WriteQueueFullError('写入队列已满，请稍后重试')
+        self.submitted += 1
+        return future
+
+    def _execute(self, future: Future, func: Callable, args, kwargs, commit: bool = True) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args, **kwargs)
+            if commit:
+                db.session.commit()
+        except BaseException as e:
+            if commit:
+                db.session.rollback()
+            self.failed += 1
+            future.set_exception(e)
+        else:
+            self.completed += 1
+            future.set_result(result)
+
+    def _run(self) -> None:
+        while True:
+            future, func, args, kwargs = self._queue.get()
+            try:
+                # 每个写操作使用独立的应用上下文，结束时释放会话
+                with self.app.app_context():
+                    self._execute(future, func, args, kwargs)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            'queue_size': self._queue.qsize(),
+            'max_size': self._queue.maxsize,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
+
+
+def init_write_dispatcher(app) -> None:
+    """在 create_app 中调用，按 Config 创建单写线程调度器"""
+    app.extensions['write_dispatcher'] = WriteDispatcher(
+        app,
+        max_size=app.config.get('WRITE_QUEUE_SIZE', 64),
+        put_timeout=app.config.get('WRITE_QUEUE_PUT_TIMEOUT', 10)
+    )
+
+
+def get_write_dispatcher() -> WriteDispatcher:
+    return current_app.extensions['write_dispatcher']
+
+
+def run_write(func: Callable, *args, **kwargs) -> Any:
+    """提交写操作并等待结果（写操作结束后自动提交事务，异常时回滚并向调用方抛出）"""
+    return get_write_dispatcher().submit(func, *args, **kwargs).result()
+
+
+def serialized_write(f):
+    """
+    路由装饰器：整个处理函数作为一个写操作交给写线程执行
+
+    放在权限装饰器之后（更靠近函数），请求对象和 g 中的数据在写线程中仍可使用。
+    处理函数内部自行 commit 的写法保持不变。
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config.get('WRITE_QUEUE_ENABLED', True) or not has_request_context():
+            return f(*args, **kwargs)
+
+        g_values = dict(g.__dict__)
+
+        @copy_current_request_context
+        def write_unit():
+            g.__dict__.update(g_values)
+            return current_app.make_response(f(*args, **kwargs))
+
+        try:
+            return run_write(write_unit)
+        except WriteQueueFullError as e:
+            return jsonify({
+                "code": 503,
+                "msg": f"系统繁忙: {str(e)}",
+                "data": None
+            }), 503
+    return decorated_function
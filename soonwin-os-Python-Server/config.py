@@ -14,6 +14,84 @@ class Config:
     # 数据库URI将在create_app函数中动态设置
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # 关闭不必要的修改跟踪，提升性能
 
+    # waitress 工作线程数（waitress 默认4个，修改时同步调整 waitress-serve --threads 参数）
+    WAITRESS_THREADS = 4
+
+    # SQLite 连接参数（每个新连接执行一次）
+    SQLITE_BUSY_TIMEOUT = 5000  # 写锁等待时间（毫秒），超时才报 database is locked
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',          # 读写并发：读操作不阻塞写操作
+        'synchronous': 'NORMAL',        # WAL 模式下安全且比 FULL 少一次 fsync
+        'busy_timeout': SQLITE_BUSY_TIMEOUT,
+        'mmap_size': 268435456,         # 内存映射读取（256MB）
+        'cache_size': -65536,           # 页缓存（负数单位为KB，即64MB）
+        'temp_store': 'MEMORY',         # 排序、临时表使用内存
+    }
+
+    # 单写线程队列：打卡、批量检查项、费用分摊等写操作按顺序交给专用写线程执行；
+    # 会触发重新分摊和年度汇总刷新的费用、个别费用、订单增删改接口整体在写线程中执行
+    WRITE_QUEUE_ENABLED = True
+    WRITE_QUEUE_SIZE = 64           # 队列容量，超过后提交方等待
+    WRITE_QUEUE_PUT_TIMEOUT = 10    # 队列满时最长等待秒数，超时返回503
+
+    # 文件操作线程池：检查项批量保存时照片的移动、删除并行执行
+    FILE_OPS_WORKERS = 4
+
+    # 图片缩放：检查项照片、图片组请求带 w 参数时返回缩放图（需要 Pillow），结果缓存在 assets/Derivatives
+    IMAGE_DERIVATIVE_WIDTHS = [160, 320, 640, 960, 1280, 1920]  # 允许的宽度档位，请求宽度向上取整
+    IMAGE_RENDITIONS = {'thumb': 320, 'medium': 1280}  # 上传后预生成的档位
+    IMAGE_DERIVATIVE_QUALITY = 80
+    IMAGE_DERIVATIVE_CACHE_MB = 1024  # 缓存总大小上限，超过后淘汰最久未使用的
+    IMAGE_DERIVATIVE_WORKERS = 2
+    IMAGE_DERIVATIVE_MAX_AGE = 86400  # 缩放图的浏览器缓存秒数
+
+    # PDF 展示文件上传后逐页渲染为图片（需要 PyMuPDF），/api/display-file/<uuid>/pages/<页码>?quality=low|high
+    PDF_PAGE_DPIS = {'low': 72, 'high': 150}
+    PDF_PAGE_JPEG_QUALITY = 85
+
+    # PDF 展示文件上传后的优化：超过阈值分辨率的图片降采样，压缩并线性化（需要 PyMuPDF、pikepdf）
+    PDF_IMAGE_DPI_THRESHOLD = 150  # 设为 None 时不处理图片
+    PDF_IMAGE_DPI_TARGET = 120
+    PDF_IMAGE_QUALITY = 80
+
+    # 文件响应（展示文件、页面图片、缩放图）：支持 Range/多范围请求，范围数超过上限时返回整个文件
+    FILE_RESPONSE_MAX_RANGES = 32
+    # 由前置 nginx 发送文件：经 nginx 转发的请求（run_server.py 生成的配置会带 X-Sendfile-Type 请求头）
+    # Flask 只返回 X-Accel-Redirect 头，路径前缀 -> nginx internal location
+    X_ACCEL_REDIRECT_ENABLED = True
+    X_ACCEL_LOCATIONS = {'assets/': '/internal-assets/'}
+
+    # 后台任务：费用分摊计算、机型/部件导入、PDF线性化、清空检查项在任务线程池中执行
+    JOB_WORKERS = 2
+    JOB_RETRY_DELAY = 5             # 失败重试的基础延迟（秒），按已执行次数递增
+    # 未要求异步（Prefer: respond-async）时最多等待的秒数，超时返回202；前端已带 Prefer 并轮询 /api/jobs，
+    # 这里只兜底其他客户端，保持在前端请求超时（5秒）以内，避免长时间占用 waitress 线程
+    JOB_SYNC_WAIT = 3
+
+    # 内容寻址存储：检查项图片、订单验收图片按 SHA-256 去重保存到 assets/Blobs，引用为0后由清理任务回收
+    BLOB_STORE_ENABLED = True
+    BLOB_GC_GRACE_HOURS = 24        # 引用为0或孤立的存储文件保留时间
+    TEMP_FILE_RETENTION_HOURS = 72  # TempFiles 中未被引用的临时文件保留时间
+    DELETED_FILE_RETENTION_DAYS = 30  # DeleteFiles 中已删除文件保留天数
+
+    # 鉴权员工身份缓存：按工号缓存，超过容量淘汰最久未使用的，有效期内不再查询员工表
+    IDENTITY_CACHE_SIZE = 256
+    IDENTITY_CACHE_TTL = 60         # 秒
+
+    # 条件请求：机型/部件/展示文件列表/订单统计接口返回 ETag，未变化时对 If-None-Match 返回304
+    CONDITIONAL_GET_ENABLED = True
+
+    # jsonify 序列化：安装了 orjson 时使用其 C 实现（未安装时自动回退到标准库 json）
+    JSON_USE_ORJSON = True
+
+    # 连接池与 waitress 线程数一致，另留少量溢出连接给启动自检、后台任务等
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': WAITRESS_THREADS,
+        'max_overflow': 2,
+        'pool_timeout': 30,
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT / 1000},
+    }
+
     # JWT配置（密钥需自定义，建议使用随机字符串）
     JWT_SECRET_KEY = "OA_System_JWT_Secret_Key_2024"  # 生产环境需更换为更复杂密钥
     JWT_ACCESS_TOKEN_EXPIRES = 7200  # JWT有效期（2小时，单位：秒）
@@ -22,5 +100,8 @@ class Config:
     TOTP_INTERVAL = 30  # 动态码有效期（30秒）
     TOTP_DIGITS = 6     # 动态码位数（6位）
 
+    # 启动时检查热点查询的执行计划，退化为全表扫描时输出警告
+    QUERY_PLAN_CHECK = True
+
     # Flask调试模式（开发环境开启，生产环境关闭）
     DEBUG = False
\ No newline at end of file
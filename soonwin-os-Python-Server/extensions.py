@@ -1,7 +1,30 @@
 # extensions.py（项目根目录，与 app 目录同级）
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from sqlalchemy import event
 
 # 初始化扩展，不绑定app（延迟绑定）
 db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+migrate = Migrate()
+
+
+def register_sqlite_pragmas(app):
+    """
+    为SQLite连接注册PRAGMA设置（在 db.init_app 之后、app_context 内调用）
+
+    每个新建的数据库连接都会执行一次，配置项见 Config.SQLITE_PRAGMAS：
+    WAL 日志模式让读操作不被写操作阻塞，busy_timeout 让写锁冲突时等待而不是直接报 database is locked。
+    """
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
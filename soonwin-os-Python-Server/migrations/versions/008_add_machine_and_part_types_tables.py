@@ -1,7 +1,7 @@
 """Add machine and part_type tables
 
 Revision ID: 008_add_machine_and_part_types_tables
-Revises: 007_rename_phone_mac_to_device_id
+Revises: 007
 Create Date: 2026-01-28 15:30:00.000000
 
 """
@@ -11,7 +11,7 @@ from sqlalchemy import text
 
 # revision identifiers
 revision = '008_add_machine_and_part_types_tables'
-down_revision = '007_rename_phone_mac_to_device_id'
+down_revision = '007'
 branch_labels = None
 depends_on = None
 
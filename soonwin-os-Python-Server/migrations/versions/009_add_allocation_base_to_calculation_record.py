@@ -0,0 +1,26 @@
+"""Add allocation_base to ExpenseCalculationRecord
+
+Revision ID: 009_add_allocation_base_to_calculation_record
+Revises: 008_add_machine_and_part_types_tables
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '009_add_allocation_base_to_calculation_record'
+down_revision = '008_add_machine_and_part_types_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 记录每次全量分摊使用的摊分基数，供增量分摊判断基数是否变化
+    with op.batch_alter_table('ExpenseCalculationRecord', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('allocation_base', sa.Numeric(15, 2), nullable=True, comment='本次分摊使用的摊分基数（增量分摊据此判断是否需要整年重算）'))
+
+
+def downgrade():
+    with op.batch_alter_table('ExpenseCalculationRecord', schema=None) as batch_op:
+        batch_op.drop_column('allocation_base')
@@ -0,0 +1,45 @@
+"""Add YearlyFinancialSummary table
+
+Revision ID: 010_add_yearly_financial_summary_table
+Revises: 009_add_allocation_base_to_calculation_record
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '010_add_yearly_financial_summary_table'
+down_revision = '009_add_allocation_base_to_calculation_record'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建年度财务汇总表（数据通过 other/rebuild_financial_summary.py 或首次访问时生成）
+    op.create_table('YearlyFinancialSummary',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False, comment='自增主键'),
+        sa.Column('target_year', sa.Integer(), nullable=False, comment='汇总年份'),
+        sa.Column('total_expenses', sa.Numeric(15, 2), nullable=True, comment='全面分摊费用合计（运营成本）'),
+        sa.Column('total_expenditure', sa.Numeric(15, 2), nullable=True, comment='全面分摊费用中正数合计（总开支）'),
+        sa.Column('total_income', sa.Numeric(15, 2), nullable=True, comment='全面分摊费用中负数合计（总收入）'),
+        sa.Column('latest_expense_create_time', sa.DateTime(), nullable=True, comment='该年份最后一条费用的创建时间'),
+        sa.Column('total_orders', sa.Integer(), nullable=True, comment='订单数量'),
+        sa.Column('total_order_amount', sa.Numeric(15, 2), nullable=True, comment='订单合同总金额'),
+        sa.Column('machine_cost_amount', sa.Numeric(15, 2), nullable=True, comment='订单机器成本合计'),
+        sa.Column('individual_cost_amount', sa.Numeric(15, 2), nullable=True, comment='订单个别费用合计'),
+        sa.Column('total_gross_profit', sa.Numeric(15, 2), nullable=True, comment='订单毛利合计'),
+        sa.Column('total_expense_allocation', sa.Numeric(15, 2), nullable=True, comment='费用分摊金额合计'),
+        sa.Column('annual_target', sa.Numeric(15, 2), nullable=True, comment='年度目标金额'),
+        sa.Column('latest_calculation_id', sa.Integer(), nullable=True, comment='最近一次费用计算记录ID'),
+        sa.Column('latest_calculation_time', sa.DateTime(), nullable=True, comment='最近一次费用计算时间'),
+        sa.Column('latest_calculation_status', sa.String(length=20), nullable=True, comment='最近一次费用计算状态'),
+        sa.Column('latest_calculation_remark', sa.Text(), nullable=True, comment='最近一次费用计算备注'),
+        sa.Column('update_time', sa.DateTime(), nullable=True, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('target_year')
+    )
+
+
+def downgrade():
+    op.drop_table('YearlyFinancialSummary')
@@ -0,0 +1,40 @@
+"""Add order_year column and year indexes to Order
+
+Revision ID: 011_add_order_year_and_indexes
+Revises: 010_add_yearly_financial_summary_table
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '011_add_order_year_and_indexes'
+down_revision = '010_add_yearly_financial_summary_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 新增订单年份列，按年份筛选时不再对每行计算 strftime
+    with op.batch_alter_table('Order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('order_year', sa.Integer(), nullable=True, comment='订单年份（由创建时间自动维护，用于按年份筛选）'))
+
+    # 根据已有订单的创建时间回填年份
+    order_table = sa.table('Order', sa.column('create_time', sa.DateTime), sa.column('order_year', sa.Integer))
+    op.execute(
+        order_table.update()
+        .where(order_table.c.create_time.isnot(None))
+        .values(order_year=sa.extract('year', order_table.c.create_time))
+    )
+
+    with op.batch_alter_table('Order', schema=None) as batch_op:
+        batch_op.create_index('ix_Order_order_year_create_time', ['order_year', 'create_time'], unique=False)
+        batch_op.create_index('ix_Order_order_year_contract_amount', ['order_year', 'contract_amount'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Order', schema=None) as batch_op:
+        batch_op.drop_index('ix_Order_order_year_contract_amount')
+        batch_op.drop_index('ix_Order_order_year_create_time')
+        batch_op.drop_column('order_year')
@@ -0,0 +1,42 @@
+"""Add secondary indexes for hot filter/sort columns
+
+Revision ID: 012_add_hot_query_indexes
+Revises: 011_add_order_year_and_indexes
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers
+revision = '012_add_hot_query_indexes'
+down_revision = '011_add_order_year_and_indexes'
+branch_labels = None
+depends_on = None
+
+# (表名, 索引名, 索引列)，列顺序与实际查询的 等值条件 -> 范围/排序 一致
+INDEXES = [
+    ('PunchRecord', 'ix_PunchRecord_emp_id_punch_time', ['emp_id', 'punch_time']),
+    ('PunchRecord', 'ix_PunchRecord_punch_time', ['punch_time']),
+    ('Order', 'ix_Order_create_time', ['create_time']),
+    ('OrderInspection', 'ix_OrderInspection_order_id', ['order_id']),
+    ('OrderInspectionStatusLog', 'ix_OrderInspectionStatusLog_inspection_id_create_time', ['inspection_id', 'create_time']),
+    ('InspectionItem', 'ix_InspectionItem_inspection_id_sort_order', ['inspection_id', 'sort_order', 'create_time']),
+    ('InspectionItem', 'ix_InspectionItem_parent_id', ['parent_id']),
+    ('InquiryCommunication', 'ix_InquiryCommunication_inquiry_id_create_time', ['inquiry_id', 'create_time']),
+    ('InquiryLog', 'ix_InquiryLog_inquiry_id_create_time', ['inquiry_id', 'create_time']),
+    ('InquiryLog', 'ix_InquiryLog_create_time', ['create_time']),
+    ('Expense', 'ix_Expense_target_year_expense_type', ['target_year', 'expense_type']),
+    ('ExpenseAllocation', 'ix_ExpenseAllocation_expense_id_order_id', ['expense_id', 'order_id']),
+    ('ExpenseAllocation', 'ix_ExpenseAllocation_order_id', ['order_id']),
+    ('ExpenseCalculationRecord', 'ix_ExpenseCalculationRecord_target_year_calculation_time', ['target_year', 'calculation_time']),
+]
+
+
+def upgrade():
+    for table_name, index_name, columns in INDEXES:
+        op.create_index(index_name, table_name, columns, unique=False)
+
+
+def downgrade():
+    for table_name, index_name, columns in reversed(INDEXES):
+        op.drop_index(index_name, table_name=table_name)
@@ -0,0 +1,46 @@
+"""Add Job table for background jobs
+
+Revision ID: 013_add_job_table
+Revises: 012_add_hot_query_indexes
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '013_add_job_table'
+down_revision = '012_add_hot_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建后台任务表（耗时操作提交为任务后由 /api/jobs/<id> 查询进度和结果）
+    op.create_table('Job',
+        sa.Column('id', sa.String(length=36), nullable=False, comment='任务ID（UUID）'),
+        sa.Column('job_type', sa.String(length=50), nullable=False, comment='任务类型'),
+        sa.Column('status', sa.String(length=20), nullable=False, comment='状态（pending/running/succeeded/failed）'),
+        sa.Column('progress', sa.Integer(), nullable=False, comment='进度（0-100）'),
+        sa.Column('message', sa.String(length=500), nullable=True, comment='进度或结果提示'),
+        sa.Column('params', sa.Text(), nullable=True, comment='任务参数（JSON）'),
+        sa.Column('result', sa.Text(), nullable=True, comment='任务结果（JSON）'),
+        sa.Column('error', sa.Text(), nullable=True, comment='最近一次失败原因'),
+        sa.Column('attempts', sa.Integer(), nullable=False, comment='已执行次数'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, comment='最多执行次数'),
+        sa.Column('worker_id', sa.String(length=20), nullable=True, comment='执行任务的服务进程标识'),
+        sa.Column('created_by', sa.String(length=50), nullable=True, comment='提交人工号'),
+        sa.Column('create_time', sa.DateTime(), nullable=True, comment='提交时间'),
+        sa.Column('start_time', sa.DateTime(), nullable=True, comment='最近一次开始执行时间'),
+        sa.Column('finish_time', sa.DateTime(), nullable=True, comment='完成时间'),
+        sa.Column('update_time', sa.DateTime(), nullable=True, comment='更新时间'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_Job_created_by_create_time', 'Job', ['created_by', 'create_time'], unique=False)
+    op.create_index('ix_Job_status', 'Job', ['status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Job_status', table_name='Job')
+    op.drop_index('ix_Job_created_by_create_time', table_name='Job')
+    op.drop_table('Job')
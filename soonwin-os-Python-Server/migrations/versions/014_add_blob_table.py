@@ -0,0 +1,34 @@
+"""Add Blob table for content-addressed asset storage
+
+Revision ID: 014_add_blob_table
+Revises: 013_add_job_table
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '014_add_blob_table'
+down_revision = '013_add_job_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 创建内容寻址存储表（已有图片可通过 other/gc_blob_store.py --import-existing 导入）
+    op.create_table('Blob',
+        sa.Column('sha256', sa.String(length=64), nullable=False, comment='文件内容的SHA-256'),
+        sa.Column('ext', sa.String(length=10), nullable=False, comment='文件扩展名（含点）'),
+        sa.Column('size', sa.Integer(), nullable=True, comment='文件大小（字节）'),
+        sa.Column('ref_count', sa.Integer(), nullable=False, comment='引用次数（检查项图片、订单验收图片）'),
+        sa.Column('create_time', sa.DateTime(), nullable=True, comment='创建时间'),
+        sa.Column('update_time', sa.DateTime(), nullable=True, comment='引用次数最近变化时间'),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_Blob_ref_count_update_time', 'Blob', ['ref_count', 'update_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Blob_ref_count_update_time', table_name='Blob')
+    op.drop_table('Blob')
@@ -0,0 +1,27 @@
+"""Add pdf_metrics to DisplayFile
+
+Revision ID: 015_add_display_file_pdf_metrics
+Revises: 014_add_blob_table
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '015_add_display_file_pdf_metrics'
+down_revision = '014_add_blob_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 添加 PDF 优化指标字段（上传后的优化任务写入）
+    with op.batch_alter_table('DisplayFile', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('pdf_metrics', sa.Text(), nullable=True, comment='PDF优化指标（JSON：优化前后大小、第1页所需字节数和渲染耗时）'))
+
+
+def downgrade():
+    # 删除 PDF 优化指标字段
+    with op.batch_alter_table('DisplayFile', schema=None) as batch_op:
+        batch_op.drop_column('pdf_metrics')
@@ -0,0 +1,27 @@
+"""Add image_manifest to DisplayFile
+
+Revision ID: 016_add_display_file_image_manifest
+Revises: 015_add_display_file_pdf_metrics
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '016_add_display_file_image_manifest'
+down_revision = '015_add_display_file_pdf_metrics'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 添加图片组清单字段（上传时写入，旧图片组第一次查看时生成）
+    with op.batch_alter_table('DisplayFile', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_manifest', sa.Text(), nullable=True, comment='图片组清单（JSON：按顺序的文件名、尺寸、大小和缩略图地址）'))
+
+
+def downgrade():
+    # 删除图片组清单字段
+    with op.batch_alter_table('DisplayFile', schema=None) as batch_op:
+        batch_op.drop_column('image_manifest')
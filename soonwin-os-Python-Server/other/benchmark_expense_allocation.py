@@ -0,0 +1,141 @@
+"""
+费用分摊计算性能对比脚本
+对比旧版逐条ORM分摊与新版列式批量分摊引擎的耗时
+使用方法: python benchmark_expense_allocation.py [--orders 10000] [--expenses 200] [--skip-legacy]
+"""
+
+import sys
+import os
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from flask import Flask
+from extensions import db
+from app.models.order import Order
+from app.models.expense import Expense, ExpenseAllocation, AnnualTarget
+from app.utils.allocation_utils import allocate_expenses
+
+TARGET_YEAR = 2025
+
+
+def create_benchmark_app(db_path):
+    """创建只绑定数据库的最小应用（使用临时SQLite文件，不影响业务数据库）"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{db_path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed_data(order_count, expense_count):
+    """生成测试订单与费用"""
+    random.seed(42)
+    create_time = datetime(TARGET_YEAR, 6, 1)
+    db.session.execute(Order.__table__.insert(), [
+        {
+            'area': '华南',
+            'customer_name': f'客户{i}',
+            'customer_type': '终端',
+            'order_time': create_time.date(),
+            'contract_no': f'SW{i:06d}',
+            'machine_name': '包装机',
+            'machine_model': 'SW-100',
+            'machine_count': 1,
+            'unit': 'set',
+            'contract_amount': Decimal(random.randint(10000, 2000000)),
+            'machine_cost': Decimal(random.randint(5000, 1000000)),
+            'create_time': create_time,
+            'update_time': create_time,
+            'order_year': create_time.year
+        }
+        for i in range(order_count)
+    ])
+    db.session.execute(Expense.__table__.insert(), [
+        {
+            'name': f'费用{i}',
+            'amount': Decimal(random.randint(-50000, 500000)) / 100,
+            'expense_type': '全面分摊',
+            'target_year': TARGET_YEAR,
+            'create_time': create_time,
+            'update_time': create_time
+        }
+        for i in range(expense_count)
+    ])
+    db.session.add(AnnualTarget(target_year=TARGET_YEAR, target_amount=10000000.00))
+    db.session.commit()
+
+
+def legacy_allocate(target_year, annual_target):
+    """旧版实现：逐条创建ExpenseAllocation对象，再循环回写订单摊分费用"""
+    expense_ids = db.session.query(Expense.id).filter(Expense.target_year == target_year).subquery()
+    db.session.query(ExpenseAllocation).filter(ExpenseAllocation.expense_id.in_(expense_ids)).delete(synchronize_session=False)
+    expenses = Expense.query.filter(Expense.target_year == target_year, Expense.expense_type == '全面分摊').all()
+    orders = Order.query.filter(db.extract('year', Order.create_time) == target_year).all()
+    total_order_amount = sum(float(order.contract_amount) if order.contract_amount else 0.0 for order in orders)
+    allocation_base = max(annual_target, total_order_amount)
+    for expense in expenses:
+        expense_amount = float(expense.amount) if expense.amount else 0.0
+        for order in orders:
+            order_amount = float(order.contract_amount) if order.contract_amount else 0.0
+            if order_amount > 0:
+                db.session.add(ExpenseAllocation(
+                    expense_id=expense.id,
+                    order_id=order.id,
+                    allocated_amount=(order_amount / allocation_base) * expense_amount
+                ))
+    for order in orders:
+        order_amount = float(order.contract_amount) if order.contract_amount else 0.0
+        order.proportionate_cost = sum(
+            (order_amount / allocation_base) * float(expense.amount) if expense.amount else 0.0
+            for expense in expenses
+        )
+    db.session.commit()
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label}: {elapsed:.2f} 秒")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='费用分摊计算性能对比')
+    parser.add_argument('--orders', type=int, default=10000, help='订单数量')
+    parser.add_argument('--expenses', type=int, default=200, help='费用数量')
+    parser.add_argument('--skip-legacy', action='store_true', help='跳过旧版实现（数据量大时旧版耗时很长）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = create_benchmark_app(os.path.join(tmp_dir, 'benchmark.db'))
+        with app.app_context():
+            db.create_all()
+            print(f"生成测试数据: {args.orders} 个订单 × {args.expenses} 笔费用")
+            seed_data(args.orders, args.expenses)
+
+            def run_engine():
+                allocate_expenses(TARGET_YEAR, Decimal('10000000.00'))
+                db.session.commit()
+
+            engine_time = timed("新版分摊引擎", run_engine)
+            allocation_count = db.session.query(db.func.count(ExpenseAllocation.id)).scalar()
+            print(f"分摊记录数: {allocation_count}")
+
+            if not args.skip_legacy:
+                legacy_time = timed("旧版逐条分摊", lambda: legacy_allocate(TARGET_YEAR, 10000000.00))
+                print(f"提速: {legacy_time / engine_time:.1f} 倍")
+
+            db.session.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+订单列表JSON序列化性能对比脚本
+对比旧版 DecimalEncoder + json.dumps 写法与全局 AppJSONProvider（orjson / 标准库回退）的耗时
+使用方法: python benchmark_json_response.py [--orders 1000] [--rounds 50]
+"""
+
+import sys
+import os
+import json
+import time
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from flask import Flask
+from app.models.order import Order
+from app.routes.order_routes import serialize_order
+from app.utils.json_provider_utils import AppJSONProvider, orjson
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """旧版各路由文件中的编码器"""
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return json.JSONEncoder.default(self, obj)
+
+
+def build_orders(order_count):
+    """生成内存中的订单对象（不写数据库）"""
+    random.seed(42)
+    base_time = datetime(2025, 1, 1)
+    orders = []
+    for i in range(order_count):
+        create_time = base_time + timedelta(minutes=i)
+        orders.append(Order(
+            id=i + 1,
+            is_new=1,
+            area='华南',
+            customer_name=f'客户{i}',
+            customer_type='终端',
+            order_time=create_time.date(),
+            ship_country='中国',
+            contract_no=f'SW{i:06d}',
+            order_no=f'PO{i:06d}',
+            machine_name='包装机',
+            machine_model='SW-100',
+            machine_count=1,
+            unit='set',
+            contract_amount=Decimal(random.randint(10000, 2000000)),
+            deposit=Decimal('30000.00'),
+            balance=Decimal('70000.00'),
+            tax_rate=Decimal('13.00'),
+            machine_cost=Decimal(random.randint(5000, 1000000)),
+            net_profit=Decimal('12345.67'),
+            pay_type='T/T',
+            create_time=create_time,
+            update_time=create_time
+        ))
+    return orders
+
+
+def build_payloads(orders):
+    """接口响应体：serialize_order 的输出，以及直接包含 Decimal/日期/UUID 的原始数据"""
+    serialized = {
+        "code": 200,
+        "msg": "获取订单列表成功",
+        "data": {"list": [serialize_order(order) for order in orders], "total": len(orders)}
+    }
+    raw = {
+        "code": 200,
+        "msg": "获取订单列表成功",
+        "data": {"list": [
+            {
+                'id': order.id,
+                'uuid': uuid.UUID(int=order.id),
+                'customer_name': order.customer_name,
+                'order_time': order.order_time,
+                'contract_amount': order.contract_amount,
+                'machine_cost': order.machine_cost,
+                'net_profit': order.net_profit,
+                'create_time': order.create_time
+            }
+            for order in orders
+        ]}
+    }
+    return serialized, raw
+
+
+def timeit(func, rounds):
+    func()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='订单列表JSON序列化性能对比')
+    parser.add_argument('--orders', type=int, default=1000, help='订单数量')
+    parser.add_argument('--rounds', type=int, default=50, help='每种写法的重复次数')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    orders = build_orders(args.orders)
+    serialized, raw = build_payloads(orders)
+
+    app.config['JSON_USE_ORJSON'] = True
+    orjson_provider = AppJSONProvider(app)
+    app.config['JSON_USE_ORJSON'] = False
+    stdlib_provider = AppJSONProvider(app)
+
+    print(f"订单数量: {args.orders}，重复次数: {args.rounds}，orjson: {'已安装' if orjson else '未安装'}")
+
+    legacy_ms = timeit(lambda: json.dumps(serialized, cls=DecimalEncoder, ensure_ascii=False), args.rounds)
+    print(f"旧版 DecimalEncoder:            {legacy_ms:8.2f} ms")
+    stdlib_ms = timeit(lambda: stdlib_provider.dumps(serialized), args.rounds)
+    print(f"AppJSONProvider（标准库）:      {stdlib_ms:8.2f} ms")
+    if orjson_provider.use_orjson:
+        orjson_ms = timeit(lambda: orjson_provider.dumps(serialized), args.rounds)
+        print(f"AppJSONProvider（orjson）:      {orjson_ms:8.2f} ms  (提速 {legacy_ms / orjson_ms:.1f} 倍)")
+
+    print("\n直接序列化 Decimal/日期/UUID 原始数据:")
+    stdlib_ms = timeit(lambda: stdlib_provider.dumps(raw), args.rounds)
+    print(f"AppJSONProvider（标准库）:      {stdlib_ms:8.2f} ms")
+    if orjson_provider.use_orjson:
+        orjson_ms = timeit(lambda: orjson_provider.dumps(raw), args.rounds)
+        print(f"AppJSONProvider（orjson）:      {orjson_ms:8.2f} ms")
+        # 两种实现输出一致
+        assert json.loads(orjson_provider.dumps(raw)) == json.loads(stdlib_provider.dumps(raw))
+
+
+if __name__ == '__main__':
+    main()
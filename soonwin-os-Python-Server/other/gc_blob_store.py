@@ -0,0 +1,56 @@
+"""
+存储文件清理脚本
+按数据库实际引用修正 Blob 表的引用次数，删除未被引用的存储文件、过期的临时文件和已删除文件；
+--import-existing 把检查项/订单中引用的旧路径文件（如 assets/OrderInspection 下）复制到存储并改写路径
+使用方法: python gc_blob_store.py [--port 5000] [--dry-run] [--import-existing]
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from extensions import db
+from app.utils.blob_store_utils import import_existing_files, sweep_blob_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='清理存储文件与临时文件')
+    parser.add_argument('--port', type=int, default=5000, help='服务端口（决定使用的数据库）')
+    parser.add_argument('--dry-run', action='store_true', help='只统计不删除')
+    parser.add_argument('--import-existing', action='store_true', help='先把旧路径的图片导入存储')
+    args = parser.parse_args()
+
+    app = create_app(args.port)
+    with app.app_context():
+        try:
+            if args.import_existing and not args.dry_run:
+                stats = import_existing_files()
+                print(f"导入已有文件: 导入{stats['files_imported']}个，更新{stats['rows_updated']}条记录，"
+                      f"文件不存在{stats['files_missing']}个（原文件保留，确认无误后可手动删除）")
+
+            config = app.config
+            stats = sweep_blob_store(
+                grace_hours=config.get('BLOB_GC_GRACE_HOURS', 24),
+                temp_retention_hours=config.get('TEMP_FILE_RETENTION_HOURS', 72),
+                deleted_retention_days=config.get('DELETED_FILE_RETENTION_DAYS', 30),
+                dry_run=args.dry_run,
+                progress=lambda percent, message: print(f"[{percent:3d}%] {message}")
+            )
+            print(f"{'（仅统计）' if args.dry_run else ''}修正引用次数{stats['refs_fixed']}条，"
+                  f"删除未引用存储文件{stats['blobs_deleted']}个、孤立存储文件{stats['orphan_blobs_deleted']}个、"
+                  f"临时文件{stats['temp_files_deleted']}个、已删除文件{stats['deleted_files_purged']}个，"
+                  f"释放{stats['bytes_freed'] / 1024 / 1024:.1f}MB")
+        except Exception as e:
+            db.session.rollback()
+            print(f"清理存储文件失败: {str(e)}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,12 @@
 import os
 import sys
 
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app.utils.pdf_render_utils import load_pymupdf, render_pdf_pages
+
 def pdf_to_jpg(pdf_path, dpi=150):
     """
     使用PyMuPDF将PDF文件转换为多个JPG图片
@@ -10,42 +16,18 @@ def pdf_to_jpg(pdf_path, dpi=150):
     # 获取PDF文件名（不含扩展名）用于命名输出图片
     base_name = os.path.splitext(os.path.basename(pdf_path))[0]
     
+    if load_pymupdf() is None:
+        print("未安装PyMuPDF，请先执行: pip install PyMuPDF")
+        return
+
     try:
-        import fitz  # PyMuPDF
-    except ImportError:
-        print("正在安装PyMuPDF...")
-        import subprocess
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "PyMuPDF"])
-        import fitz
-    
-    try:
-        # 打开PDF文件
-        pdf_document = fitz.open(pdf_path)
-        
-        print(f"PDF文件共 {len(pdf_document)} 页")
-        
-        # 遍历每一页
-        for page_num in range(len(pdf_document)):
-            # 获取页面
-            page = pdf_document.load_page(page_num)
-            
-            # 设置缩放比例（DPI/72，因为默认DPI是72）
-            zoom = dpi / 72.0
-            mat = fitz.Matrix(zoom, zoom)
-            
-            # 渲染页面为图像
-            pix = page.get_pixmap(matrix=mat)
-            
-            # 生成JPG文件名
-            jpg_filename = f"{base_name}_page_{page_num+1}.jpg"
-            
-            # 保存为JPG图片
-            pix.save(jpg_filename)
-            
-            print(f"已保存: {jpg_filename}")
-        
-        # 关闭PDF文档
-        pdf_document.close()
+        # 渲染逻辑与展示文件的后台任务共用（app/utils/pdf_render_utils.py）
+        def report(done, total):
+            print(f"已保存: {base_name}_page_{done}.jpg")
+
+        page_count = render_pdf_pages(pdf_path, os.getcwd(), dpi=dpi,
+                                      filename_format="{name}_page_{page}.jpg", jpg_quality=95, progress=report)
+        print(f"PDF文件共 {page_count} 页")
         print("转换完成!")
         
     except Exception as e:
@@ -0,0 +1,42 @@
+"""
+年度财务汇总重建脚本
+根据订单、费用、年度目标和计算记录重新生成 YearlyFinancialSummary 表
+使用方法: python rebuild_financial_summary.py [--port 5000] [--year 2025 ...]
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from app import create_app
+from extensions import db
+from app.utils.summary_utils import rebuild_all_summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description='重建年度财务汇总')
+    parser.add_argument('--port', type=int, default=5000, help='服务端口（决定使用的数据库）')
+    parser.add_argument('--year', type=int, nargs='*', help='只重建指定年份，不传则重建全部年份')
+    args = parser.parse_args()
+
+    app = create_app(args.port)
+    with app.app_context():
+        try:
+            years = rebuild_all_summaries(args.year or None)
+            if years:
+                print(f"已重建年度汇总: {', '.join(str(year) for year in sorted(years))}")
+            else:
+                print("没有需要重建的年份")
+        except Exception as e:
+            db.session.rollback()
+            print(f"重建年度汇总失败: {str(e)}")
+            return False
+    return True
+
+
+if __name__ == "__main__":
+    main()